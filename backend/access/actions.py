@@ -4,6 +4,7 @@ from typing import Any, Optional
 from django.db import IntegrityError, transaction
 
 from backend.access.dtos import RoleDeleteResult
+from backend.access.events import notify_access_changed
 from backend.access.forms import RoleForm
 from backend.access.models import Participant, Role, Permission
 from backend.access.templates import DEFAULT_ROLE_TEMPLATES
@@ -96,6 +97,8 @@ def update_role(
     except IntegrityError as e:
         raise ConflictException("Could not update role due to a conflict.") from e
 
+    notify_access_changed(role.room_id, role_id=role.id)
+
     return role
 
 
@@ -108,8 +111,11 @@ def delete_role(
         )
         invites_count = Invite.objects.filter(role=role).update(role=substitution_role)
 
+        role_id = role.id
         role.delete()
 
+        notify_access_changed(role.room_id, role_id=role_id)
+
     return RoleDeleteResult(
         success=True,
         participants_reassigned=participants_count,
@@ -120,6 +126,7 @@ def delete_role(
 def assign_permissions_to_role(role: Role, permission_ids: list[uuid.UUID]) -> Role:
     permissions = Permission.objects.filter(id__in=permission_ids)
     role.permissions.set(permissions)
+    notify_access_changed(role.room_id, role_id=role.id)
     return role
 
 
@@ -127,6 +134,7 @@ def remove_permissions_from_role(role: Role, permission_ids: list[uuid.UUID]) ->
     if permission_ids:
         permissions = list(Permission.objects.filter(id__in=permission_ids))
         role.permissions.remove(*permissions)
+        notify_access_changed(role.room_id, role_id=role.id)
     return role
 
 
@@ -137,9 +145,13 @@ def change_participant_role(participant: Participant, new_role: Role) -> Partici
     participant.role = new_role
     participant.save()
 
+    notify_access_changed(participant.room_id, user_id=participant.user_id)
+
     return participant
 
 
 def remove_participant(participant: Participant) -> bool:
+    room_id, user_id = participant.room_id, participant.user_id
     participant.delete()
+    notify_access_changed(room_id, user_id=user_id)
     return True
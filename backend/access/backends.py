@@ -12,9 +12,8 @@ class SecureRulesBackend(ObjectPermissionBackend):
         if not user_obj.is_active:
             return False
 
-        # TODO:Use Redis/Memcached for a shared cache backend.
-        # Check for Active Bans
-        if AccountActions.is_user_banned(user_obj):
+        # Check for Active Bans, cached as has_perm runs many times per request
+        if AccountActions.is_user_banned_cached(user_obj):
             return False
 
         # Superuser
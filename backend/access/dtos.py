@@ -1,7 +1,38 @@
-from pydantic import BaseModel
+import uuid
+from typing import Optional
+
+from pydantic import BaseModel, ConfigDict
 
 
 class RoleDeleteResult(BaseModel):
     success: bool
     participants_reassigned: int
     invites_reassigned: int
+
+
+class PermissionSnapshot(BaseModel):
+    """
+    Point-in-time view of a participant's authorization state in a room.
+
+    Long-lived connections load it once and authorize against it in memory
+    instead of running the rules predicates on every operation.
+    """
+
+    model_config = ConfigDict(frozen=True)
+
+    user_id: uuid.UUID
+    room_id: uuid.UUID
+    participant_id: uuid.UUID
+    role_id: Optional[uuid.UUID] = None
+    permission_codes: frozenset[str] = frozenset()
+    is_superuser: bool = False
+    is_blocked: bool = False
+
+    def has_permission(self, perm_code: str) -> bool:
+        if self.is_blocked:
+            return False
+
+        if self.is_superuser:
+            return True
+
+        return perm_code in self.permission_codes
@@ -1,3 +1,6 @@
+from enum import IntFlag, auto
+from typing import Iterable
+
 from django.db import models
 
 
@@ -17,3 +20,34 @@ class PermissionCode(models.TextChoices):
     ROOM_MANAGE_ROLES = "room.manage_roles", "Manage room roles and permissions"
     ROOM_DELETE_MESSAGE = "room.delete_message", "Delete message"
     ROOM_UPLOAD_FILE = "room.upload_file", "Allow file uploads"
+
+
+class PermissionFlag(IntFlag):
+    """
+    One bit per PermissionCode, for permission sets held in memory at scale.
+
+    Members are named after their PermissionCode; add new codes here too.
+    """
+
+    NONE = 0
+    ROOM_DELETE = auto()
+    ROOM_UPDATE = auto()
+    ROOM_MANAGE_VISIBILITY = auto()
+    ROOM_MANAGE_PARTICIPANTS = auto()
+    ROOM_MANAGE_ROLES = auto()
+    ROOM_DELETE_MESSAGE = auto()
+    ROOM_UPLOAD_FILE = auto()
+
+    @classmethod
+    def from_codes(cls, codes: Iterable[str]) -> "PermissionFlag":
+        flags = cls.NONE
+        for code in codes:
+            try:
+                flags |= cls[PermissionCode(code).name]
+            except ValueError:
+                # Stored codes this version doesn't check
+                continue
+        return flags
+
+    def codes(self) -> frozenset[str]:
+        return frozenset(PermissionCode[flag.name].value for flag in self)
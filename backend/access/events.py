@@ -0,0 +1,68 @@
+import logging
+import uuid
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from redis.exceptions import RedisError
+
+from backend.access.models import Participant
+from backend.core.groups import room_group_name
+
+
+logger = logging.getLogger(__name__)
+
+
+def _send_access_invalidation(
+    room_id: uuid.UUID,
+    role_id: Optional[uuid.UUID],
+    user_id: Optional[uuid.UUID],
+) -> None:
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    try:
+        async_to_sync(channel_layer.group_send)(
+            room_group_name(room_id),
+            {
+                "type": "access.invalidate",
+                "room_id": str(room_id),
+                "role_id": str(role_id) if role_id else None,
+                "user_id": str(user_id) if user_id else None,
+            },
+        )
+    except (RedisError, OSError):
+        logger.warning(
+            "Could not publish access invalidation (channel layer unavailable)",
+            exc_info=True,
+        )
+
+
+def notify_access_changed(
+    room_id: uuid.UUID,
+    *,
+    role_id: Optional[uuid.UUID] = None,
+    user_id: Optional[uuid.UUID] = None,
+) -> None:
+    """
+    Ask open chat connections of a room to reload their permission snapshot.
+
+    The event is scoped to connections holding `role_id` or belonging to
+    `user_id` when given, and is only sent once the surrounding transaction
+    has committed.
+    """
+    transaction.on_commit(lambda: _send_access_invalidation(room_id, role_id, user_id))
+
+
+def notify_user_access_changed(user_id: uuid.UUID) -> None:
+    """
+    Ask the user's open chat connections, in every room they participate in,
+    to reload their permission snapshot, e.g. after a ban or deactivation.
+    """
+    room_ids = Participant.objects.filter(user_id=user_id).values_list(
+        "room_id", flat=True
+    )
+    for room_id in room_ids:
+        notify_access_changed(room_id, user_id=user_id)
@@ -1,5 +1,5 @@
 import uuid
-from typing import Optional
+from typing import Iterable, Optional
 
 
 from backend.account.models import User
@@ -12,8 +12,9 @@ from backend.core.exceptions import (
 from backend.access.models import Participant, Role
 from backend.access.rules.labels import AccessPermission
 from backend.access.enums import PermissionCode
-from backend.access.dtos import RoleDeleteResult
+from backend.access.dtos import PermissionSnapshot, RoleDeleteResult
 from backend.access import actions
+from backend.account import actions as AccountActions
 from backend.room.rules.labels import RoomPermission
 
 
@@ -165,6 +166,71 @@ class RoleService:
             .first()
         )
 
+    @staticmethod
+    def get_permission_snapshot(
+        user: User, room_id: uuid.UUID
+    ) -> Optional[PermissionSnapshot]:
+        """
+        Load a participant's role and permission codes in a single query.
+
+        Args:
+            user: The user
+            room_id: ID of the room
+
+        Returns:
+            The PermissionSnapshot, or None if the user is not a participant
+        """
+        return RoleService.get_permission_snapshots(user, [room_id]).get(room_id)
+
+    @staticmethod
+    def get_permission_snapshots(
+        user: User, room_ids: Iterable[uuid.UUID]
+    ) -> dict[uuid.UUID, PermissionSnapshot]:
+        """
+        Load the user's role and permission codes in many rooms in a single query.
+
+        Args:
+            user: The user
+            room_ids: IDs of the rooms
+
+        Returns:
+            PermissionSnapshot by room ID, for the rooms the user participates in
+        """
+        if not user.is_authenticated:
+            return {}
+
+        rows = list(
+            Participant.objects.filter(user=user, room_id__in=room_ids).values_list(
+                "room_id", "id", "role_id", "role__permissions__code"
+            )
+        )
+
+        if not rows:
+            return {}
+
+        memberships: dict[uuid.UUID, tuple[uuid.UUID, Optional[uuid.UUID]]] = {}
+        codes: dict[uuid.UUID, set[str]] = {}
+        for room_id, participant_id, role_id, code in rows:
+            memberships[room_id] = (participant_id, role_id)
+            room_codes = codes.setdefault(room_id, set())
+            if code:
+                room_codes.add(code)
+
+        is_blocked = not user.is_active or AccountActions.is_user_banned(user)
+
+        return {
+            room_id: PermissionSnapshot(
+                user_id=user.id,
+                room_id=room_id,
+                participant_id=participant_id,
+                role_id=role_id,
+                permission_codes=frozenset(codes[room_id]),
+                is_superuser=user.is_superuser,
+                is_blocked=is_blocked,
+            )
+            for room_id, (participant_id, role_id) in memberships.items()
+        }
+
     @staticmethod
     def create_default_roles(room: Room) -> None:
         """
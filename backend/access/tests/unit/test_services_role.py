@@ -9,6 +9,7 @@ import pytest
 from backend.access.enums import PermissionCode, RoleCode
 from backend.access.models import Participant, Role
 from backend.access.services import RoleService
+from backend.account.models import UserBan
 from backend.core.exceptions import (
     PermissionException,
 )
@@ -78,6 +79,42 @@ class RoleServiceTest(ServiceTestBase):
         role = RoleService.get_role_by_id(fake_id)
         self.assertIsNone(role)
 
+    def test_get_permission_snapshot_owner(self):
+        snapshot = RoleService.get_permission_snapshot(self.owner, self.room.id)
+
+        self.assertIsNotNone(snapshot)
+        self.assertEqual(snapshot.role_id, self.owner_role.id)
+        self.assertTrue(snapshot.has_permission(PermissionCode.ROOM_MANAGE_ROLES))
+        self.assertEqual(
+            snapshot.permission_codes,
+            set(self.owner_role.permissions.values_list("code", flat=True)),
+        )
+
+    def test_get_permission_snapshot_not_participant(self):
+        self.assertIsNone(
+            RoleService.get_permission_snapshot(self.other_user, self.room.id)
+        )
+
+    def test_get_permission_snapshot_banned_user(self):
+        self._add_member(self.member, self.owner_role)
+        UserBan.objects.create(user=self.member, banned_by=self.moderator)
+
+        snapshot = RoleService.get_permission_snapshot(self.member, self.room.id)
+
+        self.assertIsNotNone(snapshot)
+        self.assertTrue(snapshot.is_blocked)
+        self.assertFalse(snapshot.has_permission(PermissionCode.ROOM_MANAGE_ROLES))
+
+    def test_get_permission_snapshots_batches_rooms(self):
+        missing_room_id = uuid.uuid4()
+
+        snapshots = RoleService.get_permission_snapshots(
+            self.owner, [self.room.id, missing_room_id]
+        )
+
+        self.assertEqual(set(snapshots), {self.room.id})
+        self.assertEqual(snapshots[self.room.id].role_id, self.owner_role.id)
+
     def test_create_role_success(self):
         perm_ids = list(self.owner_role.permissions.values_list("id", flat=True)[:2])
 
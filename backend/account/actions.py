@@ -1,11 +1,16 @@
+import logging
 import secrets
+import time
 from typing import Optional
 from datetime import datetime, timedelta
 
+from django.conf import settings
 from django.db import transaction
 from django.db.models import Q
 from django.utils import timezone
+from redis.exceptions import RedisError
 
+from backend.access.events import notify_user_access_changed
 from backend.account.choices import EmailTypeChoices
 from backend.account.models import EmailToken, User, UserBan
 from backend.core.exceptions import (
@@ -13,6 +18,10 @@ from backend.core.exceptions import (
 )
 from backend.account.forms import RegisterForm
 from backend.account.tasks.email import enqueue_email
+from backend.core.apps import CoreConfig
+
+
+logger = logging.getLogger(__name__)
 
 
 TOKEN_EXPIRY = {
@@ -128,6 +137,8 @@ def ban_user(
             is_active=True,
         )
         user.deactivate()
+        transaction.on_commit(lambda: forget_ban_status(user))
+        notify_user_access_changed(user.id)
 
     return ban
 
@@ -136,6 +147,8 @@ def unban_user(*, user: User) -> User:
     with transaction.atomic():
         UserBan.objects.filter(user=user, is_active=True).update(is_active=False)
         user.activate()
+        transaction.on_commit(lambda: forget_ban_status(user))
+        notify_user_access_changed(user.id)
 
     return user
 
@@ -146,6 +159,8 @@ def lift_ban(*, ban: UserBan) -> None:
 
         if not UserBan.objects.filter(user=ban.user, is_active=True).exists():
             ban.user.activate()
+        transaction.on_commit(lambda: forget_ban_status(ban.user))
+        notify_user_access_changed(ban.user_id)
 
 
 def is_user_banned(user: User) -> bool:
@@ -157,3 +172,53 @@ def is_user_banned(user: User) -> bool:
         .filter(Q(expires_at__isnull=True) | Q(expires_at__gt=timezone.now()))
         .exists()
     )
+
+
+def _ban_status_key(user_id) -> str:
+    return f"user_banned:{user_id}"
+
+
+def is_user_banned_cached(user: User) -> bool:
+    """
+    `is_user_banned` behind a short-lived cache, for per-request permission checks.
+
+    The status is kept on the user object and in Redis (shared by all
+    workers) for BAN_STATUS_CACHE_SECONDS. Creating or lifting a ban drops
+    the shared entry; a ban that merely expires is noticed once the entry
+    does. Without Redis every call queries.
+    """
+    ttl = settings.BAN_STATUS_CACHE_SECONDS
+    current = time.monotonic()
+    local = getattr(user, "_ban_status_cache", None)
+    if local is not None and local[1] > current:
+        return local[0]
+
+    client = CoreConfig.get_sync_redis_client()
+    key = _ban_status_key(user.id)
+    try:
+        cached = client.get(key)
+    except (RedisError, OSError):
+        logger.warning("Ban status cache unavailable", exc_info=True)
+        client = cached = None
+
+    if cached is not None:
+        banned = cached == "1"
+    else:
+        banned = is_user_banned(user)
+        if client is not None:
+            try:
+                client.set(key, int(banned), ex=ttl)
+            except (RedisError, OSError):
+                logger.warning("Ban status cache unavailable", exc_info=True)
+
+    user._ban_status_cache = (banned, current + ttl)
+    return banned
+
+
+def forget_ban_status(user: User) -> None:
+    """Drop the cached ban status of a user, see `is_user_banned_cached`."""
+    user.__dict__.pop("_ban_status_cache", None)
+    try:
+        CoreConfig.get_sync_redis_client().delete(_ban_status_key(user.id))
+    except (RedisError, OSError):
+        logger.warning("Could not drop cached ban status", exc_info=True)
@@ -1,19 +1,46 @@
-from django.utils.timezone import now
+import time
+import uuid
 
-from backend.account.utils import get_inactivity_threshold, update_last_seen
+from django.conf import settings
+
+from backend.account.presence import record_activity
+
+# Users tracked by a worker before entries past the throttle are pruned
+_MAX_TRACKED_USERS = 10_000
 
 
 class LastSeenMiddleware:
+    """
+    Record activity in Redis; it is folded into `last_seen` periodically.
+
+    Each worker records a user at most once per PRESENCE_TTL / 2 seconds,
+    which is as fine as presence resolves activity anyway.
+    """
+
     def __init__(self, get_response):
         self.get_response = get_response
+        # User ID -> monotonic time activity was last recorded by this worker
+        self._recorded: dict[uuid.UUID, float] = {}
 
     def __call__(self, request):
         response = self.get_response(request)
 
         user = getattr(request, "user", None)
         if user and user.is_authenticated:
-            threshold = get_inactivity_threshold()
-            if not user.last_seen or (now() - user.last_seen) > threshold:
-                update_last_seen(user=user)
+            self._record(user.id)
 
         return response
+
+    def _record(self, user_id: uuid.UUID) -> None:
+        interval = settings.PRESENCE_TTL / 2
+        current = time.monotonic()
+        last = self._recorded.get(user_id)
+        if last is not None and current - last < interval:
+            return
+
+        if len(self._recorded) >= _MAX_TRACKED_USERS:
+            self._recorded = {
+                key: at for key, at in self._recorded.items() if current - at < interval
+            }
+        self._recorded[user_id] = current
+        record_activity(user_id)
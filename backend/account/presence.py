@@ -0,0 +1,50 @@
+import logging
+import time
+from datetime import datetime, timezone
+from typing import Optional
+
+from redis.exceptions import RedisError
+
+from backend.core.apps import CoreConfig
+
+
+logger = logging.getLogger(__name__)
+
+# Hash of user id -> unix time of the user's latest activity. Written on every
+# request and chat heartbeat instead of `User.last_seen`, and periodically
+# folded into that column by `backend.account.tasks.presence`.
+LAST_ACTIVITY_KEY = "presence:last_activity"
+
+
+def record_activity(user_id, at: Optional[float] = None) -> None:
+    """Mark a user as active now. Never raises when Redis is unavailable."""
+    try:
+        CoreConfig.get_sync_redis_client().hset(
+            LAST_ACTIVITY_KEY, str(user_id), at if at is not None else time.time()
+        )
+    except (RedisError, OSError):
+        logger.warning("Failed to record activity (redis unavailable)", exc_info=True)
+
+
+def drain_activity() -> dict[str, datetime]:
+    """Atomically take every recorded activity timestamp out of Redis."""
+    pipe = CoreConfig.get_sync_redis_client().pipeline(transaction=True)
+    pipe.hgetall(LAST_ACTIVITY_KEY)
+    pipe.delete(LAST_ACTIVITY_KEY)
+    entries, _ = pipe.execute()
+
+    return {
+        user_id: datetime.fromtimestamp(float(ts), tz=timezone.utc)
+        for user_id, ts in entries.items()
+    }
+
+
+def restore_activity(entries: dict[str, datetime]) -> None:
+    """Put drained timestamps back, without overwriting newer activity."""
+    if not entries:
+        return
+
+    pipe = CoreConfig.get_sync_redis_client().pipeline(transaction=False)
+    for user_id, last_seen in entries.items():
+        pipe.hsetnx(LAST_ACTIVITY_KEY, user_id, last_seen.timestamp())
+    pipe.execute()
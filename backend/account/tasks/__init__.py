@@ -1 +1 @@
-from . import email, moderation  # noqa: F401
+from . import email, moderation, presence  # noqa: F401
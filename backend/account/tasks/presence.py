@@ -0,0 +1,50 @@
+from celery import shared_task
+from django.conf import settings
+from django.db.utils import DatabaseError
+from redis.exceptions import RedisError
+from typing import Optional
+from backend.account.models import User
+from backend.account import presence
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def run_fold_last_seen(batch_size: Optional[int] = None):
+    """
+    Core logic for folding activity recorded in Redis into `User.last_seen`.
+    Separated from the task for easier testing and manual execution.
+    """
+    if batch_size is None:
+        batch_size = settings.LAST_SEEN_FOLD_BATCH_SIZE
+
+    entries = presence.drain_activity()
+    if not entries:
+        return 0
+
+    users = [
+        User(id=user_id, last_seen=last_seen) for user_id, last_seen in entries.items()
+    ]
+
+    try:
+        User.objects.bulk_update(users, ["last_seen"], batch_size=batch_size)
+    except DatabaseError:
+        presence.restore_activity(entries)
+        raise
+
+    logger.info(f"Folded last seen of {len(users)} users.")
+
+    return len(users)
+
+
+@shared_task(
+    bind=True,
+    autoretry_for=(DatabaseError, RedisError),
+    retry_backoff=True,
+    retry_kwargs={"max_retries": 5},
+)
+def fold_last_seen(self):
+    """
+    Celery task wrapper for folding recorded activity into last seen.
+    """
+    return run_fold_last_seen()
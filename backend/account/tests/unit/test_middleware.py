@@ -0,0 +1,29 @@
+import uuid
+from unittest import mock
+
+import pytest
+from django.http import HttpResponse
+from django.test import RequestFactory
+
+from backend.account.middleware import LastSeenMiddleware
+
+
+pytestmark = pytest.mark.unit
+
+
+@mock.patch("backend.account.middleware.record_activity")
+def test_activity_is_recorded_once_per_interval(mock_record, settings):
+    settings.PRESENCE_TTL = 60
+    middleware = LastSeenMiddleware(lambda request: HttpResponse())
+    request = RequestFactory().get("/")
+    request.user = mock.Mock(id=uuid.uuid4(), is_authenticated=True)
+
+    with mock.patch("backend.account.middleware.time.monotonic") as monotonic:
+        monotonic.return_value = 100.0
+        middleware(request)
+        monotonic.return_value = 129.0
+        middleware(request)
+        monotonic.return_value = 131.0
+        middleware(request)
+
+    assert mock_record.call_count == 2
@@ -1,6 +1,7 @@
 import pytest
 from django.test import TestCase
 from django.utils import timezone
+from backend.account import actions
 from backend.account.models import User, UserBan
 from backend.account.services import ModerationService
 from backend.core.exceptions import ValidationException
@@ -71,3 +72,15 @@ class ModerationServiceTests(TestCase):
         self.assertFalse(
             UserBan.objects.filter(user=self.user, is_active=True).exists()
         )
+
+    def test_ban_status_is_cached_until_ban_changes(self):
+        self.assertFalse(actions.is_user_banned_cached(self.user))
+        with self.assertNumQueries(0):
+            self.assertFalse(actions.is_user_banned_cached(self.user))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            ModerationService.ban_user(
+                user=self.user, banned_by=self.admin, reason="Spam"
+            )
+
+        self.assertTrue(actions.is_user_banned_cached(self.user))
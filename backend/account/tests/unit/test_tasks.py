@@ -6,6 +6,7 @@ from datetime import datetime, timedelta
 
 from backend.account.models import User, UserBan
 from backend.account.tasks.moderation import run_expire_user_bans
+from backend.account.tasks.presence import run_fold_last_seen
 
 
 pytestmark = pytest.mark.unit
@@ -88,3 +89,32 @@ class ExpireUserBansTests(TestCase):
 
         # Verify
         mock_lift_ban.assert_called_once_with(ban=ban)
+
+
+class FoldLastSeenTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(
+            username="testuser",
+            email="test@example.com",
+            name="Test User",
+            password="password",
+        )
+
+    @mock.patch("backend.account.tasks.presence.presence.drain_activity")
+    def test_fold_updates_last_seen(self, mock_drain):
+        last_seen = timezone.make_aware(datetime(2025, 1, 1, 12, 0, 0))
+        mock_drain.return_value = {str(self.user.id): last_seen}
+
+        count = run_fold_last_seen()
+
+        self.assertEqual(count, 1)
+        self.user.refresh_from_db()
+        self.assertEqual(self.user.last_seen, last_seen)
+
+    @mock.patch("backend.account.tasks.presence.presence.drain_activity")
+    def test_fold_without_activity_is_noop(self, mock_drain):
+        mock_drain.return_value = {}
+
+        self.assertEqual(run_fold_last_seen(), 0)
+        self.user.refresh_from_db()
+        self.assertIsNone(self.user.last_seen)
@@ -1,15 +1,17 @@
 from django.core.asgi import get_asgi_application
 from channels.routing import ProtocolTypeRouter, URLRouter
 from channels.security.websocket import AllowedHostsOriginValidator
+from backend.messaging.chat.lifespan import lifespan
 from backend.messaging.chat.routing import websocket_urlpatterns
-from backend.messaging.chat.middleware import JwtAuthMiddleware
+from backend.messaging.chat.middleware import AdmissionMiddleware, JwtAuthMiddleware
 
 
 application = ProtocolTypeRouter(
     {
         "http": get_asgi_application(),
+        "lifespan": lifespan,
         "websocket": AllowedHostsOriginValidator(
-            JwtAuthMiddleware(URLRouter(websocket_urlpatterns))
+            AdmissionMiddleware(JwtAuthMiddleware(URLRouter(websocket_urlpatterns)))
         ),
     }
 )
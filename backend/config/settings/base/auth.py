@@ -25,3 +25,7 @@ AUTHENTICATION_BACKENDS = [
     "backend.access.backends.SecureRulesBackend",
     "django.contrib.auth.backends.ModelBackend",
 ]
+
+# How long the ban status checked on every permission check is cached, per
+# user object and in Redis. Banning or unbanning a user drops the entry.
+BAN_STATUS_CACHE_SECONDS = env.int("BAN_STATUS_CACHE_SECONDS", default=30)
@@ -111,19 +111,137 @@ DATABASES = {
     ),
 }
 
+# JSON encoding of chat frames, stream entries and GraphQL responses:
+# "orjson", "stdlib", or "auto" to use orjson when installed
+JSON_CODEC = env("JSON_CODEC", default="auto")
+
 # Server
 SERVER_PORT = env.int("SERVER_PORT", default=8000)
 SERVER_HOST = env("SERVER_HOST", default="127.0.0.1")
 
 # Messaging
 
-# Max messages per second per user to prevent abuse (0 means no limit)
-MAX_MESSAGES_PER_SEC = 0
+# Max messages per second per user across all rooms (0 means no limit).
+# Per-room slow mode and room/connection limits are configured on Room.
+MAX_MESSAGES_PER_SEC = env.int("MAX_MESSAGES_PER_SEC", default=0)
+
+# How chat messages received over WebSocket are persisted:
+#   "sync"         - validate and INSERT each message before broadcasting it
+#   "write_behind" - broadcast first, persist in per-worker batches
+#   "stream"       - append to a durable Redis stream, broadcast, and let the
+#                    `persist_chat_stream` worker INSERT stream entries in batches
+CHAT_INGESTION_MODE = env("CHAT_INGESTION_MODE", default="sync")
+
+CHAT_WRITE_BEHIND = {
+    # Flush once this many messages are buffered...
+    "MAX_BATCH_SIZE": env.int("CHAT_WRITE_BEHIND_MAX_BATCH_SIZE", default=100),
+    # ...or this long after the first buffered message, whichever comes first
+    "FLUSH_INTERVAL_MS": env.int("CHAT_WRITE_BEHIND_FLUSH_INTERVAL_MS", default=10),
+}
+
+# Worker persisting the "stream" ingestion log (`manage.py persist_chat_stream`).
+# Entries left unacknowledged by a crashed worker for
+# REDIS_STREAMS["CONSUMER_TIMEOUT"] seconds are claimed by another one.
+CHAT_STREAM_PERSISTER = {
+    "STREAM_KEY": env("CHAT_STREAM_PERSISTER_STREAM_KEY", default="chat_ingest"),
+    "GROUP": env("CHAT_STREAM_PERSISTER_GROUP", default="message_persister"),
+    # Entries read and inserted per batch
+    "BATCH_SIZE": env.int("CHAT_STREAM_PERSISTER_BATCH_SIZE", default=500),
+    # How long an idle worker blocks waiting for new entries
+    "BLOCK_MS": env.int("CHAT_STREAM_PERSISTER_BLOCK_MS", default=1000),
+    # Consumer name is "<host>-<index>"; give each worker on a host its own
+    # index so a restarted worker retries its own pending entries first
+    "CONSUMER_INDEX": env.int("CHAT_STREAM_PERSISTER_CONSUMER_INDEX", default=0),
+    # Edits and deletes wait up to this long for a message still in the stream
+    # to be stored, and messages count as pending for at most PENDING_TTL_SECONDS
+    "PENDING_WAIT_MS": env.int("CHAT_STREAM_PERSISTER_PENDING_WAIT_MS", default=2000),
+    "PENDING_TTL_SECONDS": env.int(
+        "CHAT_STREAM_PERSISTER_PENDING_TTL_SECONDS", default=60
+    ),
+}
+
+# Read acks ("read up to message X") sent over WebSocket are coalesced per
+# participant and written to the read watermarks in one upsert per batch
+CHAT_READ_RECEIPTS = {
+    "MAX_BATCH_SIZE": env.int("CHAT_READ_RECEIPTS_MAX_BATCH_SIZE", default=500),
+    "FLUSH_INTERVAL_MS": env.int("CHAT_READ_RECEIPTS_FLUSH_INTERVAL_MS", default=1000),
+    # Acks of messages not stored yet are retried with this many later batches
+    "MAX_RETRIES": env.int("CHAT_READ_RECEIPTS_MAX_RETRIES", default=5),
+}
+
+# Broadcasts to rooms with at least PUBSUB_MIN_CONNECTIONS live connections are
+# published once per room over Redis pub/sub, and each worker delivers them to
+# its own connections, instead of one channel layer message per connection.
+# 0 disables pub/sub fan-out.
+CHAT_FANOUT = {
+    "PUBSUB_MIN_CONNECTIONS": env.int(
+        "CHAT_FANOUT_PUBSUB_MIN_CONNECTIONS", default=500
+    ),
+    # How long a worker reuses a room's connection count before recounting
+    "SIZE_CACHE_SECONDS": env.int("CHAT_FANOUT_SIZE_CACHE_SECONDS", default=5),
+}
+
+# Per-connection queue of frames waiting to be written to a chat WebSocket
+CHAT_OUTBOUND = {
+    "MAX_FRAMES": env.int("CHAT_OUTBOUND_MAX_FRAMES", default=256),
+    # What to do when a slow client's queue is full: "drop_oldest",
+    # "coalesce" (drop superseded edits/deletes first) or "disconnect"
+    # (close with 4008, telling the client which stream IDs to resume from)
+    "OVERFLOW_POLICY": env("CHAT_OUTBOUND_OVERFLOW_POLICY", default="drop_oldest"),
+    # Clients connecting with `?batch=1` get the events of this window as a
+    # single JSON array frame
+    "BATCH_WINDOW_MS": env.int("CHAT_OUTBOUND_BATCH_WINDOW_MS", default=5),
+    "MAX_BATCH_FRAMES": env.int("CHAT_OUTBOUND_MAX_BATCH_FRAMES", default=50),
+}
+
+# Admission control of chat WebSocket handshakes, see AdmissionMiddleware.
+# Rejected clients are closed with code 4029 and should retry after the
+# number of seconds in the close reason. 0 disables a limit. The handshake
+# limits are counted in memory by each worker process, so the cluster admits
+# up to their value times the number of processes; only the socket limit is
+# shared through Redis.
+CHAT_ADMISSION = {
+    # Handshakes in progress per worker process...
+    "MAX_HANDSHAKES_PER_PROCESS": env.int(
+        "CHAT_ADMISSION_MAX_HANDSHAKES_PER_PROCESS", default=50
+    ),
+    # ...and how long further ones wait for a slot before being rejected
+    "QUEUE_TIMEOUT_MS": env.int("CHAT_ADMISSION_QUEUE_TIMEOUT_MS", default=2000),
+    # Handshakes in progress per user, also per worker process
+    "MAX_USER_HANDSHAKES_PER_PROCESS": env.int(
+        "CHAT_ADMISSION_MAX_USER_HANDSHAKES_PER_PROCESS", default=2
+    ),
+    # Open sockets per user across all workers
+    "MAX_SOCKETS_PER_USER": env.int("CHAT_ADMISSION_MAX_SOCKETS_PER_USER", default=10),
+    # Retry hint, jittered up to twice this
+    "RETRY_AFTER_SECONDS": env.int("CHAT_ADMISSION_RETRY_AFTER_SECONDS", default=5),
+}
+
+# Rooms with at least this many connections on a worker get their own
+# `chat_room_open_sockets` series (0 disables the per-room gauge)
+CHAT_ROOM_METRICS_MIN_SOCKETS = env.int("CHAT_ROOM_METRICS_MIN_SOCKETS", default=100)
+
+# Max rooms a single multiplexed chat connection (`ws/chat`) may subscribe to
+CHAT_MAX_SUBSCRIPTIONS = env.int("CHAT_MAX_SUBSCRIPTIONS", default=100)
+
+# Max operations in one chat `batch` frame. A batch is charged against the
+# message rate limits as that many messages.
+CHAT_MAX_BATCH_OPERATIONS = env.int("CHAT_MAX_BATCH_OPERATIONS", default=100)
+
+# Max events replayed to a client resuming with `?last_event_id=<stream id>`
+CHAT_REPLAY_MAX_EVENTS = env.int("CHAT_REPLAY_MAX_EVENTS", default=500)
+
+# Messages per page of the `messages` GraphQL connection when the client asks
+# for neither `first` nor `last`, and the most it may ask for
+MESSAGE_HISTORY_PAGE_SIZE = env.int("MESSAGE_HISTORY_PAGE_SIZE", default=50)
+MESSAGE_HISTORY_MAX_PAGE_SIZE = env.int("MESSAGE_HISTORY_MAX_PAGE_SIZE", default=100)
+
+# Seconds without a heartbeat after which a chat connection is considered gone.
+# Clients should send a heartbeat frame at least every PRESENCE_TTL / 2 seconds.
+PRESENCE_TTL = env.int("PRESENCE_TTL", default=60)
 
-# Time after which a user is considered inactive in seconds (for last seen updates)
-LAST_SEEN_INACTIVITY_THRESHOLD = env.int(
-    "LAST_SEEN_INACTIVITY_THRESHOLD", default=60 * 5
-)  # 5 minutes
+# Users updated per query when activity is folded into last_seen (every minute)
+LAST_SEEN_FOLD_BATCH_SIZE = env.int("LAST_SEEN_FOLD_BATCH_SIZE", default=1000)
 
 # File upload
 MAX_FILE_SIZE_MB = 10
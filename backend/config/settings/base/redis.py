@@ -3,9 +3,15 @@ from celery.schedules import crontab
 
 # Redis Streams
 REDIS_STREAMS = {
-    "MAX_STREAM_LENGTH": 10000,
-    "MESSAGE_TTL": 86400,
+    # Room event streams are trimmed (approximately) to this many entries...
+    "MAX_STREAM_LENGTH": env.int("REDIS_STREAMS_MAX_STREAM_LENGTH", default=10000),
+    # ...and to entries younger than this many seconds; streams of rooms idle
+    # for that long expire altogether. Older events are replayed from Postgres.
+    "MESSAGE_TTL": env.int("REDIS_STREAMS_MESSAGE_TTL", default=86400),
     "CONSUMER_TIMEOUT": 300,
+    # Encoding of new room stream entries: "json", "zlib" or "msgpack".
+    # Entries of every encoding stay readable, so it can be changed any time.
+    "ENCODING": env("REDIS_STREAMS_ENCODING", default="json"),
 }
 
 REDIS_HOST = env("REDIS_HOST", default="localhost")
@@ -42,4 +48,8 @@ CELERY_BEAT_SCHEDULE = {
         "task": "backend.account.tasks.moderation.expire_user_bans",
         "schedule": crontab(minute=0),
     },
+    "fold_last_seen": {
+        "task": "backend.account.tasks.presence.fold_last_seen",
+        "schedule": crontab(),
+    },
 }
@@ -1,5 +1,6 @@
 from typing import Optional
 
+import redis
 import redis.asyncio as aioredis
 from django.conf import settings
 from django.apps import AppConfig
@@ -11,8 +12,11 @@ class CoreConfig(AppConfig):
     label = "core"
     verbose_name = "Core"
 
-    # Shared Redis client for the whole app, lazily initialized on first use.
+    # Shared Redis clients for the whole app, lazily initialized on first use.
     _redis_client: Optional[aioredis.Redis] = None
+    _sync_redis_client: Optional[redis.Redis] = None
+    _binary_redis_client: Optional[aioredis.Redis] = None
+    _sync_binary_redis_client: Optional[redis.Redis] = None
 
     @classmethod
     def get_redis_client(cls) -> aioredis.Redis:
@@ -27,3 +31,48 @@ class CoreConfig(AppConfig):
                 socket_connect_timeout=5.0,
             )
         return cls._redis_client
+
+    @classmethod
+    def get_binary_redis_client(cls) -> aioredis.Redis:
+        """Client returning raw bytes, for values that may not be UTF-8 text."""
+        if cls._binary_redis_client is None:
+            cls._binary_redis_client = aioredis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                decode_responses=False,
+                max_connections=20,
+                socket_timeout=5.0,
+                socket_connect_timeout=5.0,
+            )
+        return cls._binary_redis_client
+
+    @classmethod
+    def get_sync_redis_client(cls) -> redis.Redis:
+        """Blocking client for sync code paths (GraphQL resolvers, tasks)."""
+        if cls._sync_redis_client is None:
+            cls._sync_redis_client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                decode_responses=True,
+                max_connections=20,
+                socket_timeout=5.0,
+                socket_connect_timeout=5.0,
+            )
+        return cls._sync_redis_client
+
+    @classmethod
+    def get_sync_binary_redis_client(cls) -> redis.Redis:
+        """Blocking counterpart of `get_binary_redis_client`."""
+        if cls._sync_binary_redis_client is None:
+            cls._sync_binary_redis_client = redis.Redis(
+                host=settings.REDIS_HOST,
+                port=settings.REDIS_PORT,
+                db=settings.REDIS_DB,
+                decode_responses=False,
+                max_connections=20,
+                socket_timeout=5.0,
+                socket_connect_timeout=5.0,
+            )
+        return cls._sync_binary_redis_client
@@ -0,0 +1,90 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Generic, Optional, TypeVar
+
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+class AsyncBatcher(Generic[T]):
+    """
+    Per-process write buffer that hands items to `flush_fn` in batches.
+
+    A batch is flushed as soon as `max_size` items are pending, or
+    `interval` seconds after the first item of the batch was added,
+    whichever comes first. Items stay `buffered` until their batch has been
+    handed over. Must be used from a running event loop.
+    """
+
+    def __init__(
+        self,
+        flush_fn: Callable[[list[T]], Awaitable[None]],
+        *,
+        max_size: int,
+        interval: float,
+    ):
+        self._flush_fn = flush_fn
+        self.max_size = max_size
+        self.interval = interval
+        self._pending: list[T] = []
+        # Batches being flushed, with futures resolved once they are
+        self._inflight: list[tuple[list[T], asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks: set[asyncio.Task] = set()
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    @property
+    def pending(self) -> list[T]:
+        return self._pending
+
+    @property
+    def buffered(self) -> list[T]:
+        """Items not flushed yet: pending ones and those of in-flight batches."""
+        inflight = [item for batch, _done in self._inflight for item in batch]
+        return inflight + self._pending
+
+    def add(self, item: T) -> None:
+        self._pending.append(item)
+
+        if len(self._pending) >= self.max_size:
+            self._schedule_flush()
+        elif self._timer is None:
+            loop = asyncio.get_running_loop()
+            self._timer = loop.call_later(self.interval, self._schedule_flush)
+
+    def _schedule_flush(self) -> None:
+        task = asyncio.ensure_future(self.flush())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def flush(self) -> None:
+        """
+        Flush everything that is currently pending, and wait for batches
+        already being flushed.
+        """
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        earlier = [done for _batch, done in self._inflight]
+        if self._pending:
+            await self._flush_batch()
+        if earlier:
+            await asyncio.wait(earlier)
+
+    async def _flush_batch(self) -> None:
+        batch, self._pending = self._pending, []
+        inflight = (batch, asyncio.get_running_loop().create_future())
+        self._inflight.append(inflight)
+
+        try:
+            await self._flush_fn(batch)
+        except Exception:
+            logger.exception(f"Failed to flush batch of {len(batch)} items")
+        finally:
+            self._inflight.remove(inflight)
+            inflight[1].set_result(None)
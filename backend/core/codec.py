@@ -0,0 +1,106 @@
+"""
+JSON encoding of WebSocket frames, stream entries and GraphQL responses.
+
+orjson is used when installed, the standard library otherwise; JSON_CODEC
+selects one explicitly. Both encode UUIDs as hyphenated strings and dates
+and times in ISO 8601, so callers hand over model values as they are.
+Output is compact, without spaces after separators.
+"""
+
+import json
+import uuid
+from datetime import date, time
+from functools import cache
+from typing import Any, Callable, NamedTuple, Union
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Raised by `loads` for malformed input, whichever codec is used
+DecodeError = json.JSONDecodeError
+
+
+def to_primitive(value: Any) -> Any:
+    """JSON-compatible form of values the encoders don't support directly."""
+    if isinstance(value, uuid.UUID):
+        return str(value)
+    if isinstance(value, (date, time)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class JsonCodec(NamedTuple):
+    name: str
+    dumpb: Callable[[Any], bytes]
+    dumps: Callable[[Any], str]
+    loads: Callable[[Union[str, bytes]], Any]
+
+
+_stdlib_encoder = json.JSONEncoder(
+    separators=(",", ":"), ensure_ascii=False, default=to_primitive
+)
+
+
+def _stdlib_dumps(obj: Any) -> str:
+    return _stdlib_encoder.encode(obj)
+
+
+def _stdlib_dumpb(obj: Any) -> bytes:
+    return _stdlib_encoder.encode(obj).encode()
+
+
+def _orjson_dumpb(obj: Any) -> bytes:
+    return orjson.dumps(obj, default=to_primitive)
+
+
+def _orjson_dumps(obj: Any) -> str:
+    return orjson.dumps(obj, default=to_primitive).decode()
+
+
+STDLIB = JsonCodec("stdlib", _stdlib_dumpb, _stdlib_dumps, json.loads)
+
+ORJSON = (
+    JsonCodec("orjson", _orjson_dumpb, _orjson_dumps, orjson.loads)
+    if orjson is not None
+    else None
+)
+
+
+@cache
+def _resolve(name: str) -> JsonCodec:
+    if name == "auto":
+        return ORJSON or STDLIB
+    if name == "stdlib":
+        return STDLIB
+    if name == "orjson":
+        if ORJSON is None:
+            raise ImproperlyConfigured("JSON_CODEC is 'orjson' but it isn't installed")
+        return ORJSON
+    raise ImproperlyConfigured(
+        f"Unknown JSON_CODEC {name!r}, expected 'auto', 'orjson' or 'stdlib'"
+    )
+
+
+def get_codec() -> JsonCodec:
+    """The configured codec."""
+    return _resolve(settings.JSON_CODEC)
+
+
+def dumps(obj: Any) -> str:
+    return get_codec().dumps(obj)
+
+
+def dumpb(obj: Any) -> bytes:
+    """`dumps` as UTF-8 bytes, which orjson produces without a copy."""
+    return get_codec().dumpb(obj)
+
+
+def loads(data: Union[str, bytes]) -> Any:
+    """Decode JSON text or UTF-8 bytes, raising DecodeError if malformed."""
+    return get_codec().loads(data)
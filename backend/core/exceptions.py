@@ -11,6 +11,7 @@ class ErrorCode(StrEnum):
     ALREADY_EXISTS = "ALREADY_EXISTS"
     INTERNAL_ERROR = "INTERNAL_ERROR"
     BAD_REQUEST = "BAD_REQUEST"
+    RATE_LIMITED = "RATE_LIMITED"
 
 
 # Rework to accept different error codes
@@ -78,3 +79,9 @@ class BadRequestException(DomainException):
     """Exception raised for bad requests."""
 
     code = ErrorCode.BAD_REQUEST
+
+
+class RateLimitException(DomainException):
+    """Exception raised when a client exceeds its rate limit."""
+
+    code = ErrorCode.RATE_LIMITED
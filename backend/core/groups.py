@@ -0,0 +1,6 @@
+import uuid
+
+
+def room_group_name(room_id: uuid.UUID | str) -> str:
+    """Channel layer group that every chat connection of a room joins."""
+    return f"chat_{room_id}"
@@ -0,0 +1,223 @@
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, NamedTuple, Optional
+
+from prometheus_client import Counter
+from redis.exceptions import RedisError
+
+from backend.core.apps import CoreConfig
+
+
+logger = logging.getLogger(__name__)
+
+RATE_LIMIT_REDIS_ERRORS_TOTAL = Counter(
+    "rate_limit_redis_errors_total",
+    "Total rate limit checks admitted without Redis because it failed.",
+)
+
+
+# Refills and charges every bucket in KEYS atomically, using the Redis clock
+# so all workers agree on time. A request is admitted only if every bucket
+# has `cost` tokens left; `debt` charges tokens already spent locally.
+#
+# KEYS[i] - bucket hash
+# ARGV[1] - cost
+# ARGV[2 + 3 * (i - 1)...] - rate (tokens/s), burst (capacity), debt
+# Returns {allowed, remaining tokens of each bucket as strings}.
+TOKEN_BUCKET_SCRIPT = """
+local clock = redis.call('TIME')
+local now = tonumber(clock[1]) + tonumber(clock[2]) / 1000000
+local cost = tonumber(ARGV[1])
+local levels = {}
+local allowed = 1
+
+for i, key in ipairs(KEYS) do
+    local base = 2 + (i - 1) * 3
+    local rate = tonumber(ARGV[base])
+    local burst = tonumber(ARGV[base + 1])
+    local debt = tonumber(ARGV[base + 2])
+    local state = redis.call('HMGET', key, 'tokens', 'ts')
+    local level = tonumber(state[1]) or burst
+    local elapsed = math.max(0, now - (tonumber(state[2]) or now))
+    level = math.max(-burst, math.min(burst, level + elapsed * rate) - debt)
+    levels[i] = level
+    if level < cost then
+        allowed = 0
+    end
+end
+
+local result = {allowed}
+for i, key in ipairs(KEYS) do
+    local base = 2 + (i - 1) * 3
+    local rate = tonumber(ARGV[base])
+    local burst = tonumber(ARGV[base + 1])
+    if allowed == 1 then
+        levels[i] = levels[i] - cost
+    end
+    redis.call('HSET', key, 'tokens', tostring(levels[i]), 'ts', tostring(now))
+    redis.call('PEXPIRE', key, math.ceil(burst / rate * 1000) + 1000)
+    result[i + 1] = tostring(levels[i])
+end
+return result
+"""
+
+
+class Quota(NamedTuple):
+    """A token bucket: `burst` tokens of capacity, refilled at `rate` tokens/s."""
+
+    key: str
+    rate: float
+    burst: float
+
+
+class TokenBucket:
+    """In-process token bucket, for quotas that never leave one process."""
+
+    __slots__ = ("rate", "burst", "tokens", "updated_at", "debt")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated_at = time.monotonic()
+        # Tokens consumed locally that the shared bucket hasn't been charged yet
+        self.debt = 0.0
+
+    def refill(self) -> float:
+        current = time.monotonic()
+        self.tokens = min(
+            self.burst, self.tokens + (current - self.updated_at) * self.rate
+        )
+        self.updated_at = current
+        return self.tokens
+
+    def consume(self, cost: float = 1, reserve: float = 0) -> bool:
+        """Take `cost` tokens if at least `reserve` tokens would remain."""
+        if self.refill() - cost < reserve:
+            return False
+        self.tokens -= cost
+        return True
+
+    def refund(self, cost: float = 1) -> None:
+        """Give back tokens taken for a request that was denied elsewhere."""
+        self.tokens = min(self.burst, self.tokens + cost)
+
+
+class TokenBucketLimiter:
+    """
+    Shared token-bucket rate limiter backed by a Redis Lua script.
+
+    All quotas of a request are checked and charged in a single round trip.
+    A local mirror of each bucket admits requests without touching Redis
+    while the client stays above `local_headroom` of its burst; the tokens
+    spent that way are charged to Redis with the next round trip. When Redis
+    is unavailable the limiter fails open.
+    """
+
+    def __init__(self, local_headroom: float = 0.5, max_local_buckets: int = 10_000):
+        self.local_headroom = local_headroom
+        self.max_local_buckets = max_local_buckets
+        self._local: OrderedDict[str, TokenBucket] = OrderedDict()
+        self._scripts: dict[int, Any] = {}
+
+    def _bucket(self, quota: Quota) -> TokenBucket:
+        bucket = self._local.get(quota.key)
+        if bucket is None or (bucket.rate, bucket.burst) != (quota.rate, quota.burst):
+            bucket = TokenBucket(quota.rate, quota.burst)
+            self._local[quota.key] = bucket
+            if len(self._local) > self.max_local_buckets:
+                self._local.popitem(last=False)
+        else:
+            self._local.move_to_end(quota.key)
+        return bucket
+
+    def _admit_locally(self, buckets: list[TokenBucket], cost: float) -> bool:
+        if not all(
+            bucket.refill() - cost >= bucket.burst * self.local_headroom
+            for bucket in buckets
+        ):
+            return False
+
+        for bucket in buckets:
+            bucket.tokens -= cost
+            bucket.debt += cost
+        return True
+
+    def _script(self, client):
+        script = self._scripts.get(id(client))
+        if script is None:
+            script = self._scripts[id(client)] = client.register_script(
+                TOKEN_BUCKET_SCRIPT
+            )
+        return script
+
+    @staticmethod
+    def _script_args(
+        quotas: list[Quota], buckets: list[TokenBucket], cost: float
+    ) -> tuple[list[str], list[float], list[float]]:
+        debts = [bucket.debt for bucket in buckets]
+        args: list[float] = [cost]
+        for quota, debt in zip(quotas, debts):
+            args.extend((quota.rate, quota.burst, debt))
+        return [quota.key for quota in quotas], args, debts
+
+    @staticmethod
+    def _apply_result(
+        buckets: list[TokenBucket], debts: list[float], result: list
+    ) -> bool:
+        for bucket, debt, remaining in zip(buckets, debts, result[1:]):
+            bucket.debt -= debt
+            bucket.tokens = float(remaining)
+        return int(result[0]) == 1
+
+    async def ahit(self, quotas: list[Quota], cost: float = 1) -> bool:
+        """Charge `cost` against every quota, returns False if any is exhausted."""
+        if not quotas:
+            return True
+
+        buckets = [self._bucket(quota) for quota in quotas]
+        if self._admit_locally(buckets, cost):
+            return True
+
+        keys, args, debts = self._script_args(quotas, buckets, cost)
+        client = CoreConfig.get_redis_client()
+        try:
+            result = await self._script(client)(keys=keys, args=args, client=client)
+        except (RedisError, OSError):
+            logger.warning("Rate limit check failed (redis unavailable)", exc_info=True)
+            RATE_LIMIT_REDIS_ERRORS_TOTAL.inc()
+            return True
+
+        return self._apply_result(buckets, debts, result)
+
+    def hit(self, quotas: list[Quota], cost: float = 1) -> bool:
+        """Synchronous variant of `ahit` for WSGI code paths."""
+        if not quotas:
+            return True
+
+        buckets = [self._bucket(quota) for quota in quotas]
+        if self._admit_locally(buckets, cost):
+            return True
+
+        keys, args, debts = self._script_args(quotas, buckets, cost)
+        client = CoreConfig.get_sync_redis_client()
+        try:
+            result = self._script(client)(keys=keys, args=args, client=client)
+        except (RedisError, OSError):
+            logger.warning("Rate limit check failed (redis unavailable)", exc_info=True)
+            RATE_LIMIT_REDIS_ERRORS_TOTAL.inc()
+            return True
+
+        return self._apply_result(buckets, debts, result)
+
+
+_limiter: Optional[TokenBucketLimiter] = None
+
+
+def get_rate_limiter() -> TokenBucketLimiter:
+    """Process-wide limiter, so the local bucket mirror is shared."""
+    global _limiter
+    if _limiter is None:
+        _limiter = TokenBucketLimiter()
+    return _limiter
@@ -0,0 +1,85 @@
+import asyncio
+
+import pytest
+from asgiref.sync import async_to_sync
+
+from backend.core.batching import AsyncBatcher
+
+
+pytestmark = pytest.mark.unit
+
+
+def test_batcher_flushes_when_full():
+    flushed: list[list[int]] = []
+
+    async def flush(items):
+        flushed.append(items)
+
+    async def run():
+        batcher = AsyncBatcher(flush, max_size=3, interval=60)
+        for i in range(3):
+            batcher.add(i)
+        await asyncio.sleep(0)
+
+        assert flushed == [[0, 1, 2]]
+        assert len(batcher) == 0
+
+    async_to_sync(run)()
+
+
+def test_batcher_flushes_after_interval():
+    flushed: list[list[int]] = []
+
+    async def flush(items):
+        flushed.append(items)
+
+    async def run():
+        batcher = AsyncBatcher(flush, max_size=100, interval=0.01)
+        batcher.add(1)
+        batcher.add(2)
+        assert flushed == []
+
+        await asyncio.sleep(0.05)
+        assert flushed == [[1, 2]]
+
+    async_to_sync(run)()
+
+
+def test_batcher_survives_flush_errors():
+    async def flush(items):
+        raise RuntimeError("boom")
+
+    async def run():
+        batcher = AsyncBatcher(flush, max_size=10, interval=60)
+        batcher.add(1)
+        await batcher.flush()
+
+        assert len(batcher) == 0
+
+    async_to_sync(run)()
+
+
+def test_batcher_keeps_inflight_batches_visible():
+    release = asyncio.Event()
+    flushed: list[list[int]] = []
+
+    async def flush(items):
+        await release.wait()
+        flushed.append(items)
+
+    async def run():
+        batcher = AsyncBatcher(flush, max_size=1, interval=60)
+        batcher.add(1)
+        await asyncio.sleep(0)
+        assert batcher.buffered == [1]
+
+        waiting = asyncio.ensure_future(batcher.flush())
+        await asyncio.sleep(0)
+        assert not waiting.done()
+
+        release.set()
+        await waiting
+        assert flushed == [[1]]
+        assert batcher.buffered == []
+
+    async_to_sync(run)()
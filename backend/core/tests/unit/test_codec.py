@@ -0,0 +1,44 @@
+import uuid
+from datetime import datetime, timezone
+
+import pytest
+
+from backend.core import codec
+
+
+pytestmark = pytest.mark.unit
+
+MESSAGE_ID = uuid.UUID("2f0c9f4e-7d0a-4c1e-9a43-0b6f5a7c1d2e")
+CREATED_AT = datetime(2025, 1, 2, 3, 4, 5, 678000, tzinfo=timezone.utc)
+
+CODECS = [codec.STDLIB] + ([codec.ORJSON] if codec.ORJSON is not None else [])
+
+
+@pytest.mark.parametrize("json_codec", CODECS, ids=lambda c: c.name)
+def test_codecs_encode_model_values_alike(json_codec):
+    event = {"id": MESSAGE_ID, "created_at": CREATED_AT, "body": "Zażółć"}
+
+    assert json_codec.loads(json_codec.dumpb(event)) == {
+        "id": str(MESSAGE_ID),
+        "created_at": CREATED_AT.isoformat(),
+        "body": "Zażółć",
+    }
+    assert json_codec.dumps(event) == json_codec.dumpb(event).decode()
+
+
+@pytest.mark.parametrize("json_codec", CODECS, ids=lambda c: c.name)
+def test_codecs_raise_decode_error_for_malformed_input(json_codec):
+    with pytest.raises(codec.DecodeError):
+        json_codec.loads("{not json")
+
+
+def test_unsupported_values_raise_type_error():
+    with pytest.raises(TypeError):
+        codec.to_primitive(object())
+
+
+def test_stdlib_codec_can_be_selected(settings):
+    settings.JSON_CODEC = "stdlib"
+
+    assert codec.get_codec() is codec.STDLIB
+    assert codec.dumps({"id": MESSAGE_ID}) == f'{{"id":"{MESSAGE_ID}"}}'
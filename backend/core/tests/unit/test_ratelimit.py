@@ -0,0 +1,104 @@
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from backend.core.apps import CoreConfig
+from backend.core.ratelimit import Quota, TokenBucket, TokenBucketLimiter
+
+
+pytestmark = pytest.mark.unit
+
+
+class FakeScript:
+    def __init__(self, result=None, error=None):
+        self.result = result
+        self.error = error
+        self.calls: list[tuple[list, list]] = []
+
+    def __call__(self, keys, args, client=None):
+        self.calls.append((keys, args))
+        if self.error is not None:
+            raise self.error
+        return self.result
+
+
+class FakeSyncRedis:
+    def __init__(self, script: FakeScript):
+        self.script = script
+
+    def register_script(self, source):
+        return self.script
+
+
+def _patch_client(monkeypatch, script: FakeScript) -> None:
+    client = FakeSyncRedis(script)
+    monkeypatch.setattr(
+        CoreConfig, "get_sync_redis_client", classmethod(lambda cls: client)
+    )
+
+
+def test_token_bucket_consumes_up_to_burst():
+    bucket = TokenBucket(rate=0.001, burst=2)
+
+    assert bucket.consume() is True
+    assert bucket.consume() is True
+    assert bucket.consume() is False
+
+
+def test_token_bucket_refund_is_capped_at_burst():
+    bucket = TokenBucket(rate=0.001, burst=2)
+    bucket.consume()
+
+    bucket.refund()
+    bucket.refund()
+
+    assert bucket.tokens == 2
+
+
+def test_token_bucket_respects_reserve():
+    bucket = TokenBucket(rate=0.001, burst=4)
+
+    assert bucket.consume(reserve=2) is True
+    assert bucket.consume(reserve=2) is True
+    assert bucket.consume(reserve=2) is False
+
+
+def test_limiter_admits_locally_while_far_below_limit(monkeypatch):
+    script = FakeScript(result=[1, "0"])
+    _patch_client(monkeypatch, script)
+    limiter = TokenBucketLimiter(local_headroom=0.5)
+    quota = Quota("rl:test", rate=0.001, burst=10)
+
+    for _ in range(5):
+        assert limiter.hit([quota]) is True
+
+    assert script.calls == []
+
+
+def test_limiter_charges_local_debt_on_next_round_trip(monkeypatch):
+    script = FakeScript(result=[1, "3"])
+    _patch_client(monkeypatch, script)
+    limiter = TokenBucketLimiter(local_headroom=0.5)
+    quota = Quota("rl:test", rate=0.001, burst=10)
+
+    for _ in range(6):
+        limiter.hit([quota])
+
+    assert len(script.calls) == 1
+    keys, args = script.calls[0]
+    assert keys == ["rl:test"]
+    # cost, then rate, burst and the 5 tokens spent locally
+    assert args == [1, 0.001, 10, 5]
+
+
+def test_limiter_rejects_when_shared_bucket_is_empty(monkeypatch):
+    _patch_client(monkeypatch, FakeScript(result=[0, "0"]))
+    limiter = TokenBucketLimiter()
+
+    assert limiter.hit([Quota("rl:test", rate=1, burst=1)]) is False
+
+
+def test_limiter_fails_open_when_redis_is_unavailable(monkeypatch):
+    _patch_client(monkeypatch, FakeScript(error=RedisConnectionError()))
+    limiter = TokenBucketLimiter()
+
+    assert limiter.hit([Quota("rl:test", rate=1, burst=1)]) is True
@@ -1,4 +1,5 @@
 from backend.graphql.account.dataloaders import UserLoader
+from backend.graphql.messaging.dataloaders import SeenByLoader, UnreadCountLoader
 
 
 class GQLDataLoaderRegistry:
@@ -18,3 +19,15 @@ class GQLDataLoaderRegistry:
         if "user" not in self._cache:
             self._cache["user"] = UserLoader()
         return self._cache["user"]
+
+    @property
+    def seen_by(self):
+        if "seen_by" not in self._cache:
+            self._cache["seen_by"] = SeenByLoader()
+        return self._cache["seen_by"]
+
+    @property
+    def unread_count(self):
+        if "unread_count" not in self._cache:
+            self._cache["unread_count"] = UnreadCountLoader()
+        return self._cache["unread_count"]
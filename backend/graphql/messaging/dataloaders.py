@@ -0,0 +1,43 @@
+from collections import defaultdict
+
+from graphql_sync_dataloaders import SyncDataLoader
+
+from backend.account.models import User
+from backend.messaging.models import Message
+from backend.messaging.services import MessageService
+from backend.room.models import Room
+
+
+class SeenByLoader:
+    """Batches `MessageType.seen_by` across the messages of a response."""
+
+    def __init__(self):
+        self._loader = SyncDataLoader(self._batch_load)
+
+    def _batch_load(self, messages: list[Message]) -> list[list[User]]:
+        seen_by = MessageService.get_seen_by_many(messages)
+        return [seen_by[message.id] for message in messages]
+
+    def load(self, message: Message):
+        return self._loader.load(message)
+
+
+class UnreadCountLoader:
+    """Batches `RoomType.unread_count` across the rooms of a response."""
+
+    def __init__(self):
+        self._loader = SyncDataLoader(self._batch_load)
+
+    def _batch_load(self, keys: list[tuple[User, Room]]) -> list[int]:
+        rooms_by_user: dict[User, list[Room]] = defaultdict(list)
+        for user, room in keys:
+            rooms_by_user[user].append(room)
+
+        counts = {
+            user.id: MessageService.get_unread_counts(user, rooms)
+            for user, rooms in rooms_by_user.items()
+        }
+        return [counts[user.id][room.id] for user, room in keys]
+
+    def load(self, user: User, room: Room):
+        return self._loader.load((user, room))
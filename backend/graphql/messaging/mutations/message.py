@@ -6,10 +6,10 @@ from graphql import GraphQLError
 
 from backend.graphql.mutations import BaseMutation
 from backend.graphql.messaging.types import MessageType
-from backend.messaging.models import Message
 from backend.room.models import Room
-from backend.messaging.services import MessageService
-from backend.core.exceptions import ErrorCode
+from backend.messaging import pipeline
+from backend.messaging.ratelimit import allow_message
+from backend.core.exceptions import ErrorCode, RateLimitException
 
 
 class CreateMessage(BaseMutation):
@@ -35,9 +35,10 @@ class CreateMessage(BaseMutation):
                 "Room not found", extensions={"code": ErrorCode.NOT_FOUND}
             )
 
-        message = MessageService.create_message(
-            user=info.context.user, room=room, body=body
-        )
+        if not allow_message(info.context.user.id, room):
+            raise RateLimitException("Too many messages. Please slow down.")
+
+        message = pipeline.create_message(info.context.user, room, body)
 
         return cls(message=message)
 
@@ -53,14 +54,7 @@ class DeleteMessage(BaseMutation):
     def resolve(
         cls, root: Optional[Any], info: graphene.ResolveInfo, message_id: uuid.UUID
     ) -> Self:
-        try:
-            message = Message.objects.get(id=message_id)
-        except Message.DoesNotExist:
-            raise GraphQLError(
-                "Message not found", extensions={"code": ErrorCode.NOT_FOUND}
-            )
-
-        success = MessageService.delete_message(user=info.context.user, message=message)
+        success = pipeline.delete_message(info.context.user, message_id)
 
         return cls(success=success)
 
@@ -81,15 +75,6 @@ class UpdateMessage(BaseMutation):
         message_id: uuid.UUID,
         body: str,
     ) -> Self:
-        try:
-            message = Message.objects.get(id=message_id)
-        except Message.DoesNotExist:
-            raise GraphQLError(
-                "Message not found", extensions={"code": ErrorCode.NOT_FOUND}
-            )
-
-        message = MessageService.update_message(
-            user=info.context.user, message=message, body=body
-        )
+        message = pipeline.update_message(info.context.user, message_id, body)
 
         return cls(message=message)
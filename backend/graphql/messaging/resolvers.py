@@ -1,27 +1,51 @@
 import uuid
 import graphene
 from graphql import GraphQLError
+from redis.exceptions import RedisError
 
+from django.conf import settings
 from django.db.models import QuerySet
 
 from backend.core.exceptions import ErrorCode
+from backend.graphql.error.utils import resolve_errors
 from backend.account.models import User
 from backend.messaging.models import Message
+from backend.messaging.services import MessageService
 from backend.room.models import Room
 from backend.access.models import Participant
-from backend.graphql.messaging.types import MessageType
+from backend.core.apps import CoreConfig
+from backend.graphql.messaging.types import (
+    MessageConnection,
+    MessageType,
+    RoomEventsType,
+    RoomEventType,
+)
+from backend.messaging.chat import streams
+from backend.messaging.chat.groups import room_seq_key, room_stream_key
 
 
 class MessageQuery(graphene.ObjectType):
-    messages = graphene.List(MessageType, room_id=graphene.UUID(required=True))
+    messages = graphene.relay.ConnectionField(
+        MessageConnection,
+        room_id=graphene.UUID(required=True),
+        around=graphene.UUID(
+            description="Load a page of `first` messages centered on this message."
+        ),
+    )
     messages_by_user = graphene.List(
         MessageType,
         user_id=graphene.UUID(required=True),
     )
+    room_events_since = graphene.Field(
+        RoomEventsType,
+        room_id=graphene.UUID(required=True),
+        seq=graphene.Int(required=True),
+    )
 
+    @resolve_errors
     def resolve_messages(
-        self, info: graphene.ResolveInfo, room_id: uuid.UUID
-    ) -> QuerySet[Message]:
+        self, info: graphene.ResolveInfo, room_id: uuid.UUID, **kwargs
+    ) -> MessageConnection:
         try:
             room = Room.objects.get(id=room_id)
         except Room.DoesNotExist:
@@ -32,7 +56,7 @@ class MessageQuery(graphene.ObjectType):
                 "Not a participant", extensions={"code": ErrorCode.PERMISSION_DENIED}
             )
 
-        return room.message_set.select_related("author").order_by("created_at")
+        return MessageConnection.from_page(MessageService.get_history(room, **kwargs))
 
     def resolve_messages_by_user(
         self, info: graphene.ResolveInfo, user_id: uuid.UUID
@@ -45,3 +69,37 @@ class MessageQuery(graphene.ObjectType):
         return user.message_set.select_related("room", "room__host").order_by(
             "-created_at"
         )
+
+    def resolve_room_events_since(
+        self, info: graphene.ResolveInfo, room_id: uuid.UUID, seq: int
+    ) -> RoomEventsType:
+        """Room events after sequence number `seq`, read from the room stream."""
+        if not Room.objects.filter(id=room_id).exists():
+            raise GraphQLError("Room not found", extensions={"code": "NOT_FOUND"})
+
+        if not Participant.objects.filter(
+            user=info.context.user, room_id=room_id
+        ).exists():
+            raise GraphQLError(
+                "Not a participant", extensions={"code": ErrorCode.PERMISSION_DENIED}
+            )
+
+        try:
+            delta = streams.events_since(
+                CoreConfig.get_sync_binary_redis_client(),
+                room_stream_key(room_id),
+                room_seq_key(room_id),
+                seq,
+                settings.CHAT_REPLAY_MAX_EVENTS,
+            )
+        except (RedisError, OSError):
+            raise GraphQLError(
+                "Room events are temporarily unavailable",
+                extensions={"code": ErrorCode.INTERNAL_ERROR},
+            )
+
+        return RoomEventsType(
+            events=[RoomEventType.from_event(event) for event in delta.events],
+            latest_seq=delta.latest_seq,
+            complete=delta.complete,
+        )
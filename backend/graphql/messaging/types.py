@@ -1,18 +1,19 @@
+from datetime import datetime
+from typing import Optional
+
 import graphene
 from graphene_django.types import DjangoObjectType
 
-from backend.messaging.models import Message, MessageStatus
-
-
-class MessageStatusEnum(graphene.Enum):
-    SENT = "SENT"
-    DELIVERED = "DELIVERED"
-    SEEN = "SEEN"
+from backend.messaging.dtos import MessageCursor, MessagePage
+from backend.messaging.models import Message
 
 
 class MessageType(DjangoObjectType):
     author = graphene.Field("backend.graphql.account.types.UserType", required=True)
     room = graphene.Field("backend.graphql.room.types.RoomType", required=True)
+    seen_by = graphene.List(
+        graphene.NonNull("backend.graphql.account.types.UserType"), required=True
+    )
 
     class Meta:
         model = Message
@@ -26,17 +27,69 @@ class MessageType(DjangoObjectType):
             "updated_at",
         )
 
+    def resolve_seen_by(self, info: graphene.ResolveInfo):
+        return info.context.loaders.seen_by.load(self)
 
-class MessageStatusType(graphene.ObjectType):
-    message = graphene.Field(MessageType, required=True)
-    room = graphene.Field("backend.graphql.room.types.RoomType", required=True)
-    status = graphene.Field(MessageStatusEnum, required=True)
+
+class MessageConnection(graphene.relay.Connection):
+    """A page of a room's messages, oldest first."""
 
     class Meta:
-        model = MessageStatus
-        fields = (
-            "message",
-            "room",
-            "status",
-            "timestamp",
+        node = MessageType
+
+    @classmethod
+    def from_page(cls, page: MessagePage) -> "MessageConnection":
+        edges = [
+            cls.Edge(node=message, cursor=MessageCursor.of(message).encode())
+            for message in page.messages
+        ]
+        return cls(
+            edges=edges,
+            page_info=graphene.relay.PageInfo(
+                has_previous_page=page.has_previous_page,
+                has_next_page=page.has_next_page,
+                start_cursor=edges[0].cursor if edges else None,
+                end_cursor=edges[-1].cursor if edges else None,
+            ),
         )
+
+
+class RoomEventType(graphene.ObjectType):
+    """A message event of a room, as broadcast over the chat WebSocket."""
+
+    seq = graphene.Int(required=True)
+    action = graphene.String(required=True)
+    message_id = graphene.UUID(required=True)
+    stream_id = graphene.String()
+    author = graphene.String()
+    author_id = graphene.UUID()
+    body = graphene.String()
+    is_edited = graphene.Boolean()
+    created_at = graphene.DateTime()
+    updated_at = graphene.DateTime()
+
+    @classmethod
+    def from_event(cls, event: dict) -> "RoomEventType":
+        return cls(
+            seq=event["seq"],
+            action=event.get("action"),
+            message_id=event.get("id"),
+            stream_id=event.get("stream_id"),
+            author=event.get("author"),
+            author_id=event.get("author_id"),
+            body=event.get("body"),
+            is_edited=event.get("is_edited"),
+            created_at=_parse_datetime(event.get("created_at")),
+            updated_at=_parse_datetime(event.get("updated_at")),
+        )
+
+
+class RoomEventsType(graphene.ObjectType):
+    events = graphene.List(graphene.NonNull(RoomEventType), required=True)
+    latest_seq = graphene.Int(required=True)
+    # False when the delta is no longer available and the room must be reloaded
+    complete = graphene.Boolean(required=True)
+
+
+def _parse_datetime(value: Optional[str]) -> Optional[datetime]:
+    return datetime.fromisoformat(value) if value else None
@@ -50,6 +50,9 @@ class UpdateRoom(BaseMutation):
         description = graphene.String(required=False)
         topic_names = graphene.List(graphene.String, required=False)
         visibility = RoomVisibilityEnum(required=False)
+        slow_mode_seconds = graphene.Int(required=False)
+        room_messages_per_sec = graphene.Int(required=False)
+        connection_messages_per_sec = graphene.Int(required=False)
 
     room = graphene.Field(RoomType)
 
@@ -64,6 +67,9 @@ class UpdateRoom(BaseMutation):
         description: Optional[str] = None,
         topic_names: Optional[list[str]] = None,
         visibility: Optional[RoomVisibilityEnum] = None,
+        slow_mode_seconds: Optional[int] = None,
+        room_messages_per_sec: Optional[int] = None,
+        connection_messages_per_sec: Optional[int] = None,
     ) -> Self:
         try:
             room = Room.objects.get(id=room_id)
@@ -79,6 +85,11 @@ class UpdateRoom(BaseMutation):
             description=description,
             visibility=visibility.value if visibility is not None else None,
             topic_names=topic_names,
+            rate_limits={
+                "slow_mode_seconds": slow_mode_seconds,
+                "room_messages_per_sec": room_messages_per_sec,
+                "connection_messages_per_sec": connection_messages_per_sec,
+            },
         )
 
         return cls(room=room)
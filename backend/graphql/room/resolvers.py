@@ -1,7 +1,9 @@
 import uuid
 import graphene
+from datetime import datetime, timezone
 from typing import Optional
 from graphql import GraphQLError
+from redis.exceptions import RedisError
 
 from django.db.models import QuerySet
 
@@ -10,7 +12,8 @@ from backend.account.models import User
 from backend.graphql.room.filters import RoomFilter, TopicFilter
 from backend.room.models import Room, Topic
 from backend.room.rules.labels import RoomPermission
-from backend.graphql.room.types import RoomType, TopicType
+from backend.graphql.room.types import RoomPresenceType, RoomType, TopicType
+from backend.messaging.chat import presence
 
 
 class RoomQuery(graphene.ObjectType):
@@ -28,6 +31,9 @@ class RoomQuery(graphene.ObjectType):
     rooms_not_participated_by_user = graphene.List(
         RoomType, user_id=graphene.UUID(required=True)
     )
+    room_presence = graphene.List(
+        graphene.NonNull(RoomPresenceType), room_id=graphene.UUID(required=True)
+    )
 
     def resolve_room(self, info: graphene.ResolveInfo, room_id: uuid.UUID) -> Room:
         try:
@@ -110,6 +116,37 @@ class RoomQuery(graphene.ObjectType):
 
         return queryset
 
+    def resolve_room_presence(
+        self, info: graphene.ResolveInfo, room_id: uuid.UUID
+    ) -> list[RoomPresenceType]:
+        """Users with a live chat connection to the room, read from Redis only."""
+        room = Room.objects.filter(id=room_id).first()
+        if room is None:
+            raise GraphQLError(
+                "Room not found", extensions={"code": ErrorCode.NOT_FOUND}
+            )
+
+        if not info.context.user.has_perm(RoomPermission.VIEW, room):
+            raise GraphQLError(
+                "Permission denied", extensions={"code": ErrorCode.PERMISSION_DENIED}
+            )
+
+        try:
+            online = presence.online_users(room_id)
+        except (RedisError, OSError):
+            raise GraphQLError(
+                "Presence is temporarily unavailable",
+                extensions={"code": ErrorCode.INTERNAL_ERROR},
+            )
+
+        return [
+            RoomPresenceType(
+                user_id=user_id,
+                last_active_at=datetime.fromtimestamp(ts, tz=timezone.utc),
+            )
+            for user_id, ts in sorted(online.items(), key=lambda item: -item[1])
+        ]
+
 
 class TopicQuery(graphene.ObjectType):
     topics = graphene.List(
@@ -26,6 +26,7 @@ class RoomType(DjangoObjectType):
     topics = graphene.List(TopicType, required=True)
     host = graphene.Field("backend.graphql.account.types.UserType", required=True)
     visibility = graphene.Field(RoomVisibilityEnum, required=True)
+    unread_count = graphene.Int(required=True)
 
     class Meta:
         model = Room
@@ -37,6 +38,9 @@ class RoomType(DjangoObjectType):
             "visibility",
             "description",
             "participants",
+            "slow_mode_seconds",
+            "room_messages_per_sec",
+            "connection_messages_per_sec",
             "updated_at",
             "created_at",
         )
@@ -49,3 +53,14 @@ class RoomType(DjangoObjectType):
 
     def resolve_topics(self, info):
         return self.topics.all()
+
+    def resolve_unread_count(self, info: graphene.ResolveInfo) -> int:
+        user = info.context.user
+        if not user.is_authenticated:
+            return 0
+        return info.context.loaders.unread_count.load(user, self)
+
+
+class RoomPresenceType(graphene.ObjectType):
+    user_id = graphene.UUID(required=True)
+    last_active_at = graphene.DateTime(required=True)
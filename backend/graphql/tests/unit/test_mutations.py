@@ -1,4 +1,6 @@
+import json
 import tempfile
+from unittest import mock
 
 from graphql import ExecutionResult
 from graphql_jwt.testcases import JSONWebTokenTestCase
@@ -6,6 +8,8 @@ from graphql_jwt.testcases import JSONWebTokenTestCase
 from django.contrib.auth import get_user_model
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import override_settings
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
 
 import pytest
 
@@ -13,6 +17,7 @@ pytestmark = pytest.mark.unit
 
 from backend.access.enums import PermissionCode
 from backend.access.models import Participant, Permission, Role
+from backend.core.groups import room_group_name
 from backend.messaging.models import Message
 from backend.room.models import Room, Topic
 from backend.core.tests.utils import create_test_image
@@ -426,6 +431,37 @@ class MessageMutationsTests(JSONWebTokenTestCase):
         self.assertEqual(message.body, "Updated")
         self.assertTrue(message.is_edited)
 
+    @override_settings(
+        CHANNEL_LAYERS={"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    )
+    def test_create_message_is_broadcast_to_room(self):
+        channel_layer = get_channel_layer()
+        channel = async_to_sync(channel_layer.new_channel)()
+        async_to_sync(channel_layer.group_add)(room_group_name(self.room.id), channel)
+        self.client.authenticate(self.user)
+        mutation = """
+            mutation CreateMessage($roomId: UUID!, $body: String!) {
+                createMessage(roomId: $roomId, body: $body) { message { id } }
+            }
+        """
+        variables = {"roomId": str(self.room.id), "body": "Over HTTP"}
+
+        with (
+            mock.patch(
+                "backend.messaging.pipeline.append_events", return_value=[("1-0", 7)]
+            ),
+            self.captureOnCommitCallbacks(execute=True),
+        ):
+            result: ExecutionResult = self.client.execute(mutation, variables)
+
+        self.assertIsNone(result.errors)
+        event = async_to_sync(channel_layer.receive)(channel)
+        frame = json.loads(event["text"])
+        self.assertEqual(frame["action"], "new")
+        self.assertEqual(frame["id"], result.data["createMessage"]["message"]["id"])
+        self.assertEqual(frame["body"], "Over HTTP")
+        self.assertEqual(frame["seq"], 7)
+
     def test_update_message_not_owner(self):
         message = Message.objects.create(
             author=self.user, room=self.room, body="Original"
@@ -127,14 +127,42 @@ class QueryTests(JSONWebTokenTestCase):
         query = """
             query GetMessages($roomId: UUID!) {
                 messages(roomId: $roomId) {
-                    body
+                    edges { node { body } }
+                    pageInfo { hasPreviousPage hasNextPage }
                 }
             }
         """
         variables = {"roomId": str(self.room.id)}
         result: ExecutionResult = self.client.execute(query, variables)
-        self.assertEqual(len(result.data["messages"]), 1)
-        self.assertEqual(result.data["messages"][0]["body"], self.message.body)
+        edges = result.data["messages"]["edges"]
+        self.assertEqual(len(edges), 1)
+        self.assertEqual(edges[0]["node"]["body"], self.message.body)
+        self.assertFalse(result.data["messages"]["pageInfo"]["hasPreviousPage"])
+
+    def test_messages_query_pages_by_cursor(self):
+        self.client.authenticate(self.user)
+        for i in range(3):
+            Message.objects.create(author=self.user, room=self.room, body=f"m{i}")
+
+        query = """
+            query GetMessages($roomId: UUID!, $before: String) {
+                messages(roomId: $roomId, last: 2, before: $before) {
+                    edges { node { body } }
+                    pageInfo { hasPreviousPage startCursor }
+                }
+            }
+        """
+        variables = {"roomId": str(self.room.id)}
+        newest = self.client.execute(query, variables).data["messages"]
+        variables["before"] = newest["pageInfo"]["startCursor"]
+        older = self.client.execute(query, variables).data["messages"]
+
+        self.assertEqual([e["node"]["body"] for e in newest["edges"]], ["m1", "m2"])
+        self.assertTrue(newest["pageInfo"]["hasPreviousPage"])
+        self.assertEqual(
+            [e["node"]["body"] for e in older["edges"]], [self.message.body, "m0"]
+        )
+        self.assertFalse(older["pageInfo"]["hasPreviousPage"])
 
     def test_rooms_with_search_filter(self):
         query = """
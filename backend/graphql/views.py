@@ -1,5 +1,6 @@
 from django.conf import settings
 from graphene_file_upload.django import FileUploadGraphQLView
+from backend.core import codec
 from backend.graphql.security import get_validation_rules
 from graphql_sync_dataloaders import DeferredExecutionContext
 
@@ -15,3 +16,9 @@ class GraphqlView(FileUploadGraphQLView):
             execution_context_class=DeferredExecutionContext,
             **kwargs,
         )
+
+    def json_encode(self, request, d, pretty=False):
+        if pretty or self.pretty or request.GET.get("pretty"):
+            return super().json_encode(request, d, pretty=True)
+        # Bytes are written to the response as they are
+        return codec.dumpb(d)
@@ -1,9 +1,16 @@
-from django.db import IntegrityError
+import uuid
+from typing import Optional
+
+from django.db import IntegrityError, connection, transaction
+from django.utils.timezone import now
 
 from backend.account.models import User
 from backend.core.exceptions import ConflictException, FormValidationException
 from backend.messaging.forms import MessageForm
-from backend.messaging.models import Message
+from backend.access.enums import PermissionCode
+from backend.access.models import Participant, Permission, Role
+from backend.account.models import UserBan
+from backend.messaging.models import Message, ReadWatermark
 from backend.room.models import Room
 
 
@@ -25,6 +32,124 @@ def create_message(user: User, room: Room, body: str) -> Message:
     return message
 
 
+def build_message(user: User, room: Room, body: str) -> Message:
+    """Validate and build an unsaved message with server-assigned ID and timestamps."""
+    form = MessageForm(data={"body": body})
+
+    if not form.is_valid():
+        raise FormValidationException("Invalid message data", errors=form.errors)
+
+    message = form.save(commit=False)
+    message.author = user
+    message.room = room
+    message.created_at = message.updated_at = now()
+
+    return message
+
+
+async def acreate_message(user: User, room: Room, body: str) -> Message:
+    """Async counterpart of `create_message`; validation runs on the event loop."""
+    message = build_message(user=user, room=room, body=body)
+
+    try:
+        await message.asave(force_insert=True)
+    except IntegrityError as e:
+        raise ConflictException("Could not create message due to a conflict.") from e
+
+    return message
+
+
+def bulk_create_messages(messages: list[Message]) -> int:
+    """
+    Insert already validated and broadcast messages, see `build_message`.
+
+    The server-assigned `created_at` clients have seen is stored as is,
+    instead of being re-stamped at insert time. Messages whose room or author
+    has been deleted meanwhile are skipped. Returns the number of rows
+    inserted.
+    """
+    return _insert_messages(messages)
+
+
+def write_message_batch(
+    created: list[Message], updated: list[Message], deleted_ids: list[uuid.UUID]
+) -> None:
+    """
+    Write a batch of message changes in one transaction, one query per kind.
+
+    `created` are built with `build_message`; `updated` are loaded messages
+    with their new body set. Deletions cascade to replies and clear read
+    watermarks through the ORM, as `delete_message` does.
+    """
+    stamp = now()
+    for message in updated:
+        message.is_edited = True
+        message.updated_at = stamp
+
+    try:
+        with transaction.atomic():
+            if created:
+                Message.objects.bulk_create(created)
+            if updated:
+                Message.objects.bulk_update(
+                    updated, ["body", "is_edited", "updated_at"]
+                )
+            if deleted_ids:
+                Message.objects.filter(id__in=deleted_ids).delete()
+    except IntegrityError as e:
+        raise ConflictException("Could not apply the batch due to a conflict.") from e
+
+
+def insert_ingested_messages(messages: list[Message]) -> int:
+    """
+    Insert messages replayed from the ingestion stream in a single statement.
+
+    Messages already stored (a redelivered entry) or whose room or author has
+    been deleted meanwhile are skipped. Returns the number of rows inserted.
+    """
+    return _insert_messages(messages)
+
+
+def _insert_messages(messages: list[Message]) -> int:
+    """
+    Insert new top-level messages with their broadcast `created_at`, which
+    `bulk_create` would overwrite through `auto_now_add`.
+    """
+    if not messages:
+        return 0
+
+    values = ", ".join(
+        ["(%s::uuid, %s::uuid, %s::uuid, %s, %s::timestamptz)"] * len(messages)
+    )
+    params = [
+        value
+        for message in messages
+        for value in (
+            str(message.id),
+            str(message.author_id),
+            str(message.room_id),
+            message.body,
+            message.created_at,
+        )
+    ]
+
+    sql = f"""
+        INSERT INTO {Message._meta.db_table}
+            (id, parent_id, author_id, room_id, body, is_edited,
+             created_at, updated_at)
+        SELECT v.id, NULL, v.author_id, v.room_id, v.body, FALSE,
+            v.created_at, v.created_at
+        FROM (VALUES {values}) AS v (id, author_id, room_id, body, created_at)
+        JOIN {Room._meta.db_table} r ON r.id = v.room_id
+        JOIN {User._meta.db_table} u ON u.id = v.author_id
+        ON CONFLICT (id) DO NOTHING
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return cursor.rowcount
+
+
 def update_message(message: Message, body: str) -> Message:
     data = {"body": body}
     form = MessageForm(data=data, instance=message)
@@ -43,6 +168,201 @@ def update_message(message: Message, body: str) -> Message:
     return updated_message
 
 
+async def aupdate_message(message: Message, body: str) -> Message:
+    """Async counterpart of `update_message`; validation runs on the event loop."""
+    data = {"body": body}
+    form = MessageForm(data=data, instance=message)
+
+    if not form.is_valid():
+        raise FormValidationException("Invalid message data", errors=form.errors)
+
+    try:
+        updated_message = form.save(commit=False)
+        if not updated_message.is_edited:
+            updated_message.is_edited = True
+        await updated_message.asave()
+    except IntegrityError as e:
+        raise ConflictException("Could not update message due to a conflict.") from e
+
+    return updated_message
+
+
+def _not_banned_sql(user_column: str) -> str:
+    """SQL condition mirroring `is_user_banned`, takes no parameters."""
+    return f"""NOT EXISTS (
+        SELECT 1 FROM {UserBan._meta.db_table} ban
+        WHERE ban.user_id = {user_column}
+            AND ban.is_active
+            AND (ban.expires_at IS NULL OR ban.expires_at > NOW())
+    )"""
+
+
+def update_message_as_author(
+    *,
+    message_id: uuid.UUID,
+    user: User,
+    body: str,
+    room_id: Optional[uuid.UUID] = None,
+) -> Optional[Message]:
+    """
+    Edit a message in a single UPDATE ... RETURNING, authorized in SQL.
+
+    Only matches if `user` is the author, is not banned and, when given, the
+    message is in `room_id`. Returns None otherwise; callers fall back to
+    the detailed path to tell the reasons apart.
+    """
+    form = MessageForm(data={"body": body})
+
+    if not form.is_valid():
+        raise FormValidationException("Invalid message data", errors=form.errors)
+
+    if not user.is_active:
+        return None
+
+    fields = Message._meta.concrete_fields
+    room_filter = "AND room_id = %s" if room_id is not None else ""
+    params = [form.cleaned_data["body"], now(), message_id, user.id]
+    if room_id is not None:
+        params.append(room_id)
+    params.append(user.id)
+
+    sql = f"""
+        UPDATE {Message._meta.db_table}
+        SET body = %s, is_edited = TRUE, updated_at = %s
+        WHERE id = %s AND author_id = %s {room_filter}
+            AND {_not_banned_sql("%s")}
+        RETURNING {", ".join(field.column for field in fields)}
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    if row is None:
+        return None
+
+    message = Message.from_db(
+        connection.alias, [field.attname for field in fields], row
+    )
+    message.author = user
+    return message
+
+
+def delete_message_if_permitted(
+    *, message_id: uuid.UUID, user: User, room_id: Optional[uuid.UUID] = None
+) -> Optional[uuid.UUID]:
+    """
+    Delete a message in a single statement, authorized in SQL.
+
+    Mirrors the DELETE rule: the user is the author, holds
+    ROOM_DELETE_MESSAGE in the message's room, or is a superuser, and is not
+    banned. Messages with replies are left to the detailed path, which
+    cascades through the ORM; read watermarks pointing at the message are
+    cleared in the same statement. Returns the room ID of the deleted
+    message, None if nothing was deleted.
+    """
+    if not user.is_active:
+        return None
+
+    messages = Message._meta.db_table
+    role_permissions = Role.permissions.through._meta.db_table
+    room_filter = "AND m.room_id = %s" if room_id is not None else ""
+    params: list = [message_id]
+    if room_id is not None:
+        params.append(room_id)
+    params += [
+        user.is_superuser,
+        user.id,
+        user.id,
+        PermissionCode.ROOM_DELETE_MESSAGE.value,
+        user.id,
+    ]
+
+    sql = f"""
+        WITH target AS (
+            SELECT m.id FROM {messages} m
+            WHERE m.id = %s {room_filter}
+                AND (
+                    %s
+                    OR m.author_id = %s
+                    OR EXISTS (
+                        SELECT 1 FROM {Participant._meta.db_table} p
+                        JOIN {role_permissions} rp ON rp.role_id = p.role_id
+                        JOIN {Permission._meta.db_table} perm
+                            ON perm.id = rp.permission_id
+                        WHERE p.user_id = %s
+                            AND p.room_id = m.room_id
+                            AND perm.code = %s
+                    )
+                )
+                AND {_not_banned_sql("%s")}
+                AND NOT EXISTS (SELECT 1 FROM {messages} r WHERE r.parent_id = m.id)
+            FOR UPDATE OF m
+        ),
+        cleared AS (
+            UPDATE {ReadWatermark._meta.db_table}
+            SET last_read_message_id = NULL
+            WHERE last_read_message_id IN (SELECT id FROM target)
+        )
+        DELETE FROM {messages} WHERE id IN (SELECT id FROM target)
+        RETURNING room_id
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        row = cursor.fetchone()
+
+    return row[0] if row is not None else None
+
+
 def delete_message(message: Message) -> bool:
     message.delete()
     return True
+
+
+async def adelete_message(message: Message) -> bool:
+    await message.adelete()
+    return True
+
+
+def advance_read_watermarks(acks: dict[uuid.UUID, uuid.UUID]) -> list[uuid.UUID]:
+    """
+    Move read watermarks forward in a single upsert.
+
+    Args map participant ID to the message it has read up to. Messages from
+    another room than the participant's are ignored, and a watermark never
+    moves backwards. Returns the participants whose message isn't stored
+    (yet), e.g. still in the write-behind buffer; their acks are not
+    applied, for the caller to retry.
+    """
+    if not acks:
+        return []
+
+    watermarks = ReadWatermark._meta.db_table
+    messages = Message._meta.db_table
+    values = ", ".join(["(%s::uuid, %s::uuid)"] * len(acks))
+    params = [str(value) for ack in acks.items() for value in ack]
+
+    sql = f"""
+        WITH ack (participant_id, message_id) AS (VALUES {values}),
+        written AS (
+            INSERT INTO {watermarks}
+                (participant_id, room_id, last_read_message_id, last_read_at,
+                 updated_at)
+            SELECT p.id, m.room_id, m.id, m.created_at, NOW()
+            FROM ack
+            JOIN {Participant._meta.db_table} p ON p.id = ack.participant_id
+            JOIN {messages} m ON m.id = ack.message_id AND m.room_id = p.room_id
+            ON CONFLICT (participant_id) DO UPDATE SET
+                last_read_message_id = EXCLUDED.last_read_message_id,
+                last_read_at = EXCLUDED.last_read_at,
+                updated_at = EXCLUDED.updated_at
+            WHERE EXCLUDED.last_read_at > {watermarks}.last_read_at
+        )
+        SELECT ack.participant_id FROM ack
+        WHERE NOT EXISTS (SELECT 1 FROM {messages} m WHERE m.id = ack.message_id)
+    """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        return [uuid.UUID(str(row[0])) for row in cursor.fetchall()]
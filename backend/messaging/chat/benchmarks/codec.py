@@ -0,0 +1,101 @@
+"""
+Micro-benchmark: JSON encoding and decoding of chat frames, per codec.
+
+Compares the former path (stringify IDs and times, then `json.dumps`) with
+the codecs of `backend.core.codec`, which take UUIDs and datetimes as they
+are. Decoding is timed on an inbound `text` frame and on an outbound one.
+orjson is skipped if it isn't installed. Run with:
+
+    python -m backend.messaging.chat.benchmarks.codec [--repeat N] [--number N]
+"""
+
+import argparse
+import json
+import timeit
+import uuid
+from datetime import datetime, timezone
+
+
+def _setup_django() -> None:
+    from django.conf import settings
+
+    # Only JSON_CODEC is read, so skip loading the project settings
+    settings.configure(JSON_CODEC="auto")
+
+
+def _sample_event() -> dict:
+    created_at = datetime.now(timezone.utc)
+    return {
+        "type": "chat_message",
+        "action": "new",
+        "id": uuid.uuid4(),
+        "author": "benchmark-user",
+        "author_id": uuid.uuid4(),
+        "body": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+        "is_edited": False,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "author_avatar": "avatars/benchmark.png",
+        "room_id": str(uuid.uuid4()),
+        "stream_id": "1700000000000-0",
+        "seq": 42,
+    }
+
+
+def _stringified(event: dict) -> dict:
+    return {
+        **event,
+        "id": str(event["id"]),
+        "author_id": str(event["author_id"]),
+        "created_at": event["created_at"].isoformat(),
+        "updated_at": event["updated_at"].isoformat(),
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--number", type=int, default=20_000)
+    args = parser.parse_args()
+
+    _setup_django()
+    from backend.core.codec import ORJSON, STDLIB
+
+    event = _sample_event()
+    outbound = json.dumps(_stringified(event))
+    inbound = json.dumps({"type": "text", "message": event["body"]})
+
+    def best(fn) -> float:
+        timings = timeit.repeat(fn, repeat=args.repeat, number=args.number)
+        return min(timings) / args.number * 1e6
+
+    rows = [
+        (
+            "json (before)",
+            lambda: json.dumps(_stringified(event)),
+            lambda: json.loads(inbound),
+            lambda: json.loads(outbound),
+        )
+    ]
+    for codec in (STDLIB, ORJSON):
+        if codec is not None:
+            rows.append(
+                (
+                    codec.name,
+                    lambda codec=codec: codec.dumps(event),
+                    lambda codec=codec: codec.loads(inbound),
+                    lambda codec=codec: codec.loads(outbound),
+                )
+            )
+
+    print(f"orjson: {'yes' if ORJSON else 'no (not installed)'}")
+    print(f"{'codec':>14} {'encode':>10} {'decode in':>10} {'decode out':>11}")
+    for name, encode, decode_in, decode_out in rows:
+        print(
+            f"{name:>14} {best(encode):>7.2f} µs {best(decode_in):>7.2f} µs "
+            f"{best(decode_out):>8.2f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
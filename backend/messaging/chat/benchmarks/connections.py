@@ -0,0 +1,141 @@
+"""
+Report: memory held per open chat connection.
+
+Opens N `ws/chat/<room>` connections of one participant against the
+in-memory channel layer and reports the traced Python memory they hold once
+open, per connection. Presence and fan-out still use the configured Redis.
+Also compares the per-connection state of `ChatConsumer` (its user and room
+subscription) with the model instances it replaces.
+
+Creates a throwaway user and room in the configured database and deletes
+them afterwards. Run with:
+
+    python -m backend.messaging.chat.benchmarks.connections [--connections N]
+"""
+
+import argparse
+import asyncio
+import gc
+import os
+import sys
+import tracemalloc
+import uuid
+
+
+def _setup_django() -> None:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.config.settings")
+    django.setup()
+
+    from django.conf import settings
+
+    settings.CHANNEL_LAYERS = {
+        "default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}
+    }
+
+
+def _create_fixture():
+    from backend.access.models import Participant
+    from backend.account.models import User
+    from backend.room.models import Room
+
+    suffix = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(
+        username=f"bench-{suffix}",
+        email=f"bench-{suffix}@example.com",
+        name="Benchmark",
+    )
+    room = Room.objects.create(host=user, name=f"Benchmark {suffix}")
+    Participant.objects.create(user=user, room=room)
+    return user, room
+
+
+def _deep_size(obj) -> int:
+    """Size of an object and everything it references, bar modules and types."""
+    seen = set()
+    pending = [obj]
+    size = 0
+    while pending:
+        current = pending.pop()
+        if id(current) in seen or isinstance(current, (type, type(sys))):
+            continue
+        seen.add(id(current))
+        size += sys.getsizeof(current)
+        pending.extend(gc.get_referents(current))
+    return size
+
+
+def _report_state(user, room) -> None:
+    from backend.access.services import RoleService
+    from backend.messaging.chat.subscriptions import ConnectionUser, RoomSubscription
+
+    snapshot = RoleService.get_permission_snapshot(user, room.id)
+    models = _deep_size(user) + _deep_size(room) + _deep_size(snapshot)
+    compact = _deep_size(ConnectionUser(user)) + _deep_size(
+        RoomSubscription(room, snapshot)
+    )
+    print(f"state: {models:>8} bytes as models, {compact:>6} bytes compact")
+
+
+async def _open(user, room, connections: int) -> list:
+    from channels.routing import URLRouter
+    from channels.testing import WebsocketCommunicator
+
+    from backend.messaging.chat.routing import websocket_urlpatterns
+    from backend.messaging.chat.subscriptions import ConnectionUser
+
+    app = URLRouter(websocket_urlpatterns)
+    communicators = []
+    for _ in range(connections):
+        communicator = WebsocketCommunicator(app, f"/ws/chat/{room.id}")
+        # As set by JwtAuthMiddleware
+        communicator.scope["user"] = ConnectionUser(user)
+        connected, _ = await communicator.connect()
+        if not connected:
+            raise RuntimeError("Connection was refused")
+        communicators.append(communicator)
+    return communicators
+
+
+async def _run(user, room, connections: int) -> None:
+    # Warm up imports, caches and the channel layer before measuring
+    for communicator in await _open(user, room, 1):
+        await communicator.disconnect()
+
+    gc.collect()
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+
+    communicators = await _open(user, room, connections)
+    gc.collect()
+    held = tracemalloc.get_traced_memory()[0] - before
+    tracemalloc.stop()
+
+    print(
+        f"{connections} connections: {held / 1024:>10.0f} KiB, "
+        f"{held / connections:>8.0f} bytes per connection"
+    )
+
+    for communicator in communicators:
+        await communicator.disconnect()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--connections", type=int, default=1_000)
+    args = parser.parse_args()
+
+    _setup_django()
+    user, room = _create_fixture()
+
+    try:
+        _report_state(user, room)
+        asyncio.run(_run(user, room, args.connections))
+    finally:
+        room.delete()
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
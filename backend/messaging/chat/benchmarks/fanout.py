@@ -0,0 +1,100 @@
+"""
+Micro-benchmark: CPU cost of one room fan-out, per-recipient vs encode-once.
+
+Models the work done for every member channel of a room group:
+channels_redis msgpack-packs the group event for each channel, the
+recipient worker unpacks it, and the consumer turns it into a WebSocket
+frame. Before, that last step was `json.dumps(event)` in every recipient;
+now the sender encodes the frame once and recipients forward the text.
+
+Run with:
+
+    python -m backend.messaging.chat.benchmarks.fanout [--repeat N]
+"""
+
+import argparse
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+from typing import Callable
+
+try:
+    import msgpack
+except ImportError:  # channels_redis dependency, optional here
+    msgpack = None
+
+
+ROOM_SIZES = (10, 1_000, 10_000)
+
+
+def _sample_event() -> dict:
+    created_at = datetime.now(timezone.utc).isoformat()
+    return {
+        "type": "chat_message",
+        "action": "new",
+        "id": str(uuid.uuid4()),
+        "author": "benchmark-user",
+        "author_id": str(uuid.uuid4()),
+        "body": "Lorem ipsum dolor sit amet, consectetur adipiscing elit. " * 3,
+        "is_edited": False,
+        "created_at": created_at,
+        "updated_at": created_at,
+        "author_avatar": "avatars/benchmark.png",
+        "stream_id": "1700000000000-0",
+    }
+
+
+def _transport(group_event: dict) -> dict:
+    """Channel layer round trip for a single member channel."""
+    if msgpack is None:
+        return group_event
+    return msgpack.unpackb(msgpack.packb(group_event, use_bin_type=True), raw=False)
+
+
+def fan_out_per_recipient(event: dict, members: int) -> None:
+    for _ in range(members):
+        received = _transport(event)
+        json.dumps(received)
+
+
+def fan_out_encode_once(event: dict, members: int) -> None:
+    group_event = {"type": "chat_message", "text": json.dumps(event)}
+    for _ in range(members):
+        received = _transport(group_event)
+        received["text"]
+
+
+def _best_of(fn: Callable[[dict, int], None], event: dict, members: int, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(event, members)
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    event = _sample_event()
+    print(f"msgpack transport: {'yes' if msgpack else 'no (not installed)'}")
+    print(
+        f"{'members':>8} {'per-recipient':>15} {'encode-once':>13} "
+        f"{'saved':>10} {'saved/member':>13}"
+    )
+
+    for members in ROOM_SIZES:
+        before = _best_of(fan_out_per_recipient, event, members, args.repeat)
+        after = _best_of(fan_out_encode_once, event, members, args.repeat)
+        saved = before - after
+        print(
+            f"{members:>8} {before * 1e3:>12.2f} ms {after * 1e3:>10.2f} ms "
+            f"{saved * 1e3:>7.2f} ms {saved / members * 1e6:>10.2f} µs"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+Benchmark: chat message ingestion throughput with many concurrent senders.
+
+Compares the two ways a ChatConsumer handler can persist a message on one
+worker (one event loop):
+
+- sync: the handler body (authorization, form validation, INSERT,
+  serialization) runs in `database_sync_to_async` closures;
+- async: `MessageService.acreate_message` / `aserialize`, where only the
+  queries go through the async ORM and everything else stays on the loop.
+
+Django's async ORM still runs queries on the thread-sensitive executor, so
+both paths share one DB thread; the difference is how much work occupies it.
+
+Creates a throwaway user and room in the configured database and deletes
+them afterwards. Run with:
+
+    python -m backend.messaging.chat.benchmarks.orm [--senders N] [--messages N]
+"""
+
+import argparse
+import asyncio
+import os
+import time
+import uuid
+
+
+def _setup_django() -> None:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.config.settings")
+    django.setup()
+
+
+def _create_fixture():
+    from backend.access.models import Participant
+    from backend.access.services import RoleService
+    from backend.account.models import User
+    from backend.room.models import Room
+
+    suffix = uuid.uuid4().hex[:8]
+    user = User.objects.create_user(
+        username=f"bench-{suffix}",
+        email=f"bench-{suffix}@example.com",
+        name="Benchmark",
+    )
+    room = Room.objects.create(host=user, name=f"Benchmark {suffix}")
+    Participant.objects.create(user=user, room=room)
+    snapshot = RoleService.get_permission_snapshot(user, room.id)
+    return user, room, snapshot
+
+
+async def _send_sync(user, room, snapshot) -> None:
+    from channels.db import database_sync_to_async
+
+    from backend.messaging.services import MessageService
+
+    @database_sync_to_async
+    def create_message():
+        return MessageService.create_message(
+            user=user, room=room, body="benchmark", snapshot=snapshot
+        )
+
+    @database_sync_to_async
+    def serialize(message):
+        return MessageService.serialize(message)
+
+    await serialize(await create_message())
+
+
+async def _send_async(user, room, snapshot) -> None:
+    from backend.messaging.services import MessageService
+
+    message = await MessageService.acreate_message(
+        user=user, room=room, body="benchmark", snapshot=snapshot
+    )
+    await MessageService.aserialize(message)
+
+
+async def _run(send, senders: int, messages: int, fixture) -> float:
+    async def sender():
+        for _ in range(messages):
+            await send(*fixture)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(sender() for _ in range(senders)))
+    return senders * messages / (time.perf_counter() - started)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--senders", type=int, default=1_000)
+    parser.add_argument("--messages", type=int, default=5, help="per sender")
+    args = parser.parse_args()
+
+    _setup_django()
+    user, room, snapshot = _create_fixture()
+
+    try:
+        print(f"{args.senders} concurrent senders x {args.messages} messages")
+        for name, send in (("sync", _send_sync), ("async", _send_async)):
+            rate = asyncio.run(
+                _run(send, args.senders, args.messages, (user, room, snapshot))
+            )
+            print(f"{name:>6}: {rate:>9.0f} messages/s")
+    finally:
+        room.delete()
+        user.delete()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+"""
+Report: latency of publishing chat events through the ingestion pipeline.
+
+Times `pipeline.apublish` (stream append with sequence number, then the
+broadcast) for single events and for batches, against the configured Redis
+and channel layer. The events go to a scratch room nobody is connected to;
+its stream and sequence keys are deleted afterwards. Run with:
+
+    python -m backend.messaging.chat.benchmarks.publish [--events N] [--batch N]
+"""
+
+import argparse
+import asyncio
+import os
+import statistics
+import time
+import uuid
+
+
+def _setup_django() -> None:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.config.settings")
+    django.setup()
+
+
+def _event(index: int) -> dict:
+    return {
+        "type": "chat_message",
+        "action": "new",
+        "id": str(uuid.uuid4()),
+        "author": "bench",
+        "author_id": str(uuid.UUID(int=0)),
+        "body": f"benchmark message {index}",
+        "is_edited": False,
+        "created_at": "2024-01-01T00:00:00+00:00",
+        "updated_at": "2024-01-01T00:00:00+00:00",
+        "author_avatar": None,
+    }
+
+
+def _report(label: str, timings: list[float], events_per_call: int) -> None:
+    timings = sorted(timings)
+    p50 = statistics.median(timings)
+    p99 = timings[int(len(timings) * 0.99) - 1]
+    per_event = sum(timings) / (len(timings) * events_per_call)
+    print(
+        f"{label:>8} {p50 * 1000:>8.2f}ms {p99 * 1000:>8.2f}ms "
+        f"{per_event * 1_000_000:>10.0f}us"
+    )
+
+
+async def _run(events: int, batch: int) -> None:
+    from backend.core.apps import CoreConfig
+    from backend.messaging import pipeline
+    from backend.messaging.chat.groups import room_seq_key, room_stream_key
+
+    room_id = uuid.uuid4()
+    try:
+        print(f"{'mode':>8} {'p50':>10} {'p99':>10} {'per event':>10}")
+
+        timings = []
+        for index in range(events):
+            started = time.perf_counter()
+            await pipeline.apublish(room_id, [_event(index)])
+            timings.append(time.perf_counter() - started)
+        _report("single", timings, 1)
+
+        timings = []
+        for index in range(max(1, events // batch)):
+            started = time.perf_counter()
+            await pipeline.apublish(
+                room_id, [_event(index) for _ in range(batch)], batch=True
+            )
+            timings.append(time.perf_counter() - started)
+        _report(f"batch{batch}", timings, batch)
+    finally:
+        await CoreConfig.get_redis_client().delete(
+            room_stream_key(room_id), room_seq_key(room_id)
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--events", type=int, default=2_000)
+    parser.add_argument("--batch", type=int, default=20)
+    args = parser.parse_args()
+
+    _setup_django()
+    asyncio.run(_run(args.events, args.batch))
+
+
+if __name__ == "__main__":
+    main()
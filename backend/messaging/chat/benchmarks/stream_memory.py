@@ -0,0 +1,122 @@
+"""
+Report: Redis memory per chat message stored in a room stream.
+
+Fills one scratch stream per layout with the same synthetic chat events and
+reads back `MEMORY USAGE` of the key:
+
+- legacy: the layout before entry encodings, a JSON `data` field plus a
+  redundant ISO `timestamp` field;
+- json / zlib / msgpack: the encodings selectable with
+  REDIS_STREAMS["ENCODING"].
+
+Also prints the worst-case footprint of one room under the configured
+REDIS_STREAMS["MAX_STREAM_LENGTH"]. Needs the configured Redis only; the
+scratch keys are deleted afterwards. Run with:
+
+    python -m backend.messaging.chat.benchmarks.stream_memory [--messages N]
+"""
+
+import argparse
+import json
+import os
+import random
+import uuid
+from datetime import datetime, timezone
+
+
+_WORDS = (
+    "the exam is on friday did anyone finish lab three notes from today's "
+    "lecture are posted can someone explain recursion again thanks see you"
+).split()
+
+
+def _setup_django() -> None:
+    import django
+
+    os.environ.setdefault("DJANGO_SETTINGS_MODULE", "backend.config.settings")
+    django.setup()
+
+
+def _events(count: int, seed: int = 0) -> list[dict]:
+    rng = random.Random(seed)
+    room_id = str(uuid.UUID(int=rng.getrandbits(128)))
+    authors = [
+        (f"student{i}", str(uuid.UUID(int=rng.getrandbits(128)))) for i in range(20)
+    ]
+    events = []
+    for _ in range(count):
+        username, author_id = rng.choice(authors)
+        created_at = datetime.now(timezone.utc).isoformat()
+        events.append(
+            {
+                "type": "chat_message",
+                "action": "new",
+                "id": str(uuid.UUID(int=rng.getrandbits(128))),
+                "author": username,
+                "author_id": author_id,
+                "body": " ".join(rng.choices(_WORDS, k=rng.randint(2, 30))),
+                "is_edited": False,
+                "created_at": created_at,
+                "updated_at": created_at,
+                "author_avatar": None,
+                "room_id": room_id,
+            }
+        )
+    return events
+
+
+def _legacy_fields(event: dict) -> dict:
+    return {
+        "data": json.dumps(event),
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+    }
+
+
+def _measure(client, key: str, entries: list[dict]) -> int:
+    client.delete(key)
+    pipe = client.pipeline(transaction=False)
+    for fields in entries:
+        pipe.xadd(key, fields)
+    pipe.execute()
+    try:
+        return client.memory_usage(key, samples=0)
+    finally:
+        client.delete(key)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--messages", type=int, default=10_000)
+    args = parser.parse_args()
+
+    _setup_django()
+
+    import redis
+    from django.conf import settings
+
+    from backend.messaging.chat.streams import STREAM_CODECS, encode_event
+
+    client = redis.Redis(
+        host=settings.REDIS_HOST, port=settings.REDIS_PORT, db=settings.REDIS_DB
+    )
+    events = _events(args.messages)
+    layouts = {"legacy": [_legacy_fields(event) for event in events]}
+    for name, codec in STREAM_CODECS.items():
+        layouts[name] = [encode_event(event, codec) for event in events]
+
+    max_length = settings.REDIS_STREAMS["MAX_STREAM_LENGTH"]
+    baseline = None
+    print(f"{args.messages} messages per stream, MAX_STREAM_LENGTH={max_length}")
+    print(f"{'layout':>8} {'bytes/msg':>10} {'vs legacy':>10} {'per room':>10}")
+    for name, entries in layouts.items():
+        key = f"bench:stream_memory:{name}:{uuid.uuid4().hex}"
+        per_message = _measure(client, key, entries) / args.messages
+        baseline = baseline or per_message
+        print(
+            f"{name:>8} {per_message:>10.1f} {per_message / baseline:>10.0%} "
+            f"{per_message * max_length / 2**20:>8.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
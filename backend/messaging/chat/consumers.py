@@ -1,10 +1,13 @@
+import asyncio
 import uuid
-import json
 import logging
+import time
+from collections import Counter
 from datetime import datetime
 from typing import Any, Optional
+from urllib.parse import parse_qs
 
-from django.utils.timezone import now
+from django.conf import settings
 from channels.db import database_sync_to_async
 from channels.generic.websocket import AsyncWebsocketConsumer
 from enum import StrEnum
@@ -13,8 +16,43 @@ from redis.exceptions import RedisError
 from backend.core.exceptions import (
     DomainException,
     FormValidationException,
+    NotFoundException,
+    PermissionException,
+    RateLimitException,
+    ValidationException,
 )
+from backend.account.models import User
+from backend.core import codec
 from backend.core.apps import CoreConfig
+from backend.messaging import pipeline
+from backend.messaging.chat import presence
+from backend.messaging.chat.fanout import get_fanout
+from backend.messaging.chat.middleware import authenticate_token
+from backend.messaging.chat.metrics import (
+    CHAT_DB_SECONDS,
+    CHAT_FRAMES_TOTAL,
+    CHAT_HANDLER_SECONDS,
+    CHAT_MESSAGE_REDIS_SECONDS,
+    CHAT_OPEN_SOCKETS,
+    CHAT_REDIS_ERRORS_TOTAL,
+    CHAT_ROOM_OPEN_SOCKETS,
+)
+from backend.messaging.chat.outbox import OutboundFrame, OutboundQueue, OverflowPolicy
+from backend.messaging.chat.streams import (
+    aevents_since,
+    parse_stream_id,
+    read_events,
+    stream_id_to_datetime,
+)
+from backend.messaging.chat.receipts import get_receipt_buffer
+from backend.messaging.chat.subscriptions import (
+    ROOM_LIMIT_FIELDS,
+    ConnectionUser,
+    RoomSubscription,
+    load_subscriptions,
+)
+from backend.messaging.dtos import BatchAction, BatchOperation, BatchResult
+from backend.room.models import Room
 
 
 logger = logging.getLogger(__name__)
@@ -24,16 +62,92 @@ class ClientMessageType(StrEnum):
     TEXT = "text"
     DELETE = "delete"
     UPDATE = "update"
+    HEARTBEAT = "heartbeat"
+    READ = "read"
+    SUBSCRIBE = "subscribe"
+    UNSUBSCRIBE = "unsubscribe"
+    RESUME = "resume"
+    BATCH = "batch"
+    AUTH = "auth"
+
+
+class FrameOutcome(StrEnum):
+    """How handling an inbound frame ended, see CHAT_FRAMES_TOTAL."""
+
+    OK = "ok"
+    # Malformed or not addressed to a subscribed room
+    INVALID = "invalid"
+    RATE_LIMITED = "rate_limited"
+    VALIDATION_ERROR = "validation_error"
+    PERMISSION_DENIED = "permission_denied"
+    NOT_FOUND = "not_found"
+    ERROR = "error"
+
+
+def _exception_outcome(e: DomainException) -> FrameOutcome:
+    if isinstance(e, ValidationException):
+        return FrameOutcome.VALIDATION_ERROR
+    if isinstance(e, PermissionException):
+        return FrameOutcome.PERMISSION_DENIED
+    if isinstance(e, NotFoundException):
+        return FrameOutcome.NOT_FOUND
+    if isinstance(e, RateLimitException):
+        return FrameOutcome.RATE_LIMITED
+    return FrameOutcome.ERROR
+
+
+# Connections of this worker per room. Rooms with at least
+# CHAT_ROOM_METRICS_MIN_SOCKETS of them are exported as CHAT_ROOM_OPEN_SOCKETS;
+# smaller ones are left out to bound the number of series.
+_room_sockets: Counter[uuid.UUID] = Counter()
+
+
+def _count_room_socket(room_id: uuid.UUID, delta: int) -> None:
+    count = _room_sockets[room_id] + delta
+    if count > 0:
+        _room_sockets[room_id] = count
+    else:
+        del _room_sockets[room_id]
+
+    threshold = settings.CHAT_ROOM_METRICS_MIN_SOCKETS
+    if threshold > 0 and count >= threshold:
+        CHAT_ROOM_OPEN_SOCKETS.labels(room_id=str(room_id)).set(count)
+    elif count - delta >= threshold > 0:
+        try:
+            CHAT_ROOM_OPEN_SOCKETS.remove(str(room_id))
+        except KeyError:
+            pass
+
+
+# Client operation types accepted in a `batch` frame
+_BATCH_ACTIONS = {
+    ClientMessageType.TEXT: BatchAction.NEW,
+    ClientMessageType.UPDATE: BatchAction.UPDATE,
+    ClientMessageType.DELETE: BatchAction.DELETE,
+}
 
 
 class ChatConsumer(AsyncWebsocketConsumer):
+    """
+    Chat connection bound to the room in its URL.
+
+    Per-room state lives in `RoomSubscription` objects, so the same handlers
+    serve `MultiplexChatConsumer`, where one connection follows many rooms.
+    """
+
+    multiplexed = False
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
-        self.stream_key: Optional[str] = None
-        self.initialized: bool = False
-        self.room_id: Optional[uuid.UUID] = None
-        self.room = None
-        self._last_seen_updated_at: Optional[datetime] = None
+        self.user: Optional[ConnectionUser] = None
+        self.subscriptions: dict[uuid.UUID, RoomSubscription] = {}
+        self.outbox: Optional[OutboundQueue] = None
+        self._last_heartbeat_at: Optional[float] = None
+        self._auth_expiry: Optional[asyncio.TimerHandle] = None
+        self._counted_open = False
+        # Type and outcome of the frame being handled, for CHAT_FRAMES_TOTAL
+        self._frame_type = "unknown"
+        self._frame_outcome = FrameOutcome.OK
 
     @property
     def redis_client(self):
@@ -41,11 +155,9 @@ class ChatConsumer(AsyncWebsocketConsumer):
         return CoreConfig.get_redis_client()
 
     @property
-    def max_messages_per_second(self) -> int:
-        """Set `MAX_MESSAGES_PER_SEC=0` to disable rate limiting."""
-        from django.conf import settings
-
-        return settings.MAX_MESSAGES_PER_SEC
+    def stream_client(self):
+        """Room streams may hold binary (compressed) entries."""
+        return CoreConfig.get_binary_redis_client()
 
     # ------------------------------------------------------------------
     # Helpers
@@ -65,44 +177,160 @@ class ChatConsumer(AsyncWebsocketConsumer):
         except (ValueError, AttributeError):
             return None
 
-    async def _rate_limited(self) -> bool:
-        limit = self.max_messages_per_second
-        if limit <= 0:
-            return False
+    async def _rate_limited(self, sub: RoomSubscription, cost: int = 1) -> bool:
+        from backend.messaging.ratelimit import aallow_message
 
-        if not self.room_id or not self.user:
-            return False
+        bucket = sub.bucket
+        if bucket is not None and not bucket.consume(cost):
+            return True
 
-        key = f"ws_rl:{self.room_id}:{self.user.id}"
-        try:
-            pipe = self.redis_client.pipeline(transaction=True)
-            pipe.incr(key)
-            pipe.expire(key, 1)
-            count, _ = await pipe.execute()
-            return count > limit
-        except (RedisError, OSError):
-            logger.warning("Rate limit check failed (redis unavailable)", exc_info=True)
+        if await aallow_message(self.user.id, sub.as_room(), cost):
             return False
+        # Denied by a shared quota: the frame doesn't use up connection budget
+        if bucket is not None:
+            bucket.refund(cost)
+        return True
 
-    async def _maybe_update_last_seen(self) -> None:
-        from backend.account.utils import update_last_seen, get_inactivity_threshold
+    def _max_batch_operations(self, sub: RoomSubscription) -> int:
+        """
+        The most operations a batch may hold. Batches are charged one message
+        per operation, and a quota never holds more than its burst, so larger
+        batches could never be admitted (slow mode admits one at a time).
+        """
+        from backend.messaging.ratelimit import message_quotas
+
+        limits = [settings.CHAT_MAX_BATCH_OPERATIONS]
+        limits += [quota.burst for quota in message_quotas(self.user.id, sub.as_room())]
+        if sub.bucket is not None:
+            limits.append(sub.bucket.burst)
+        return max(1, int(min(limits)))
+
+    def _parse_batch_operation(self, raw: Any) -> Optional[BatchOperation]:
+        if not isinstance(raw, dict):
+            return None
+        action = _BATCH_ACTIONS.get(self._parse_message_type(raw.get("type")))
+        body = raw.get("message")
+        message_id = self._parse_uuid(raw.get("messageId"))
+        if action is None:
+            return None
+        if action is not BatchAction.DELETE and not isinstance(body, str):
+            return None
+        if action is not BatchAction.NEW and message_id is None:
+            return None
+        return BatchOperation(action=action, message_id=message_id, body=body)
 
-        threshold = get_inactivity_threshold()
+    async def _heartbeat(self, force: bool = False) -> None:
+        """Refresh presence in all subscribed rooms, throttled unless forced."""
+        current = time.monotonic()
         if (
-            self._last_seen_updated_at is None
-            or (now() - self._last_seen_updated_at) > threshold
+            not force
+            and self._last_heartbeat_at is not None
+            and current - self._last_heartbeat_at < settings.PRESENCE_TTL / 2
         ):
-            await database_sync_to_async(update_last_seen)(user=self.user)
-            self._last_seen_updated_at = now()
+            return
+
+        self._last_heartbeat_at = current
+        await presence.heartbeat(
+            list(self.subscriptions), self.user.id, self.channel_name
+        )
+
+    def _count_open(self) -> None:
+        self._counted_open = True
+        CHAT_OPEN_SOCKETS.inc()
+
+    def _set_user(self, user) -> None:
+        self.user = user if isinstance(user, ConnectionUser) else ConnectionUser(user)
+
+    def _query_param(self, name: str) -> Optional[str]:
+        query = parse_qs(self.scope.get("query_string", b"").decode())
+        return query.get(name, [None])[0]
+
+    def _open_outbox(self) -> None:
+        """
+        Queue broadcasts instead of writing them to the socket directly.
+
+        The queue starts paused, call `outbox.resume()` once the connection
+        is accepted and any replay has been sent.
+        """
+        config = settings.CHAT_OUTBOUND
+        batching = self._query_param("batch") == "1"
+        self.outbox = OutboundQueue(
+            self._send_text,
+            max_frames=config["MAX_FRAMES"],
+            policy=OverflowPolicy(config["OVERFLOW_POLICY"]),
+            on_overflow=self._close_overflowed,
+            batch_window=config["BATCH_WINDOW_MS"] / 1000 if batching else 0,
+            max_batch=config["MAX_BATCH_FRAMES"],
+        )
+        self.outbox.pause()
+        self.outbox.start()
+
+    async def _send_text(self, text: str) -> None:
+        await self.send(text_data=text)
+
+    async def _close_overflowed(self) -> None:
+        """Drop a client that can't keep up, telling it where to resume."""
+        await self.send(
+            text_data=codec.dumps(
+                {"type": "overflow", "resume": self.outbox.last_stream_ids}
+            )
+        )
+        await self.close(code=4008)
+
+    async def _close_unavailable(self) -> None:
+        """
+        Drop a client whose room broadcasts could not be subscribed to,
+        telling it where to resume, rather than leave it silently missing
+        them.
+        """
+        await self.send(
+            text_data=codec.dumps(
+                {"type": "unavailable", "resume": self.outbox.last_stream_ids}
+            )
+        )
+        await self.close(code=4503)
+
+    def _watch_auth_expiry(self, expires_at: Optional[float]) -> None:
+        """Close the connection when its token expires, unless refreshed first."""
+        if self._auth_expiry is not None:
+            self._auth_expiry.cancel()
+            self._auth_expiry = None
+        if expires_at is None:
+            return
+
+        delay = max(0.0, expires_at - time.time())
+        self._auth_expiry = asyncio.get_running_loop().call_later(
+            delay, lambda: asyncio.ensure_future(self._close_expired())
+        )
+
+    async def _close_expired(self) -> None:
+        self._auth_expiry = None
+        await self.send(text_data=codec.dumps({"type": "auth_expired"}))
+        await self.close(code=4001)
 
     # TODO: standardize error message format
-    async def send_error(self, error_message):
+    async def send_error(self, error_message, sub: Optional[RoomSubscription] = None):
         """
         Send an error message to the WebSocket client.
         Accepts a string or a structured dict.
         """
+        if self._frame_outcome is FrameOutcome.OK:
+            self._frame_outcome = FrameOutcome.INVALID
+
         payload = {"error": error_message}
-        await self.send(text_data=json.dumps(payload))
+        if sub is not None and self.multiplexed:
+            payload["room_id"] = str(sub.room_id)
+        await self.send(text_data=codec.dumps(payload))
+
+    async def _send_exception(
+        self, e: DomainException, sub: Optional[RoomSubscription] = None
+    ) -> None:
+        """Report a rejected operation to the client, recording why."""
+        self._frame_outcome = _exception_outcome(e)
+        if isinstance(e, FormValidationException):
+            await self.send_error({"message": str(e), "errors": e.errors}, sub)
+        else:
+            await self.send_error(str(e), sub)
 
     # ------------------------------------------------------------------
     # Connection lifecycle
@@ -119,71 +347,145 @@ class ChatConsumer(AsyncWebsocketConsumer):
             await self.close()
             return
 
-        self.user = user
+        self._set_user(user)
 
         raw_room_id = self.scope.get("url_route", {}).get("kwargs", {}).get("room_id")
         try:
-            self.room_id = uuid.UUID(str(raw_room_id))
+            room_id = uuid.UUID(str(raw_room_id))
         except (ValueError, TypeError, AttributeError):
             logger.warning(f"Invalid room_id (not a UUID): {raw_room_id!r}")
             await self.close()
             return
 
-        room_id_str = str(self.room_id)
-        self.room_group_name = f"chat_{room_id_str}"
-        self.stream_key = f"chat_stream:{room_id_str}"
-
-        from backend.room.models import Room
-        from backend.access.models import Participant
-
-        room = await database_sync_to_async(
-            Room.objects.filter(id=self.room_id).first
-        )()
-        if room is None:
-            logger.warning(f"Room not found: {self.room_id}")
-            await self.close()
+        self._open_outbox()
+        try:
+            subscribed = await self.subscribe([room_id])
+        except (RedisError, OSError):
+            # Not accepted yet: the client retries the connection later.
+            await self.outbox.stop()
+            await self.close(code=4503)
             return
-
-        is_participant = await database_sync_to_async(
-            Participant.objects.filter(user=self.user, room=room).exists
-        )()
-        if not is_participant:
+        if not subscribed:
+            logger.warning(f"Room not found or not a participant: {room_id}")
+            await self.outbox.stop()
             await self.close()
             return
 
-        # Cache room to avoid DB lookup on every received message
-        self.room = room
-
-        await self.channel_layer.group_add(self.room_group_name, self.channel_name)
-        self.initialized = True
         await self.accept()
+        self._count_open()
+        self._watch_auth_expiry(self.scope.get("auth_expires_at"))
 
-    async def disconnect(self, close_code):
-        """Leave the room group on disconnect."""
-        if not self.initialized:
-            return
+        # Resuming clients pass the last stream ID they saw; live events that
+        # arrive meanwhile are queued and delivered after the replay.
+        last_event_id = self._query_param("last_event_id")
+        if last_event_id:
+            await self.replay_since(subscribed[0], last_event_id)
+        self.outbox.resume()
 
-        await self.channel_layer.group_discard(self.room_group_name, self.channel_name)
+    async def disconnect(self, close_code):
+        """Leave every room group on disconnect."""
+        self._watch_auth_expiry(None)
+        if self._counted_open:
+            self._counted_open = False
+            CHAT_OPEN_SOCKETS.dec()
+        if self.subscriptions:
+            await self.unsubscribe(list(self.subscriptions))
+        if self.outbox is not None:
+            await self.outbox.stop()
         # Do NOT close the shared Redis client here.
 
+    async def subscribe(self, room_ids: list[uuid.UUID]) -> list[RoomSubscription]:
+        """
+        Join the groups of the given rooms the user participates in.
+
+        Participation in the whole set is checked with one batched query.
+        Returns the new subscriptions; rooms already subscribed are skipped.
+        Raises RedisError/OSError, having joined none of the rooms, if the
+        broadcasts of a room could not be subscribed to.
+        """
+        wanted = [room_id for room_id in room_ids if room_id not in self.subscriptions]
+        if not wanted:
+            return []
+
+        with CHAT_DB_SECONDS.labels(operation="subscribe").time():
+            subs = await database_sync_to_async(load_subscriptions)(
+                self.user.as_user(), wanted
+            )
+
+        fanout = get_fanout()
+        for sub in subs:
+            await self.channel_layer.group_add(sub.group_name, self.channel_name)
+            try:
+                await fanout.register(sub.room_id, self)
+            except (RedisError, OSError):
+                await self.channel_layer.group_discard(
+                    sub.group_name, self.channel_name
+                )
+                await self.unsubscribe([s.room_id for s in subs])
+                raise
+            self.subscriptions[sub.room_id] = sub
+            _count_room_socket(sub.room_id, 1)
+
+        if subs:
+            await presence.heartbeat(
+                [sub.room_id for sub in subs], self.user.id, self.channel_name
+            )
+        return subs
+
+    async def unsubscribe(self, room_ids: list[uuid.UUID]) -> list[uuid.UUID]:
+        """Leave the groups of the given rooms, returns the rooms that were left."""
+        fanout = get_fanout()
+        left = []
+        for room_id in room_ids:
+            sub = self.subscriptions.pop(room_id, None)
+            if sub is None:
+                continue
+            await self.channel_layer.group_discard(sub.group_name, self.channel_name)
+            await fanout.unregister(room_id, self)
+            _count_room_socket(room_id, -1)
+            if self.outbox is not None:
+                self.outbox.last_stream_ids.pop(str(room_id), None)
+            left.append(room_id)
+
+        if left:
+            await presence.leave(left, self.user.id, self.channel_name)
+        return left
+
     # ------------------------------------------------------------------
     # Message routing
     # ------------------------------------------------------------------
 
+    def _target(self, data: dict) -> Optional[RoomSubscription]:
+        """The subscription a client frame is addressed to."""
+        return next(iter(self.subscriptions.values()), None)
+
     async def receive(self, text_data):
+        """Handle a frame, recording its type, outcome and handling time."""
+        self._frame_type = "unknown"
+        self._frame_outcome = FrameOutcome.OK
+        started = time.perf_counter()
+        try:
+            await self._receive(text_data)
+        except Exception:
+            self._frame_outcome = FrameOutcome.ERROR
+            raise
+        finally:
+            CHAT_FRAMES_TOTAL.labels(
+                type=self._frame_type, outcome=self._frame_outcome
+            ).inc()
+            CHAT_HANDLER_SECONDS.labels(type=self._frame_type).observe(
+                time.perf_counter() - started
+            )
+
+    async def _receive(self, text_data):
         """
-        Handle incoming messages: text, delete, or update.
+        Handle incoming messages: text, delete, update, batch, heartbeat, read,
+        resume or auth.
         Assumes only participants reach this point.
         """
-        if await self._rate_limited():
-            await self.send_error("Too many messages. Please slow down.")
-            return
-
-        await self._maybe_update_last_seen()
-
         try:
-            data = json.loads(text_data)
-        except json.JSONDecodeError:
+            data = codec.loads(text_data)
+        except codec.DecodeError:
             await self.send_error("Invalid JSON.")
             return
 
@@ -191,201 +493,585 @@ class ChatConsumer(AsyncWebsocketConsumer):
         if msg_type is None:
             await self.send_error("Unknown message type.")
             return
+        self._frame_type = msg_type.value
+
+        # Heartbeats keep the connection in the rooms' presence sets and are
+        # not charged against the message rate limits.
+        if msg_type is ClientMessageType.HEARTBEAT:
+            await self._heartbeat(force=True)
+            return
 
-        # `self.room` is cached in connect(); fall back defensively.
-        room = self.room
-        if room is None:
-            await self.send_error("Room not loaded.")
+        if msg_type in (ClientMessageType.SUBSCRIBE, ClientMessageType.UNSUBSCRIBE):
+            await self.handle_subscription_frame(msg_type, data)
+            return
+
+        if msg_type is ClientMessageType.AUTH:
+            token = data.get("token")
+            if not isinstance(token, str) or not token:
+                await self.send_error("Invalid or missing 'token'.")
+                return
+            await self.handle_auth(token)
+            return
+
+        sub = self._target(data)
+        if sub is None:
+            await self.send_error("Not subscribed to this room.")
+            return
+
+        # Read acks only advance this participant's watermark, in batches
+        if msg_type is ClientMessageType.READ:
+            message_id = self._parse_uuid(data.get("messageId"))
+            if not message_id:
+                await self.send_error("Invalid or missing 'messageId'.", sub)
+                return
+            # The receipt buffer delays the write anyway, and retries acks
+            # of messages not stored yet: no need to flush them first.
+            get_receipt_buffer().add(sub.participant_id, message_id)
+            return
+
+        if msg_type is ClientMessageType.RESUME:
+            seq = data.get("seq")
+            if not isinstance(seq, int) or isinstance(seq, bool) or seq < 0:
+                await self.send_error("Invalid or missing 'seq'.", sub)
+                return
+            await self.handle_resume(sub, seq)
+            return
+
+        operations = None
+        if msg_type is ClientMessageType.BATCH:
+            operations = await self._parse_batch(sub, data.get("operations"))
+            if operations is None:
+                return
+
+        # Independent round trips: the rate limit check and the (throttled)
+        # presence refresh run concurrently. A batch is charged as many
+        # messages as it holds operations.
+        with CHAT_MESSAGE_REDIS_SECONDS.labels(stage="admit").time():
+            rate_limited, _ = await asyncio.gather(
+                self._rate_limited(sub, len(operations) if operations else 1),
+                self._heartbeat(),
+            )
+        if rate_limited:
+            self._frame_outcome = FrameOutcome.RATE_LIMITED
+            await self.send_error("Too many messages. Please slow down.", sub)
+            return
+
+        if operations is not None:
+            await self.handle_batch(sub, operations)
             return
 
         if msg_type is ClientMessageType.TEXT:
             message_body = data.get("message")
             if not isinstance(message_body, str):
-                await self.send_error("Missing or invalid 'message'.")
+                await self.send_error("Missing or invalid 'message'.", sub)
                 return
-            await self.handle_new_message(room, message_body)
+            await self.handle_new_message(sub, message_body)
             return
 
         if msg_type is ClientMessageType.DELETE:
             message_id = self._parse_uuid(data.get("messageId"))
             if not message_id:
-                await self.send_error("Invalid or missing 'messageId'.")
+                await self.send_error("Invalid or missing 'messageId'.", sub)
                 return
-            await self.handle_delete_message(message_id)
+            await self.handle_delete_message(sub, message_id)
             return
 
         if msg_type is ClientMessageType.UPDATE:
             message_id = self._parse_uuid(data.get("messageId"))
             new_body = data.get("message")
             if not message_id:
-                await self.send_error("Invalid or missing 'messageId'.")
+                await self.send_error("Invalid or missing 'messageId'.", sub)
                 return
             if not isinstance(new_body, str):
-                await self.send_error("Missing or invalid 'message'.")
+                await self.send_error("Missing or invalid 'message'.", sub)
                 return
-            await self.handle_update_message(message_id, new_body)
+            await self.handle_update_message(sub, message_id, new_body)
             return
 
     # ------------------------------------------------------------------
     # Message handlers
     # ------------------------------------------------------------------
 
-    async def handle_new_message(self, room, message_body):
-        """Handle creation of a new message."""
-        from backend.messaging.services import MessageService
+    async def handle_subscription_frame(
+        self, msg_type: ClientMessageType, data: dict
+    ) -> None:
+        """Subscription control frames are only accepted by multiplexed connections."""
+        await self.send_error("Unknown message type.")
 
-        @database_sync_to_async
-        def create_message(user, room, body):
-            return MessageService.create_message(user=user, room=room, body=body)
+    async def _parse_batch(
+        self, sub: RoomSubscription, raw: Any
+    ) -> Optional[list[BatchOperation]]:
+        """
+        Parse the operations of a `batch` frame, or report why it is invalid.
 
-        @database_sync_to_async
-        def serialize(message):
-            return MessageService.serialize(message)
+        Malformed operations reject the whole frame; operations that are
+        merely not permitted or fail validation get their own error result.
+        """
+        limit = self._max_batch_operations(sub)
+        if not isinstance(raw, list) or not raw:
+            await self.send_error("Invalid or missing 'operations'.", sub)
+            return None
+        if len(raw) > limit:
+            await self.send_error(f"A batch may hold at most {limit} operations.", sub)
+            return None
 
+        operations = [self._parse_batch_operation(item) for item in raw]
+        if None in operations:
+            await self.send_error(
+                f"Invalid operation at index {operations.index(None)}.", sub
+            )
+            return None
+        return operations
+
+    async def handle_batch(
+        self, sub: RoomSubscription, operations: list[BatchOperation]
+    ) -> None:
+        """
+        Apply a batch of text/update/delete operations in one transaction.
+
+        The sender gets a `batch_result` frame with one result per operation,
+        and the room a single `batch` event holding the applied ones.
+        """
         try:
-            new_message = await create_message(
-                user=self.user, room=room, body=message_body
+            results = await pipeline.aapply_batch(
+                self.user.as_user(),
+                sub.as_room(),
+                operations,
+                snapshot=sub.snapshot(self.user.id),
             )
-        except FormValidationException as e:
-            await self.send_error({"message": str(e), "errors": e.errors})
-            return
         except DomainException as e:
-            await self.send_error(str(e))
+            await self._send_exception(e, sub)
             return
 
-        serialized = await serialize(new_message)
-        message_data = {
-            "type": "chat_message",
-            "action": "new",
-            **serialized,
+        payload = {
+            "type": "batch_result",
+            "results": [self._batch_result(result) for result in results],
         }
+        if self.multiplexed:
+            payload["room_id"] = str(sub.room_id)
+        await self.send(text_data=codec.dumps(payload))
+
+    @staticmethod
+    def _batch_result(result: BatchResult) -> dict:
+        if not result.ok:
+            error: Any = result.error
+            if result.errors is not None:
+                error = {"message": result.error, "errors": result.errors}
+            return {"index": result.index, "ok": False, "error": error}
+        return {"index": result.index, "ok": True, "id": str(result.message_id)}
+
+    async def handle_new_message(self, sub: RoomSubscription, message_body: str):
+        """Handle creation of a new message."""
+        try:
+            await pipeline.acreate_message(
+                self.user.as_user(),
+                sub.as_room(),
+                message_body,
+                snapshot=sub.snapshot(self.user.id),
+            )
+        except DomainException as e:
+            await self._send_exception(e, sub)
 
-        await self.channel_layer.group_send(self.room_group_name, message_data)
-        await self.publish_to_stream(message_data)
+    async def handle_auth(self, token: str) -> None:
+        """
+        Re-authenticate the connection with a fresh token, keeping its rooms.
 
-    async def handle_delete_message(self, message_id: uuid.UUID):
-        """Handle deletion of a message."""
-        from backend.messaging.models import Message
-        from backend.messaging.services import MessageService
+        The token must belong to the connected user. Its expiry replaces the
+        previous one; a rejected token leaves the current expiry in place.
+        """
+        user, expires_at = await authenticate_token(token)
+        if not user.is_authenticated or user.id != self.user.id:
+            await self.send_error("Invalid or expired token.")
+            return
 
-        @database_sync_to_async
-        def get_message():
-            return Message.objects.filter(id=message_id).first()
+        self.user = ConnectionUser(user)
+        self._watch_auth_expiry(expires_at)
+        await self.send(
+            text_data=codec.dumps({"type": "auth_refreshed", "expires_at": expires_at})
+        )
 
-        @database_sync_to_async
-        def delete_message(message):
-            return MessageService.delete_message(self.user, message)
+    async def handle_resume(self, sub: RoomSubscription, seq: int) -> None:
+        """
+        Send the room events after sequence number `seq` as one `resumed` frame.
 
-        message = await get_message()
-        if message is None:
-            await self.send_error("Message not found.")
-            return
+        Live events that arrive meanwhile are held back until it is sent. If
+        the stream can't serve the whole delta, `complete` is false and the
+        client should reload the room instead.
+        """
+        self.outbox.pause()
+        try:
+            delta = await aevents_since(
+                self.stream_client,
+                sub.stream_key,
+                sub.seq_key,
+                seq,
+                settings.CHAT_REPLAY_MAX_EVENTS,
+            )
+            await self.send(
+                text_data=codec.dumps(
+                    {
+                        "type": "resumed",
+                        "room_id": str(sub.room_id),
+                        "events": delta.events,
+                        "latest_seq": delta.latest_seq,
+                        "complete": delta.complete,
+                    }
+                )
+            )
+        except (RedisError, OSError):
+            logger.error("Error reading room events (redis unavailable)", exc_info=True)
+            CHAT_REDIS_ERRORS_TOTAL.labels(operation="stream_read").inc()
+            await self.send_error("Resume is temporarily unavailable.", sub)
+        finally:
+            self.outbox.resume()
 
+    async def handle_delete_message(self, sub: RoomSubscription, message_id: uuid.UUID):
+        """Handle deletion of a message."""
         try:
-            await delete_message(message)
+            await pipeline.adelete_message(
+                self.user.as_user(),
+                sub.room_id,
+                message_id,
+                snapshot=sub.snapshot(self.user.id),
+            )
         except DomainException as e:
-            await self.send_error(str(e))
-            return
-
-        message_data = {
-            "type": "chat_message",
-            "action": "delete",
-            "id": str(message_id),
-        }
-
-        await self.channel_layer.group_send(self.room_group_name, message_data)
-        await self.publish_to_stream(message_data)
+            await self._send_exception(e, sub)
 
-    async def handle_update_message(self, message_id: uuid.UUID, new_body: str):
+    async def handle_update_message(
+        self, sub: RoomSubscription, message_id: uuid.UUID, new_body: str
+    ):
         """Handle updating a message."""
-        from backend.messaging.models import Message
-        from backend.messaging.services import MessageService
-
-        @database_sync_to_async
-        def get_message():
-            return Message.objects.filter(id=message_id).first()
-
-        @database_sync_to_async
-        def do_update(message):
-            return MessageService.update_message(
-                user=self.user, message=message, body=new_body
+        try:
+            await pipeline.aupdate_message(
+                self.user.as_user(),
+                sub.room_id,
+                message_id,
+                new_body,
+                snapshot=sub.snapshot(self.user.id),
             )
+        except DomainException as e:
+            await self._send_exception(e, sub)
+
+    async def _refresh_user(self) -> None:
+        state = (
+            await User.objects.filter(id=self.user.id)
+            .values("is_active", "is_superuser")
+            .afirst()
+        )
+        self.user.is_active = bool(state and state["is_active"])
+        self.user.is_superuser = bool(state and state["is_superuser"])
+
+    async def access_invalidate(self, event):
+        """
+        Reload the permission snapshot after a role or membership change, and
+        the room's rate limits after room-wide changes.
+        """
+        from backend.access.services import RoleService
 
-        @database_sync_to_async
-        def serialize(message):
-            return MessageService.serialize(message)
+        sub = self.subscriptions.get(self._parse_uuid(event.get("room_id")))
+        if sub is None:
+            return
 
-        message = await get_message()
-        if message is None:
-            await self.send_error("Message not found.")
+        user_id = event.get("user_id")
+        if user_id and user_id != str(self.user.id):
             return
 
-        try:
-            updated_message = await do_update(message)
-        except FormValidationException as e:
-            await self.send_error({"message": str(e), "errors": e.errors})
+        role_id = event.get("role_id")
+        if role_id and role_id != str(sub.role_id):
             return
-        except DomainException as e:
-            await self.send_error(str(e))
+
+        with CHAT_DB_SECONDS.labels(operation="permissions").time():
+            if user_id:
+                # Bans and deactivation are sent to the user: take the
+                # account's current state, not the one it connected with.
+                await self._refresh_user()
+            snapshot = await database_sync_to_async(
+                RoleService.get_permission_snapshot
+            )(self.user.as_user(), sub.room_id)
+            room = None
+            if snapshot is not None and not user_id and not role_id:
+                room = (
+                    await Room.objects.filter(id=sub.room_id)
+                    .only("id", *ROOM_LIMIT_FIELDS)
+                    .afirst()
+                )
+
+        if snapshot is None:
+            # No longer a participant: revoke access to the room.
+            await self.revoke(sub)
             return
 
-        serialized = await serialize(updated_message)
-        message_data = {
-            "type": "chat_message",
-            "action": "update",
-            **serialized,
-        }
+        sub.grant(snapshot)
+        if room is not None:
+            sub.limit(room)
 
-        await self.channel_layer.group_send(self.room_group_name, message_data)
-        await self.publish_to_stream(message_data)
+    async def revoke(self, sub: RoomSubscription) -> None:
+        await self.close(code=4003)
 
     async def chat_message(self, event):
-        """Receive messages broadcast to the group and relay to this client."""
-        await self.send(text_data=json.dumps(event))
+        """
+        Receive messages broadcast to the group and relay to this client.
+
+        The sender encodes the client frame once and ships it as `text`, so
+        recipients forward it untouched. Plain dict events are still encoded
+        here for senders that predate that. Frames go through the outbound
+        queue, so a slow client never blocks the channel layer.
+        """
+        text = event.get("text")
+        if text is None:
+            text = codec.dumps(event)
+
+        if self.outbox is None:
+            await self.send(text_data=text)
+            return
+
+        self.outbox.put(
+            OutboundFrame(
+                text,
+                key=event.get("key"),
+                room_id=event.get("room_id"),
+                stream_id=event.get("stream_id"),
+            )
+        )
+
+    async def get_message_history(self, sub: RoomSubscription, start_id="-", count=50):
+        """
+        Retrieve message history from Redis Streams.
 
-    async def publish_to_stream(self, message_data):
-        """Publish a message to Redis Streams for history/persistence."""
+        `start_id` follows XRANGE syntax, prefix it with `(` to exclude it.
+        """
         try:
-            await self.redis_client.xadd(
-                self.stream_key,
-                {
-                    "data": json.dumps(message_data),
-                    "timestamp": now().isoformat(),
-                },
+            entries = await read_events(
+                self.stream_client, sub.stream_key, start_id, "+", count=count
             )
-        except TypeError:
-            logger.error("Message data not JSON-serializable", exc_info=True)
         except (RedisError, OSError):
             logger.error(
-                "Error publishing to stream (redis unavailable)", exc_info=True
+                "Error retrieving message history (redis unavailable).", exc_info=True
             )
+            CHAT_REDIS_ERRORS_TOTAL.labels(operation="stream_read").inc()
+            return []
+
+        return [
+            {
+                **message_data,
+                "stream_id": msg_id,
+                "timestamp": stream_id_to_datetime(parse_stream_id(msg_id)).isoformat(),
+            }
+            for msg_id, message_data in entries
+            if message_data is not None
+        ]
+
+    async def replay_since(self, sub: RoomSubscription, last_event_id: str) -> None:
+        """
+        Send the events a reconnecting client missed after `last_event_id`.
+
+        Events are read from the room stream. If the stream has been trimmed
+        past that ID (or is unavailable), messages created or edited since its
+        timestamp are loaded from the database instead. Deletions can't be
+        recovered from there, so such replays are flagged `resync_required`:
+        the client should reload the room's history. Ends with a
+        `replay_complete` frame carrying the stream ID to resume from next
+        time, which never skips events that weren't sent.
+        """
+        last_seen = parse_stream_id(last_event_id)
+        if last_seen is None:
+            await self.send_error("Invalid 'last_event_id'.", sub)
+            return
+
+        limit = settings.CHAT_REPLAY_MAX_EVENTS
 
-    async def get_message_history(self, start_id="0", count=50):
-        """Retrieve message history from Redis Streams."""
         try:
-            messages = await self.redis_client.xrange(
-                self.stream_key, start_id, "+", count=count
+            oldest = await read_events(
+                self.stream_client, sub.stream_key, "-", "+", count=1
             )
         except (RedisError, OSError):
-            logger.error(
-                "Error retrieving message history (redis unavailable).", exc_info=True
+            logger.warning("Stream replay unavailable (redis down)", exc_info=True)
+            CHAT_REDIS_ERRORS_TOTAL.labels(operation="stream_read").inc()
+            oldest = []
+
+        if oldest and parse_stream_id(oldest[0][0]) <= last_seen:
+            events = await self.get_message_history(
+                sub, start_id=f"({last_event_id}", count=limit + 1
             )
-            return []
+            source = "stream"
+            resume_id = events[:limit][-1]["stream_id"] if events else last_event_id
+        else:
+            events = await self._load_changes_since(
+                sub, stream_id_to_datetime(last_seen), limit + 1
+            )
+            source = "database"
+            # Database events carry no stream ID: only move past the cursor
+            # once every change since was sent.
+            if len(events) > limit:
+                resume_id = last_event_id
+            else:
+                resume_id = await self._latest_stream_id(sub)
+
+        for event in events[:limit]:
+            await self.send(text_data=codec.dumps({**event, "replayed": True}))
+
+        if self.outbox is not None and resume_id:
+            self.outbox.last_stream_ids[str(sub.room_id)] = resume_id
+
+        await self.send(
+            text_data=codec.dumps(
+                {
+                    "type": "replay_complete",
+                    "room_id": str(sub.room_id),
+                    "source": source,
+                    "stream_id": resume_id,
+                    "truncated": len(events) > limit,
+                    "resync_required": source == "database",
+                }
+            )
+        )
 
-        history = []
-        for msg_id, fields in messages:
-            raw = fields.get("data")
-            if not raw:
-                continue
-            try:
-                message_data = json.loads(raw)
-            except json.JSONDecodeError:
-                logger.warning(
-                    f"Corrupt JSON in redis stream entry {msg_id}", exc_info=True
+    async def _load_changes_since(
+        self, sub: RoomSubscription, since: datetime, limit: int
+    ) -> list[dict]:
+        """
+        Keyset query fallback for replays the stream can no longer serve:
+        messages created (`new`) or edited (`update`) since a point in time.
+
+        Stream IDs only have millisecond precision, so messages of the
+        cursor's millisecond are included; clients may see them twice.
+        """
+        from backend.messaging.models import Message
+        from backend.messaging.services import MessageService
+
+        @database_sync_to_async
+        def load():
+            messages = (
+                Message.objects.in_room(sub.room_id)
+                .with_author()
+                .changed_since(since)[:limit]
+            )
+            return [
+                {
+                    "type": "chat_message",
+                    "action": "new" if m.created_at >= since else "update",
+                    **MessageService.serialize(m),
+                    "room_id": str(sub.room_id),
+                }
+                for m in messages
+            ]
+
+        return await load()
+
+    async def _latest_stream_id(self, sub: RoomSubscription) -> Optional[str]:
+        try:
+            latest = await read_events(
+                self.stream_client, sub.stream_key, count=1, reverse=True
+            )
+        except (RedisError, OSError):
+            CHAT_REDIS_ERRORS_TOTAL.labels(operation="stream_read").inc()
+            return None
+        return latest[0][0] if latest else None
+
+
+class MultiplexChatConsumer(ChatConsumer):
+    """
+    Chat connection that follows many rooms at once.
+
+    Clients manage rooms with control frames:
+
+        {"type": "subscribe", "roomIds": [...], "lastEventIds": {room: id}}
+        {"type": "unsubscribe", "roomIds": [...]}
+
+    and address every other frame to a room with `roomId`. Outgoing frames
+    carry `room_id`.
+    """
+
+    multiplexed = True
+
+    async def connect(self):
+        """Authenticate the user; rooms are subscribed to afterwards."""
+        user = self.scope.get("user")
+
+        if not user or not user.is_authenticated:
+            await self.close()
+            return
+
+        self._set_user(user)
+        self._open_outbox()
+        await self.accept()
+        self._count_open()
+        self._watch_auth_expiry(self.scope.get("auth_expires_at"))
+        self.outbox.resume()
+
+    def _target(self, data: dict) -> Optional[RoomSubscription]:
+        room_id = self._parse_uuid(data.get("roomId"))
+        return self.subscriptions.get(room_id) if room_id else None
+
+    def _parse_room_ids(self, raw: Any) -> Optional[list[uuid.UUID]]:
+        if not isinstance(raw, list):
+            return None
+        room_ids = [self._parse_uuid(value) for value in raw]
+        if None in room_ids:
+            return None
+        return list(dict.fromkeys(room_ids))
+
+    async def handle_subscription_frame(
+        self, msg_type: ClientMessageType, data: dict
+    ) -> None:
+        room_ids = self._parse_room_ids(data.get("roomIds"))
+        if room_ids is None:
+            await self.send_error("Invalid or missing 'roomIds'.")
+            return
+
+        if msg_type is ClientMessageType.UNSUBSCRIBE:
+            left = await self.unsubscribe(room_ids)
+            await self.send(
+                text_data=codec.dumps(
+                    {"type": "unsubscribed", "room_ids": [str(r) for r in left]}
                 )
-                continue
+            )
+            return
+
+        limit = settings.CHAT_MAX_SUBSCRIPTIONS
+        new_ids = [room_id for room_id in room_ids if room_id not in self.subscriptions]
+        if len(self.subscriptions) + len(new_ids) > limit:
+            await self.send_error(f"Cannot subscribe to more than {limit} rooms.")
+            return
+
+        try:
+            subscribed = await self.subscribe(new_ids)
+        except (RedisError, OSError):
+            await self._close_unavailable()
+            return
+        granted = set(room_ids) & set(self.subscriptions)
 
-            history.append(
-                {"id": msg_id, "timestamp": fields.get("timestamp"), **message_data}
+        await self.send(
+            text_data=codec.dumps(
+                {
+                    "type": "subscribed",
+                    "room_ids": [str(r) for r in room_ids if r in granted],
+                    "denied": [str(r) for r in room_ids if r not in granted],
+                }
+            )
+        )
+
+        last_event_ids = data.get("lastEventIds")
+        if isinstance(last_event_ids, dict):
+            # Live events of the new rooms wait until their replays are sent
+            self.outbox.pause()
+            try:
+                for sub in subscribed:
+                    last_event_id = last_event_ids.get(str(sub.room_id))
+                    if last_event_id:
+                        await self.replay_since(sub, str(last_event_id))
+            finally:
+                self.outbox.resume()
+
+    async def revoke(self, sub: RoomSubscription) -> None:
+        """Drop a room the user lost access to, keeping the connection open."""
+        await self.unsubscribe([sub.room_id])
+        await self.send(
+            text_data=codec.dumps(
+                {
+                    "type": "unsubscribed",
+                    "room_ids": [str(sub.room_id)],
+                    "reason": "revoked",
+                }
             )
-        return history
+        )
@@ -0,0 +1,201 @@
+import asyncio
+import logging
+import time
+import uuid
+from typing import Optional
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from backend.core import codec
+from backend.core.apps import CoreConfig
+from backend.messaging.chat import presence
+from backend.messaging.chat.groups import room_fanout_channel
+from backend.messaging.chat.metrics import (
+    CHAT_FANOUT_LOCAL_DELIVERIES_TOTAL,
+    CHAT_REDIS_ERRORS_TOTAL,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class RoomFanout:
+    """
+    Per-process registry of chat connections, fed by Redis pub/sub.
+
+    `group_send` on the Redis channel layer writes one message per member
+    channel of a group. For rooms with at least `min_connections` live
+    connections the sender instead publishes the frame once on the room's
+    pub/sub channel. Every worker with connections to the room subscribes to
+    that channel and relays the frame to its local connections.
+
+    Each worker subscribes while it has at least one connection to the room,
+    whatever the room's size. Senders can then choose a strategy per
+    broadcast and every connection still receives it exactly once.
+    """
+
+    def __init__(self, min_connections: int, size_ttl: float):
+        self.min_connections = min_connections
+        self.size_ttl = size_ttl
+        self._local: dict[uuid.UUID, set] = {}
+        self._channels: dict[str, uuid.UUID] = {}
+        # room ID -> (live connections, monotonic time the count expires)
+        self._sizes: dict[uuid.UUID, tuple[int, float]] = {}
+        self._pubsub = None
+        self._listener: Optional[asyncio.Task] = None
+        # Serializes (un)subscribing: the pub/sub connection runs one command
+        # at a time, and concurrent joins of a room must share one set
+        self._subscribing = asyncio.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return self.min_connections > 0
+
+    async def register(self, room_id: uuid.UUID, consumer) -> None:
+        """
+        Route the room's pub/sub broadcasts to `consumer.chat_message`.
+
+        Raises RedisError/OSError if the room's channel could not be
+        subscribed to; the consumer is not registered then, and would miss
+        broadcasts of large rooms.
+        """
+        if not self.enabled:
+            return
+
+        consumers = self._local.get(room_id)
+        if consumers is None:
+            async with self._subscribing:
+                consumers = self._local.get(room_id)
+                if consumers is None:
+                    consumers = await self._subscribe(room_id)
+        consumers.add(consumer)
+
+    async def unregister(self, room_id: uuid.UUID, consumer) -> None:
+        consumers = self._local.get(room_id)
+        if consumers is None:
+            return
+
+        consumers.discard(consumer)
+        if consumers:
+            return
+
+        async with self._subscribing:
+            # Someone may have joined the room again while we waited
+            if self._local.get(room_id) is not consumers or consumers:
+                return
+
+            del self._local[room_id]
+            self._sizes.pop(room_id, None)
+            channel = room_fanout_channel(room_id)
+            self._channels.pop(channel, None)
+            try:
+                await self._get_pubsub().unsubscribe(channel)
+            except (RedisError, OSError):
+                logger.warning(f"Could not unsubscribe from {channel}", exc_info=True)
+                CHAT_REDIS_ERRORS_TOTAL.labels(operation="pubsub").inc()
+
+            if not self._local:
+                await self._stop()
+
+    async def _subscribe(self, room_id: uuid.UUID) -> set:
+        """Subscribe to the room's channel, returns its (empty) consumer set."""
+        channel = room_fanout_channel(room_id)
+        try:
+            await self._get_pubsub().subscribe(channel)
+        except (RedisError, OSError):
+            logger.error(f"Could not subscribe to {channel}", exc_info=True)
+            CHAT_REDIS_ERRORS_TOTAL.labels(operation="pubsub").inc()
+            raise
+        consumers = self._local[room_id] = set()
+        self._channels[channel] = room_id
+        self._ensure_listener()
+        return consumers
+
+    async def is_large(self, room_id: uuid.UUID) -> bool:
+        """Whether broadcasts to the room should go over pub/sub."""
+        if not self.enabled or room_id not in self._local:
+            return False
+
+        current = time.monotonic()
+        cached = self._sizes.get(room_id)
+        if cached is None or cached[1] <= current:
+            size = await presence.connection_count(room_id)
+            cached = self._sizes[room_id] = (size, current + self.size_ttl)
+        return cached[0] >= self.min_connections
+
+    async def publish(self, room_id: uuid.UUID, event: dict) -> int:
+        """Publish a `chat_message` event to all workers, returns how many got it."""
+        return await CoreConfig.get_redis_client().publish(
+            room_fanout_channel(room_id), codec.dumpb(event)
+        )
+
+    def _get_pubsub(self):
+        if self._pubsub is None:
+            self._pubsub = CoreConfig.get_redis_client().pubsub()
+        return self._pubsub
+
+    def _ensure_listener(self) -> None:
+        if self._listener is None or self._listener.done():
+            self._listener = asyncio.ensure_future(self._listen())
+
+    async def _listen(self) -> None:
+        while True:
+            try:
+                message = await self._pubsub.get_message(
+                    ignore_subscribe_messages=True, timeout=1.0
+                )
+            except (RedisError, OSError):
+                logger.warning("Fan-out listener lost redis, retrying", exc_info=True)
+                CHAT_REDIS_ERRORS_TOTAL.labels(operation="pubsub").inc()
+                await asyncio.sleep(1)
+                continue
+
+            if message is not None:
+                await self._deliver(message["channel"], message["data"])
+
+    async def _deliver(self, channel: str, data: str) -> None:
+        room_id = self._channels.get(channel)
+        consumers = list(self._local.get(room_id, ()))
+        try:
+            event = codec.loads(data)
+        except codec.DecodeError:
+            logger.warning(f"Corrupt broadcast on {channel}", exc_info=True)
+            return
+
+        for consumer in consumers:
+            try:
+                await consumer.chat_message(event)
+            except Exception:
+                logger.exception(f"Could not deliver broadcast to {consumer}")
+        CHAT_FANOUT_LOCAL_DELIVERIES_TOTAL.inc(len(consumers))
+
+    async def _stop(self) -> None:
+        """Release the pub/sub connection once no local connection needs it."""
+        if self._listener is not None:
+            self._listener.cancel()
+            self._listener = None
+        if self._pubsub is not None:
+            pubsub, self._pubsub = self._pubsub, None
+            try:
+                await pubsub.aclose()
+            except (RedisError, OSError):
+                pass
+
+
+_fanout: Optional[RoomFanout] = None
+_fanout_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_fanout() -> RoomFanout:
+    """The fan-out registry of this process (of its running event loop)."""
+    global _fanout, _fanout_loop
+    loop = asyncio.get_running_loop()
+    if _fanout is None or _fanout_loop is not loop:
+        config = settings.CHAT_FANOUT
+        _fanout = RoomFanout(
+            min_connections=config["PUBSUB_MIN_CONNECTIONS"],
+            size_ttl=config["SIZE_CACHE_SECONDS"],
+        )
+        _fanout_loop = loop
+    return _fanout
@@ -0,0 +1,31 @@
+import uuid
+
+
+def room_stream_key(room_id: uuid.UUID | str) -> str:
+    """Redis stream holding the event history of a room."""
+    return f"chat_stream:{room_id}"
+
+
+def room_seq_key(room_id: uuid.UUID | str) -> str:
+    """Redis counter of the last sequence number stamped on a room event."""
+    return f"chat_seq:{room_id}"
+
+
+def room_presence_key(room_id: uuid.UUID | str) -> str:
+    """Redis sorted set of a room's live connections, scored by last heartbeat."""
+    return f"chat_presence:{room_id}"
+
+
+def room_fanout_channel(room_id: uuid.UUID | str) -> str:
+    """Redis pub/sub channel carrying broadcasts of large rooms to every worker."""
+    return f"chat_fanout:{room_id}"
+
+
+def user_sockets_key(username: str) -> str:
+    """Redis sorted set of a user's open chat sockets, scored by last activity."""
+    return f"chat_sockets:{username}"
+
+
+def ingest_pending_key(message_id: uuid.UUID | str) -> str:
+    """Redis marker of a message logged for the stream persister, not stored yet."""
+    return f"chat_ingest_pending:{message_id}"
@@ -0,0 +1,275 @@
+import asyncio
+import logging
+import time
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Iterable, Optional
+
+from django.conf import settings
+from django.db import (
+    DatabaseError,
+    InterfaceError,
+    OperationalError,
+    close_old_connections,
+)
+from redis.exceptions import RedisError, ResponseError
+
+from backend.core.apps import CoreConfig
+from backend.messaging import actions
+from backend.messaging.chat.groups import ingest_pending_key
+from backend.messaging.chat.metrics import (
+    CHAT_STREAM_DROPPED_TOTAL,
+    CHAT_STREAM_PERSIST_LATENCY_SECONDS,
+    CHAT_STREAM_PERSISTED_TOTAL,
+)
+from backend.messaging.models import Message
+
+
+logger = logging.getLogger(__name__)
+
+# How often edits and deletes check whether their message has been stored
+_PENDING_POLL_SECONDS = 0.05
+
+
+def encode_entry(message: Message) -> dict[str, str]:
+    """Ingestion stream fields of a prepared message, see `decode_entry`."""
+    return {
+        "id": str(message.id),
+        "room_id": str(message.room_id),
+        "author_id": str(message.author_id),
+        "body": message.body,
+        "created_at": message.created_at.isoformat(),
+    }
+
+
+def decode_entry(fields: Optional[dict[str, str]]) -> Message:
+    """
+    Rebuild the unsaved message of an ingestion stream entry.
+
+    Raises KeyError, TypeError or ValueError for malformed entries.
+    """
+    created_at = datetime.fromisoformat(fields["created_at"])
+    if created_at.tzinfo is None:
+        raise ValueError("'created_at' has no timezone")
+
+    return Message(
+        id=uuid.UUID(fields["id"]),
+        room_id=uuid.UUID(fields["room_id"]),
+        author_id=uuid.UUID(fields["author_id"]),
+        body=fields["body"],
+        created_at=created_at,
+        updated_at=created_at,
+    )
+
+
+async def append_message(message: Message) -> str:
+    """
+    Durably log a prepared message for the persister, returns its entry ID.
+
+    The message is also marked pending until the persister has stored it,
+    see `await_until_stored`. Raises RedisError/OSError when the entry could
+    not be written; the message must then not be broadcast.
+    """
+    config = settings.CHAT_STREAM_PERSISTER
+    pipe = CoreConfig.get_redis_client().pipeline(transaction=True)
+    pipe.xadd(config["STREAM_KEY"], encode_entry(message))
+    pipe.set(ingest_pending_key(message.id), 1, ex=config["PENDING_TTL_SECONDS"])
+    entry_id, _ = await pipe.execute()
+    return entry_id
+
+
+def _pending_wait_deadline() -> float:
+    return time.monotonic() + settings.CHAT_STREAM_PERSISTER["PENDING_WAIT_MS"] / 1000
+
+
+async def await_until_stored(message_ids: Iterable[uuid.UUID]) -> None:
+    """
+    Wait for the persister to store messages still in the ingestion stream,
+    so that edits and deletes following them closely find them.
+
+    Gives up after PENDING_WAIT_MS, or when Redis is unavailable; the
+    operation then reports the message as not found.
+    """
+    keys = [ingest_pending_key(message_id) for message_id in message_ids]
+    if not keys:
+        return
+
+    client = CoreConfig.get_redis_client()
+    deadline = _pending_wait_deadline()
+    try:
+        while await client.exists(*keys) and time.monotonic() < deadline:
+            await asyncio.sleep(_PENDING_POLL_SECONDS)
+    except (RedisError, OSError):
+        logger.warning("Could not check for pending chat messages", exc_info=True)
+
+
+def wait_until_stored(message_ids: Iterable[uuid.UUID]) -> None:
+    """Sync variant of `await_until_stored`, for GraphQL mutations."""
+    keys = [ingest_pending_key(message_id) for message_id in message_ids]
+    if not keys:
+        return
+
+    client = CoreConfig.get_sync_redis_client()
+    deadline = _pending_wait_deadline()
+    try:
+        while client.exists(*keys) and time.monotonic() < deadline:
+            time.sleep(_PENDING_POLL_SECONDS)
+    except (RedisError, OSError):
+        logger.warning("Could not check for pending chat messages", exc_info=True)
+
+
+class StreamPersister:
+    """
+    Consumer-group worker moving messages from the ingestion stream to Postgres.
+
+    Each batch is inserted with one statement and acknowledged only once
+    committed, so a crash redelivers it; inserts ignore IDs already stored.
+    On start the worker first retries the entries it had read but not
+    acknowledged, and it periodically claims entries other workers left
+    pending for longer than `min_idle_ms`. Acknowledged entries are trimmed
+    from the stream.
+    """
+
+    def __init__(
+        self,
+        consumer: str,
+        *,
+        batch_size: int,
+        block_ms: int,
+        min_idle_ms: int,
+        client: Any = None,
+    ):
+        config = settings.CHAT_STREAM_PERSISTER
+        self.stream = config["STREAM_KEY"]
+        self.group = config["GROUP"]
+        self.consumer = consumer
+        self.batch_size = batch_size
+        self.block_ms = block_ms
+        self.min_idle_ms = min_idle_ms
+        self.client = client or CoreConfig.get_sync_redis_client()
+        self._claim_cursor = "0-0"
+        self._next_claim_at = 0.0
+
+    def ensure_group(self) -> None:
+        """Create the stream and its consumer group if they don't exist yet."""
+        try:
+            self.client.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    def run(self, should_stop: Callable[[], bool], retry_delay: float = 1.0) -> None:
+        """Persist entries until `should_stop` returns True."""
+        self.ensure_group()
+
+        recovering = True
+        while not should_stop():
+            try:
+                if recovering:
+                    # Entries this consumer read but never acknowledged
+                    recovering = self.process(self.read_pending()) > 0
+                    continue
+                self.process(self.claim_stale() or self.read_new())
+            except (DatabaseError, RedisError, OSError):
+                logger.exception("Persisting chat stream failed, retrying")
+                time.sleep(retry_delay)
+
+    def read_pending(self) -> list:
+        return self._read("0")
+
+    def read_new(self) -> list:
+        return self._read(">", block=self.block_ms)
+
+    def _read(self, last_id: str, block: Optional[int] = None) -> list:
+        response = self.client.xreadgroup(
+            self.group,
+            self.consumer,
+            {self.stream: last_id},
+            count=self.batch_size,
+            block=block,
+        )
+        return response[0][1] if response else []
+
+    def claim_stale(self) -> list:
+        """Take over entries idle in another consumer's pending list."""
+        if time.monotonic() < self._next_claim_at:
+            return []
+
+        next_id, entries, *_deleted = self.client.xautoclaim(
+            self.stream,
+            self.group,
+            self.consumer,
+            min_idle_time=self.min_idle_ms,
+            start_id=self._claim_cursor,
+            count=self.batch_size,
+        )
+        self._claim_cursor = next_id
+        if next_id == "0-0":
+            # Scanned the whole pending list, look again in a while
+            self._next_claim_at = time.monotonic() + self.min_idle_ms / 2000
+        return entries
+
+    def process(self, entries: list) -> int:
+        """Insert, acknowledge and trim a batch, returns the number of entries."""
+        if not entries:
+            return 0
+
+        started = time.perf_counter()
+        entry_ids, messages = [], []
+        for entry_id, fields in entries:
+            entry_ids.append(entry_id)
+            try:
+                messages.append(decode_entry(fields))
+            except (KeyError, TypeError, ValueError):
+                logger.error(f"Dropping malformed chat stream entry {entry_id}")
+                CHAT_STREAM_DROPPED_TOTAL.labels(reason="malformed").inc()
+
+        # Long-running process: drop connections Django considers stale
+        close_old_connections()
+        CHAT_STREAM_PERSISTED_TOTAL.inc(self._insert(messages))
+
+        self.client.xack(self.stream, self.group, *entry_ids)
+        if messages:
+            self.client.delete(*(ingest_pending_key(m.id) for m in messages))
+        self._trim(entry_ids[-1])
+        CHAT_STREAM_PERSIST_LATENCY_SECONDS.observe(time.perf_counter() - started)
+        return len(entries)
+
+    def _insert(self, messages: list[Message]) -> int:
+        """
+        Insert a batch, retrying row by row so one bad row doesn't sink the rest.
+
+        Connection errors propagate, leaving the batch pending for a retry.
+        """
+        try:
+            return actions.insert_ingested_messages(messages)
+        except (OperationalError, InterfaceError):
+            raise
+        except DatabaseError:
+            logger.warning(
+                f"Inserting {len(messages)} streamed messages failed, "
+                "retrying one by one",
+                exc_info=True,
+            )
+
+        inserted = 0
+        for message in messages:
+            try:
+                inserted += actions.insert_ingested_messages([message])
+            except (OperationalError, InterfaceError):
+                raise
+            except DatabaseError:
+                logger.error(f"Dropping streamed message {message.id}", exc_info=True)
+                CHAT_STREAM_DROPPED_TOTAL.labels(reason="rejected").inc()
+        return inserted
+
+    def _trim(self, last_acked_id: str) -> None:
+        """
+        Drop entries every consumer has acknowledged.
+
+        Everything older than the oldest pending entry has been delivered and
+        acknowledged; with nothing pending that holds up to the last ID acked.
+        """
+        pending = self.client.xpending(self.stream, self.group)
+        min_id = pending["min"] if pending["pending"] else last_acked_id
+        self.client.xtrim(self.stream, minid=min_id, approximate=True)
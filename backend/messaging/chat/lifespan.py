@@ -0,0 +1,29 @@
+import logging
+
+from backend.messaging.chat.receipts import get_receipt_buffer
+from backend.messaging.chat.writebehind import get_message_buffer
+
+
+logger = logging.getLogger(__name__)
+
+
+async def lifespan(scope, receive, send) -> None:
+    """
+    ASGI lifespan app of the chat workers.
+
+    On shutdown, persists what the per-process write-behind and read
+    receipt buffers still hold; clients were already told about those
+    messages and receipts.
+    """
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            for buffer in (get_message_buffer(), get_receipt_buffer()):
+                try:
+                    await buffer.flush()
+                except Exception:
+                    logger.exception(f"Could not flush {buffer} on shutdown")
+            await send({"type": "lifespan.shutdown.complete"})
+            return
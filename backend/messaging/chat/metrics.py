@@ -0,0 +1,124 @@
+from prometheus_client import Counter, Gauge, Histogram
+
+
+CHAT_WRITE_BEHIND_FLUSH_LATENCY_SECONDS = Histogram(
+    "chat_write_behind_flush_latency_seconds",
+    "Time taken to persist a batch of buffered chat messages.",
+)
+
+CHAT_WRITE_BEHIND_BATCH_SIZE = Histogram(
+    "chat_write_behind_batch_size",
+    "Number of chat messages persisted per write-behind flush.",
+    buckets=(1, 2, 5, 10, 25, 50, 100, 250, 500, 1000),
+)
+
+CHAT_WRITE_BEHIND_FAILURES_TOTAL = Counter(
+    "chat_write_behind_failures_total",
+    "Total buffered chat messages that could not be persisted.",
+)
+
+CHAT_READ_ACKS_COALESCED_TOTAL = Counter(
+    "chat_read_acks_coalesced_total",
+    "Total read acks superseded by a later ack of the same participant before a flush.",
+)
+
+CHAT_STREAM_PERSISTED_TOTAL = Counter(
+    "chat_stream_persisted_total",
+    "Total chat messages inserted by the ingestion stream persister.",
+)
+
+CHAT_STREAM_DROPPED_TOTAL = Counter(
+    "chat_stream_dropped_total",
+    "Total ingestion stream entries acknowledged without being persisted.",
+    ["reason"],
+)
+
+CHAT_STREAM_PERSIST_LATENCY_SECONDS = Histogram(
+    "chat_stream_persist_latency_seconds",
+    "Time taken to insert and acknowledge a batch of ingestion stream entries.",
+)
+
+CHAT_BROADCASTS_TOTAL = Counter(
+    "chat_broadcasts_total",
+    "Total room broadcasts, by fan-out strategy.",
+    ["strategy"],
+)
+
+CHAT_FANOUT_LOCAL_DELIVERIES_TOTAL = Counter(
+    "chat_fanout_local_deliveries_total",
+    "Total pub/sub broadcast frames handed to connections of this worker.",
+)
+
+CHAT_OUTBOUND_QUEUED_FRAMES = Gauge(
+    "chat_outbound_queued_frames",
+    "Frames waiting in the outbound queues of this worker's chat connections.",
+)
+
+CHAT_OUTBOUND_DROPPED_TOTAL = Counter(
+    "chat_outbound_dropped_total",
+    "Total outbound chat frames not delivered, by reason.",
+    ["reason"],
+)
+
+CHAT_OUTBOUND_FRAMES_PER_SEND = Histogram(
+    "chat_outbound_frames_per_send",
+    "Number of chat events sent per WebSocket frame.",
+    buckets=(1, 2, 5, 10, 25, 50, 100),
+)
+
+CHAT_MESSAGE_REDIS_SECONDS = Histogram(
+    "chat_message_redis_seconds",
+    "Time an inbound chat message waits on Redis, by stage "
+    "(admit: rate limit and presence, append: room stream, fanout: broadcast).",
+    ["stage"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+CHAT_HANDSHAKES_QUEUED = Gauge(
+    "chat_handshakes_queued",
+    "Chat WebSocket handshakes of this worker waiting for an admission slot.",
+)
+
+CHAT_HANDSHAKES_REJECTED_TOTAL = Counter(
+    "chat_handshakes_rejected_total",
+    "Total chat WebSocket handshakes rejected by admission control, by limit.",
+    ["reason"],
+)
+
+CHAT_OPEN_SOCKETS = Gauge(
+    "chat_open_sockets",
+    "Open chat WebSocket connections of this worker.",
+)
+
+CHAT_ROOM_OPEN_SOCKETS = Gauge(
+    "chat_room_open_sockets",
+    "Open chat WebSocket connections of this worker to a room, for rooms with "
+    "at least CHAT_ROOM_METRICS_MIN_SOCKETS of them.",
+    ["room_id"],
+)
+
+CHAT_FRAMES_TOTAL = Counter(
+    "chat_frames_total",
+    "Total inbound chat frames, by type and outcome.",
+    ["type", "outcome"],
+)
+
+CHAT_HANDLER_SECONDS = Histogram(
+    "chat_handler_seconds",
+    "Time taken to handle an inbound chat frame, by type.",
+    ["type"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5),
+)
+
+CHAT_DB_SECONDS = Histogram(
+    "chat_db_seconds",
+    "Time chat connections wait on the database, by operation.",
+    ["operation"],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1),
+)
+
+CHAT_REDIS_ERRORS_TOTAL = Counter(
+    "chat_redis_errors_total",
+    "Total Redis errors in the chat layer, by operation.",
+    ["operation"],
+)
@@ -1,8 +1,31 @@
+import asyncio
+import logging
+import math
+import random
+import time
+import uuid
 from http.cookies import SimpleCookie
-from graphql_jwt.shortcuts import get_user_by_token
+from typing import Any, Optional
+
+from graphql_jwt.settings import jwt_settings
+from graphql_jwt.utils import get_payload, get_user_by_payload
 from channels.db import database_sync_to_async
 from channels.middleware import BaseMiddleware
+from django.conf import settings
 from graphql_jwt.exceptions import JSONWebTokenError
+from redis.exceptions import RedisError
+
+from backend.core.apps import CoreConfig
+from backend.messaging.chat.groups import user_sockets_key
+from backend.messaging.chat.metrics import (
+    CHAT_HANDSHAKES_QUEUED,
+    CHAT_HANDSHAKES_REJECTED_TOTAL,
+    CHAT_REDIS_ERRORS_TOTAL,
+)
+from backend.messaging.chat.subscriptions import ConnectionUser
+
+
+logger = logging.getLogger(__name__)
 
 
 def _get_anonymous_user():
@@ -11,33 +34,270 @@ def _get_anonymous_user():
     return AnonymousUser()
 
 
+def _cookie_token(scope) -> Optional[str]:
+    """The JWT of the HttpOnly 'JWT' cookie, if any."""
+    headers = {name: value for name, value in scope.get("headers", [])}
+    raw_cookie = headers.get(b"cookie", b"").decode()
+    if not raw_cookie:
+        return None
+
+    cookie = SimpleCookie(raw_cookie)
+    return cookie["JWT"].value if "JWT" in cookie else None
+
+
 @database_sync_to_async
-def _get_user(token: str):
+def authenticate_token(token: str) -> tuple[Any, Optional[float]]:
+    """
+    The user a JWT belongs to, and when the token expires (unix time).
+
+    Invalid or expired tokens give an anonymous user and no expiry.
+    """
     try:
-        return get_user_by_token(token)
+        payload = get_payload(token)
+        user = get_user_by_payload(payload)
     except JSONWebTokenError:
-        return _get_anonymous_user()
+        user = None
+    if user is None:
+        return _get_anonymous_user(), None
+    return user, payload.get("exp")
 
 
 class JwtAuthMiddleware(BaseMiddleware):
     """
     ASGI middleware that takes the JWT from the HttpOnly 'JWT' cookie,
-    validates it via graphql_jwt.shortcuts.get_user_by_token, and
-    populates scope['user'].
+    validates it, and populates scope['user'] with a ConnectionUser (or an
+    AnonymousUser).
+
+    The token's expiry is set as scope['auth_expires_at']; chat consumers
+    close the connection then unless the client sends a fresh token first.
     """
 
     async def __call__(self, scope, receive, send):
-        # Grab raw cookie header (if any)
-        headers = {name: value for name, value in scope.get("headers", [])}
-        raw_cookie = headers.get(b"cookie", b"").decode()
-
         user = _get_anonymous_user()
+        expires_at = None
 
-        if raw_cookie:
-            cookie = SimpleCookie(raw_cookie)
-            if "JWT" in cookie:
-                token = cookie["JWT"].value
-                user = await _get_user(token)
+        token = _cookie_token(scope)
+        if token:
+            user, expires_at = await authenticate_token(token)
 
-        scope["user"] = user
+        # The scope lives as long as the connection, so it keeps the compact
+        # form of the user rather than the model instance
+        scope["user"] = ConnectionUser(user) if user.is_authenticated else user
+        scope["auth_expires_at"] = expires_at
         return await super().__call__(scope, receive, send)
+
+
+class AdmissionMiddleware:
+    """
+    Admission control for chat WebSocket handshakes, ahead of authentication.
+
+    After a deploy or a Redis blip every client reconnects at once, and each
+    handshake costs database queries. This middleware bounds that:
+
+    - at most MAX_HANDSHAKES_PER_PROCESS handshakes are in progress; more
+      wait up to QUEUE_TIMEOUT_MS for a slot;
+    - at most MAX_USER_HANDSHAKES_PER_PROCESS handshakes per user are in
+      progress;
+    - a user has at most MAX_SOCKETS_PER_USER open sockets across workers.
+
+    The handshake limits are counted in this process's memory, as they guard
+    its own database connections: the cluster as a whole admits up to their
+    value times the number of worker processes. The socket limit is shared
+    through Redis.
+
+    Users are told apart by the verified claims of their token, which needs
+    no database query. Rejected clients are accepted and closed at once with
+    code 4029 and a `retry-after=<seconds>` reason, jittered so that retries
+    spread out. Every limit is disabled by setting it to 0.
+    """
+
+    def __init__(self, inner):
+        self.inner = inner
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._slots_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._user_handshakes: dict[str, int] = {}
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "websocket":
+            return await self.inner(scope, receive, send)
+
+        config = settings.CHAT_ADMISSION
+        username = _verified_username(scope)
+
+        if username and not self._start_user_handshake(username, config):
+            return await self._reject(receive, send, "user_handshakes", config)
+
+        slots = self._get_slots(config)
+        if slots is not None and not await self._acquire(slots, config):
+            self._end_user_handshake(username)
+            return await self._reject(receive, send, "handshakes", config)
+
+        handshaking = True
+
+        def end_handshake() -> None:
+            nonlocal handshaking
+            if handshaking:
+                handshaking = False
+                if slots is not None:
+                    slots.release()
+                self._end_user_handshake(username)
+
+        socket_id = uuid.uuid4().hex
+        try:
+            if username and not await _register_socket(username, socket_id, config):
+                end_handshake()
+                return await self._reject(receive, send, "user_sockets", config)
+
+            async def admitted_send(message):
+                if message["type"] in ("websocket.accept", "websocket.close"):
+                    end_handshake()
+                await send(message)
+
+            receive = _refreshing_receive(receive, username, socket_id)
+            return await self.inner(scope, receive, admitted_send)
+        finally:
+            end_handshake()
+            if username:
+                await _unregister_socket(username, socket_id)
+
+    def _get_slots(self, config: dict) -> Optional[asyncio.Semaphore]:
+        if config["MAX_HANDSHAKES_PER_PROCESS"] <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._slots is None or self._slots_loop is not loop:
+            self._slots = asyncio.Semaphore(config["MAX_HANDSHAKES_PER_PROCESS"])
+            self._slots_loop = loop
+        return self._slots
+
+    @staticmethod
+    async def _acquire(slots: asyncio.Semaphore, config: dict) -> bool:
+        if not slots.locked():
+            await slots.acquire()
+            return True
+
+        CHAT_HANDSHAKES_QUEUED.inc()
+        try:
+            await asyncio.wait_for(
+                slots.acquire(), timeout=config["QUEUE_TIMEOUT_MS"] / 1000
+            )
+            return True
+        except asyncio.TimeoutError:
+            return False
+        finally:
+            CHAT_HANDSHAKES_QUEUED.dec()
+
+    def _start_user_handshake(self, username: str, config: dict) -> bool:
+        limit = config["MAX_USER_HANDSHAKES_PER_PROCESS"]
+        count = self._user_handshakes.get(username, 0)
+        if 0 < limit <= count:
+            return False
+        self._user_handshakes[username] = count + 1
+        return True
+
+    def _end_user_handshake(self, username: Optional[str]) -> None:
+        if username is None or username not in self._user_handshakes:
+            return
+        self._user_handshakes[username] -= 1
+        if self._user_handshakes[username] <= 0:
+            del self._user_handshakes[username]
+
+    @staticmethod
+    async def _reject(receive, send, reason: str, config: dict) -> None:
+        CHAT_HANDSHAKES_REJECTED_TOTAL.labels(reason=reason).inc()
+        base = config["RETRY_AFTER_SECONDS"]
+        retry_after = math.ceil(base + random.uniform(0, base))
+
+        message = await receive()
+        if message["type"] != "websocket.connect":
+            return
+        # Close codes only reach clients on accepted connections
+        await send({"type": "websocket.accept"})
+        await send(
+            {
+                "type": "websocket.close",
+                "code": 4029,
+                "reason": f"retry-after={retry_after}",
+            }
+        )
+
+
+def _verified_username(scope) -> Optional[str]:
+    """The username of a valid cookie token, checked without the database."""
+    token = _cookie_token(scope)
+    if not token:
+        return None
+    try:
+        payload = get_payload(token)
+    except JSONWebTokenError:
+        return None
+    return jwt_settings.JWT_PAYLOAD_GET_USERNAME_HANDLER(payload)
+
+
+# A user's sockets are kept in a sorted set scored by their last activity, so
+# that sockets of crashed workers stop counting after PRESENCE_TTL seconds.
+
+
+async def _register_socket(username: str, socket_id: str, config: dict) -> bool:
+    """Count a new socket of the user, False if it is one too many."""
+    limit = config["MAX_SOCKETS_PER_USER"]
+    if limit <= 0:
+        return True
+
+    current = time.time()
+    ttl = settings.PRESENCE_TTL
+    key = user_sockets_key(username)
+    try:
+        pipe = CoreConfig.get_redis_client().pipeline(transaction=True)
+        pipe.zremrangebyscore(key, "-inf", current - ttl)
+        pipe.zadd(key, {socket_id: current})
+        pipe.zcard(key)
+        pipe.expire(key, ttl)
+        _, _, count, _ = await pipe.execute()
+        if count <= limit:
+            return True
+        await CoreConfig.get_redis_client().zrem(key, socket_id)
+        return False
+    except (RedisError, OSError):
+        logger.warning("Socket limit check failed (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="admission").inc()
+        return True
+
+
+async def _unregister_socket(username: str, socket_id: str) -> None:
+    if settings.CHAT_ADMISSION["MAX_SOCKETS_PER_USER"] <= 0:
+        return
+    try:
+        await CoreConfig.get_redis_client().zrem(user_sockets_key(username), socket_id)
+    except (RedisError, OSError):
+        logger.warning("Could not unregister socket (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="admission").inc()
+
+
+def _refreshing_receive(receive, username: Optional[str], socket_id: str):
+    """Wrap `receive` to keep the socket counted while the client is active."""
+    if not username or settings.CHAT_ADMISSION["MAX_SOCKETS_PER_USER"] <= 0:
+        return receive
+
+    ttl = settings.PRESENCE_TTL
+    refreshed_at = time.time()
+
+    async def refreshing_receive():
+        nonlocal refreshed_at
+        message = await receive()
+        current = time.time()
+        if message["type"] == "websocket.receive" and current - refreshed_at > ttl / 2:
+            refreshed_at = current
+            key = user_sockets_key(username)
+            try:
+                pipe = CoreConfig.get_redis_client().pipeline(transaction=False)
+                pipe.zadd(key, {socket_id: current})
+                pipe.expire(key, ttl)
+                await pipe.execute()
+            except (RedisError, OSError):
+                logger.warning(
+                    "Socket refresh failed (redis unavailable)", exc_info=True
+                )
+                CHAT_REDIS_ERRORS_TOTAL.labels(operation="admission").inc()
+        return message
+
+    return refreshing_receive
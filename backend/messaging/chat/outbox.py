@@ -0,0 +1,167 @@
+import asyncio
+import logging
+from collections import deque
+from enum import StrEnum
+from typing import Awaitable, Callable, NamedTuple, Optional
+
+from backend.messaging.chat.metrics import (
+    CHAT_OUTBOUND_DROPPED_TOTAL,
+    CHAT_OUTBOUND_FRAMES_PER_SEND,
+    CHAT_OUTBOUND_QUEUED_FRAMES,
+)
+
+
+logger = logging.getLogger(__name__)
+
+
+class OverflowPolicy(StrEnum):
+    # Make room by dropping the oldest queued frame
+    DROP_OLDEST = "drop_oldest"
+    # Replace queued frames superseded by a newer one with the same key
+    # (e.g. edits of one message), then drop the oldest if still full
+    COALESCE = "coalesce"
+    # Give up on the client: it reconnects and resumes from the stream
+    DISCONNECT = "disconnect"
+
+
+class OutboundFrame(NamedTuple):
+    """An encoded client frame and what the queue needs to know about it."""
+
+    text: str
+    # Frames with the same key supersede each other under COALESCE
+    key: Optional[str] = None
+    room_id: Optional[str] = None
+    stream_id: Optional[str] = None
+
+
+class OutboundQueue:
+    """
+    Bounded queue between a chat connection's broadcasts and its socket.
+
+    Broadcast handlers enqueue and return at once, so a slow client only
+    backs up its own queue, never the channel layer. A writer task drains
+    the queue. With a `batch_window`, frames arriving within the window are
+    sent together as one JSON array frame. The queue records the last stream
+    ID delivered per room, which a disconnected client can resume from.
+    """
+
+    def __init__(
+        self,
+        send: Callable[[str], Awaitable[None]],
+        *,
+        max_frames: int,
+        policy: OverflowPolicy,
+        on_overflow: Callable[[], Awaitable[None]],
+        batch_window: float = 0,
+        max_batch: int = 50,
+    ):
+        self._send = send
+        self._on_overflow = on_overflow
+        self.max_frames = max_frames
+        self.policy = policy
+        self.batch_window = batch_window
+        self.max_batch = max_batch if batch_window else 1
+        self.last_stream_ids: dict[str, str] = {}
+        self.overflowed = False
+        self._frames: deque[OutboundFrame] = deque()
+        self._ready = asyncio.Event()
+        self._resumed = asyncio.Event()
+        self._resumed.set()
+        self._writer: Optional[asyncio.Task] = None
+        self._overflow_task: Optional[asyncio.Task] = None
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def start(self) -> None:
+        self._writer = asyncio.ensure_future(self._write())
+
+    async def stop(self) -> None:
+        """Stop the writer and discard whatever is still queued."""
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        CHAT_OUTBOUND_QUEUED_FRAMES.dec(len(self._frames))
+        self._frames.clear()
+
+    def pause(self) -> None:
+        """Hold queued frames back, e.g. while replaying missed events."""
+        self._resumed.clear()
+
+    def resume(self) -> None:
+        self._resumed.set()
+
+    def put(self, frame: OutboundFrame) -> bool:
+        """Queue a frame, returns False if the connection is being dropped."""
+        if self.overflowed:
+            return False
+
+        if frame.key is not None and self.policy is OverflowPolicy.COALESCE:
+            self._coalesce(frame.key)
+
+        if len(self._frames) >= self.max_frames:
+            if self.policy is OverflowPolicy.DISCONNECT:
+                self._overflow()
+                return False
+            self._frames.popleft()
+            CHAT_OUTBOUND_QUEUED_FRAMES.dec()
+            CHAT_OUTBOUND_DROPPED_TOTAL.labels(reason="dropped_oldest").inc()
+
+        self._frames.append(frame)
+        CHAT_OUTBOUND_QUEUED_FRAMES.inc()
+        self._ready.set()
+        return True
+
+    def _coalesce(self, key: str) -> None:
+        superseded = [frame for frame in self._frames if frame.key == key]
+        for frame in superseded:
+            self._frames.remove(frame)
+        if superseded:
+            CHAT_OUTBOUND_QUEUED_FRAMES.dec(len(superseded))
+            CHAT_OUTBOUND_DROPPED_TOTAL.labels(reason="coalesced").inc(len(superseded))
+
+    def _overflow(self) -> None:
+        self.overflowed = True
+        CHAT_OUTBOUND_DROPPED_TOTAL.labels(reason="disconnected").inc(
+            len(self._frames) + 1
+        )
+        CHAT_OUTBOUND_QUEUED_FRAMES.dec(len(self._frames))
+        self._frames.clear()
+        if self._writer is not None:
+            self._writer.cancel()
+            self._writer = None
+        self._overflow_task = asyncio.ensure_future(self._on_overflow())
+
+    async def _write(self) -> None:
+        while True:
+            await self._ready.wait()
+            await self._resumed.wait()
+            if self.batch_window and len(self._frames) < self.max_batch:
+                await asyncio.sleep(self.batch_window)
+
+            batch = [
+                self._frames.popleft()
+                for _ in range(min(self.max_batch, len(self._frames)))
+            ]
+            if not self._frames:
+                self._ready.clear()
+            if not batch:
+                continue
+
+            CHAT_OUTBOUND_QUEUED_FRAMES.dec(len(batch))
+            CHAT_OUTBOUND_FRAMES_PER_SEND.observe(len(batch))
+            if self.batch_window:
+                text = "[" + ",".join(frame.text for frame in batch) + "]"
+            else:
+                text = batch[0].text
+
+            try:
+                await self._send(text)
+            except Exception:
+                logger.warning("Outbound send failed, stopping writer", exc_info=True)
+                CHAT_OUTBOUND_DROPPED_TOTAL.labels(reason="send_failed").inc(len(batch))
+                return
+
+            for frame in batch:
+                if frame.room_id and frame.stream_id:
+                    self.last_stream_ids[frame.room_id] = frame.stream_id
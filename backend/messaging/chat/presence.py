@@ -0,0 +1,92 @@
+import logging
+import time
+import uuid
+from typing import Iterable
+
+from django.conf import settings
+from redis.exceptions import RedisError
+
+from backend.account.presence import LAST_ACTIVITY_KEY
+from backend.core.apps import CoreConfig
+from backend.messaging.chat.groups import room_presence_key
+from backend.messaging.chat.metrics import CHAT_REDIS_ERRORS_TOTAL
+
+
+logger = logging.getLogger(__name__)
+
+# A room's presence set holds one member per live connection,
+# "<user id>:<channel name>", scored by the unix time of its last heartbeat.
+# Connections that miss heartbeats for `PRESENCE_TTL` seconds count as gone,
+# so crashed workers can't leave users online forever.
+
+
+def _member(user_id, channel_name: str) -> str:
+    return f"{user_id}:{channel_name}"
+
+
+async def heartbeat(room_ids: Iterable[uuid.UUID], user_id, channel_name: str) -> None:
+    """Mark a connection as live in each room, and its user as active."""
+    current = time.time()
+    ttl = settings.PRESENCE_TTL
+    member = _member(user_id, channel_name)
+
+    try:
+        pipe = CoreConfig.get_redis_client().pipeline(transaction=False)
+        for room_id in room_ids:
+            key = room_presence_key(room_id)
+            pipe.zadd(key, {member: current})
+            pipe.zremrangebyscore(key, "-inf", current - ttl)
+            pipe.expire(key, ttl)
+        pipe.hset(LAST_ACTIVITY_KEY, str(user_id), current)
+        await pipe.execute()
+    except (RedisError, OSError):
+        logger.warning("Presence heartbeat failed (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="presence").inc()
+
+
+async def leave(room_ids: Iterable[uuid.UUID], user_id, channel_name: str) -> None:
+    member = _member(user_id, channel_name)
+
+    try:
+        pipe = CoreConfig.get_redis_client().pipeline(transaction=False)
+        for room_id in room_ids:
+            pipe.zrem(room_presence_key(room_id), member)
+        await pipe.execute()
+    except (RedisError, OSError):
+        logger.warning("Presence leave failed (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="presence").inc()
+
+
+def online_users(room_id: uuid.UUID) -> dict[str, float]:
+    """
+    Users with at least one live connection to the room.
+
+    Returns:
+        Mapping of user id to the unix time of their latest heartbeat.
+    """
+    entries = CoreConfig.get_sync_redis_client().zrangebyscore(
+        room_presence_key(room_id),
+        time.time() - settings.PRESENCE_TTL,
+        "+inf",
+        withscores=True,
+    )
+
+    users: dict[str, float] = {}
+    for member, score in entries:
+        user_id = member.partition(":")[0]
+        users[user_id] = max(score, users.get(user_id, 0))
+    return users
+
+
+async def connection_count(room_id: uuid.UUID) -> int:
+    """Live connections to a room, 0 if Redis is unavailable."""
+    try:
+        return await CoreConfig.get_redis_client().zcount(
+            room_presence_key(room_id),
+            time.time() - settings.PRESENCE_TTL,
+            "+inf",
+        )
+    except (RedisError, OSError):
+        logger.warning("Presence count failed (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="presence").inc()
+        return 0
@@ -0,0 +1,80 @@
+import logging
+import uuid
+from typing import Optional
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+
+from backend.core.batching import AsyncBatcher
+from backend.messaging import actions
+from backend.messaging.chat.metrics import CHAT_READ_ACKS_COALESCED_TOTAL
+
+
+logger = logging.getLogger(__name__)
+
+# (participant ID, ID of the message read up to)
+ReadAck = tuple[uuid.UUID, uuid.UUID]
+
+
+class ReadReceiptBuffer:
+    """
+    Per-process buffer of read acks, flushed as one watermark upsert.
+
+    Acks of the same participant within a batch are coalesced; the latest
+    one wins and the database keeps the watermark from moving backwards.
+    Acks of messages that aren't stored yet (write-behind or stream
+    ingestion) are retried with the next batches, up to `max_retries` times,
+    unless a newer ack of the participant supersedes them.
+    """
+
+    def __init__(self, max_size: int, interval: float, max_retries: int = 0):
+        self._batcher: AsyncBatcher[ReadAck] = AsyncBatcher(
+            self._flush, max_size=max_size, interval=interval
+        )
+        self.max_retries = max_retries
+        # Acks retried so far -> how many times
+        self._retries: dict[ReadAck, int] = {}
+
+    async def _flush(self, acks: list[ReadAck]) -> None:
+        latest = dict(acks)
+        CHAT_READ_ACKS_COALESCED_TOTAL.inc(len(acks) - len(latest))
+        unresolved = set(
+            await database_sync_to_async(actions.advance_read_watermarks)(latest)
+        )
+
+        superseded = {participant_id for participant_id, _ in self._batcher.pending}
+        for ack in latest.items():
+            attempts = self._retries.pop(ack, 0)
+            participant_id, message_id = ack
+            if participant_id not in unresolved or participant_id in superseded:
+                continue
+            if attempts >= self.max_retries:
+                logger.warning(
+                    f"Dropping read ack of participant {participant_id}: "
+                    f"message {message_id} not found"
+                )
+                continue
+            self._retries[ack] = attempts + 1
+            self._batcher.add(ack)
+
+    def add(self, participant_id: uuid.UUID, message_id: uuid.UUID) -> None:
+        self._batcher.add((participant_id, message_id))
+
+    async def flush(self) -> None:
+        await self._batcher.flush()
+
+
+_buffer: Optional[ReadReceiptBuffer] = None
+
+
+def get_receipt_buffer() -> ReadReceiptBuffer:
+    """Lazily create the read receipt buffer shared by all consumers of this process."""
+    global _buffer
+    if _buffer is None:
+        config = settings.CHAT_READ_RECEIPTS
+        _buffer = ReadReceiptBuffer(
+            max_size=config["MAX_BATCH_SIZE"],
+            interval=config["FLUSH_INTERVAL_MS"] / 1000,
+            max_retries=config["MAX_RETRIES"],
+        )
+    return _buffer
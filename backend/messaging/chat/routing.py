@@ -3,5 +3,6 @@ from backend.messaging.chat import consumers
 
 
 websocket_urlpatterns = [
+    path("ws/chat", consumers.MultiplexChatConsumer.as_asgi()),
     path("ws/chat/<uuid:room_id>", consumers.ChatConsumer.as_asgi()),
 ]
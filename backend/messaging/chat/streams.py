@@ -0,0 +1,319 @@
+import logging
+import re
+import time
+import zlib
+from datetime import datetime, timezone
+from typing import Any, Callable, NamedTuple, Optional
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+
+from backend.core import codec
+
+
+logger = logging.getLogger(__name__)
+
+_STREAM_ID_RE = re.compile(r"^(\d+)(?:-(\d+))?$")
+
+
+def parse_stream_id(value: object) -> Optional[tuple[int, int]]:
+    """Parse a Redis stream ID (`<ms>-<seq>` or `<ms>`) into a comparable tuple."""
+    if isinstance(value, bytes):
+        value = value.decode()
+    match = _STREAM_ID_RE.match(str(value)) if value is not None else None
+    if match is None:
+        return None
+    return int(match.group(1)), int(match.group(2) or 0)
+
+
+def stream_id_to_datetime(stream_id: tuple[int, int]) -> datetime:
+    """Stream IDs start with the Unix time in milliseconds of the entry."""
+    return datetime.fromtimestamp(stream_id[0] / 1000, tz=timezone.utc)
+
+
+def _text(value: Any) -> str:
+    return value.decode() if isinstance(value, bytes) else value
+
+
+# ----------------------------------------------------------------------
+# Entry encodings
+# ----------------------------------------------------------------------
+
+
+class StreamCodec(NamedTuple):
+    """
+    Encoding of a room event, stored under its own field name.
+
+    The field name identifies the encoding when reading, so streams holding
+    entries of several encodings stay readable after a settings change.
+    """
+
+    field: str
+    encode: Callable[[dict], bytes]
+    decode: Callable[[bytes], dict]
+
+
+# Preset dictionary for zlib: chat events are too short to compress well on
+# their own, but most of their bytes are keys and values shared by all events.
+# It is written as `backend.core.codec` encodes events (compact, in the key
+# order of `MessageService.serialize`); matches closer to its end are
+# cheaper, so the most common strings come last. Entries depend on it to
+# decompress, so never edit it in place: add a codec with a new field name
+# instead.
+_ZLIB_DICT = (
+    b'{"type":"chat_message","action":"delete","id":"","room_id":""}'
+    b'{"type":"chat_message","action":"update","id":"",'
+    b'{"type":"chat_message","action":"new","id":"","author":"","author_id":"",'
+    b'"body":"","is_edited":false,"created_at":"+00:00","updated_at":"+00:00",'
+    b'"author_avatar":null,"room_id":""}'
+)
+
+
+def _encode_json(event: dict) -> bytes:
+    return codec.dumpb(event)
+
+
+def _encode_zlib(event: dict) -> bytes:
+    compressor = zlib.compressobj(level=6, zdict=_ZLIB_DICT)
+    return compressor.compress(_encode_json(event)) + compressor.flush()
+
+
+def _decode_zlib(raw: bytes) -> dict:
+    decompressor = zlib.decompressobj(zdict=_ZLIB_DICT)
+    return codec.loads(decompressor.decompress(raw) + decompressor.flush())
+
+
+def _encode_msgpack(event: dict) -> bytes:
+    import msgpack
+
+    return msgpack.packb(event, default=codec.to_primitive)
+
+
+def _decode_msgpack(raw: bytes) -> dict:
+    import msgpack
+
+    return msgpack.unpackb(raw)
+
+
+STREAM_CODECS = {
+    "json": StreamCodec("data", _encode_json, codec.loads),
+    "zlib": StreamCodec("z2", _encode_zlib, _decode_zlib),
+    "msgpack": StreamCodec("m", _encode_msgpack, _decode_msgpack),
+}
+
+_CODECS_BY_FIELD = {codec.field: codec for codec in STREAM_CODECS.values()}
+
+
+def get_stream_codec(name: Optional[str] = None) -> StreamCodec:
+    """The codec called `name`, by default the configured one."""
+    name = name or settings.REDIS_STREAMS["ENCODING"]
+    try:
+        return STREAM_CODECS[name]
+    except KeyError:
+        raise ImproperlyConfigured(
+            f"Unknown stream encoding {name!r}, expected one of "
+            f"{', '.join(STREAM_CODECS)}"
+        ) from None
+
+
+def encode_event(event: dict, codec: Optional[StreamCodec] = None) -> dict[str, bytes]:
+    """Stream fields of an event. Its time is the stream ID, so isn't stored."""
+    codec = codec or get_stream_codec()
+    return {codec.field: codec.encode(event)}
+
+
+def decode_event(fields: dict) -> dict:
+    """
+    Decode the event of a stream entry, whichever codec wrote it.
+
+    The room sequence number of the entry, if any, is set as `seq`. Raises
+    ValueError for entries that hold no event or fail to decode.
+    """
+    fields = {_text(field): raw for field, raw in fields.items()}
+    for field, raw in fields.items():
+        codec = _CODECS_BY_FIELD.get(field)
+        if codec is None:
+            continue
+        try:
+            event = codec.decode(raw)
+        except Exception as e:
+            raise ValueError(f"Corrupt {field!r} stream entry") from e
+        if not isinstance(event, dict):
+            raise ValueError("Stream entry is not an event")
+        if fields.get("seq") is not None:
+            event["seq"] = int(fields["seq"])
+        return event
+    raise ValueError("Stream entry holds no event")
+
+
+# ----------------------------------------------------------------------
+# Room streams
+# ----------------------------------------------------------------------
+
+# Stamps events with the room's next sequence numbers and appends them to the
+# room stream atomically, so stream order and sequence order always agree.
+#
+# KEYS[1] - room stream, KEYS[2] - room sequence counter
+# ARGV[1] - MAXLEN, ARGV[2] - MINID, ARGV[3] - stream TTL in seconds
+# ARGV[4...] - one field, value pair per encoded event
+# Returns {stream ID, sequence number, ...}, one pair per event.
+APPEND_EVENT_SCRIPT = """
+local result = {}
+for i = 4, #ARGV, 2 do
+    local seq = redis.call('INCR', KEYS[2])
+    local id = redis.call(
+        'XADD', KEYS[1], 'MAXLEN', '~', ARGV[1], '*', 'seq', seq, ARGV[i], ARGV[i + 1]
+    )
+    result[#result + 1] = id
+    result[#result + 1] = seq
+end
+redis.call('XTRIM', KEYS[1], 'MINID', '~', ARGV[2])
+redis.call('EXPIRE', KEYS[1], ARGV[3])
+return result
+"""
+
+_scripts: dict[int, Any] = {}
+
+
+def _append_script(client):
+    script = _scripts.get(id(client))
+    if script is None:
+        script = _scripts[id(client)] = client.register_script(APPEND_EVENT_SCRIPT)
+    return script
+
+
+def _append_args(events: list[dict]) -> list[Any]:
+    config = settings.REDIS_STREAMS
+    ttl = config["MESSAGE_TTL"]
+    min_id = int((time.time() - ttl) * 1000)
+
+    codec = get_stream_codec()
+    args: list[Any] = [config["MAX_STREAM_LENGTH"], min_id, ttl]
+    for event in events:
+        # Every codec writes a single field, the script relies on it
+        ((field, value),) = encode_event(event, codec).items()
+        args.extend((field, value))
+    return args
+
+
+def _appended(result: list) -> list[tuple[str, int]]:
+    return [
+        (_text(stream_id), int(seq))
+        for stream_id, seq in zip(result[::2], result[1::2])
+    ]
+
+
+def append_events(
+    client, key: str, seq_key: str, events: list[dict]
+) -> list[tuple[str, int]]:
+    """
+    Append events to a room stream in one round trip, each as its own entry.
+
+    The stream is trimmed approximately to REDIS_STREAMS["MAX_STREAM_LENGTH"]
+    entries and to those younger than REDIS_STREAMS["MESSAGE_TTL"]; the key
+    expires once the room has been idle for that long. The sequence counter
+    at `seq_key` never expires. Takes a blocking binary client.
+
+    Returns:
+        The stream ID and room sequence number of each event, in order.
+    """
+    result = _append_script(client)(
+        keys=[key, seq_key], args=_append_args(events), client=client
+    )
+    return _appended(result)
+
+
+async def aappend_events(
+    client, key: str, seq_key: str, events: list[dict]
+) -> list[tuple[str, int]]:
+    """Async variant of `append_events`."""
+    result = await _append_script(client)(
+        keys=[key, seq_key], args=_append_args(events), client=client
+    )
+    return _appended(result)
+
+
+async def read_events(
+    client,
+    key: str,
+    start: str = "-",
+    end: str = "+",
+    count: Optional[int] = None,
+    reverse: bool = False,
+) -> list[tuple[str, Optional[dict]]]:
+    """
+    Read `(stream ID, event)` pairs with XRANGE (or XREVRANGE if `reverse`).
+
+    The event is None (and a warning logged) for entries that fail to decode.
+    """
+    if reverse:
+        entries = await client.xrevrange(key, end, start, count=count)
+    else:
+        entries = await client.xrange(key, start, end, count=count)
+
+    events = []
+    for entry_id, fields in entries:
+        try:
+            event = decode_event(fields)
+        except ValueError:
+            logger.warning(f"Corrupt entry {_text(entry_id)} in {key}", exc_info=True)
+            event = None
+        events.append((_text(entry_id), event))
+    return events
+
+
+class RoomDelta(NamedTuple):
+    """The events of a room after a sequence number, see `events_since`."""
+
+    events: list[dict]
+    latest_seq: int
+    # False when the stream no longer holds every event after the requested
+    # sequence number (trimmed, expired, or too many to send): reload instead
+    complete: bool
+
+
+def _delta(entries: list, counter: Any, seq: int) -> RoomDelta:
+    latest_seq = int(counter or 0)
+    if seq >= latest_seq:
+        # Up to date, or ahead of a counter that was reset
+        return RoomDelta([], latest_seq, seq == latest_seq)
+
+    events = []
+    for entry_id, fields in entries:
+        try:
+            event = decode_event(fields)
+        except ValueError:
+            break
+        if event.get("seq") is None or event["seq"] <= seq:
+            break
+        events.append({**event, "stream_id": _text(entry_id)})
+    events.reverse()
+
+    if not events or events[0]["seq"] != seq + 1:
+        return RoomDelta([], latest_seq, False)
+    return RoomDelta(events, latest_seq, True)
+
+
+def events_since(client, key: str, seq_key: str, seq: int, limit: int) -> RoomDelta:
+    """
+    Events of a room stream with a sequence number above `seq`, oldest first.
+
+    Reads the newest `limit` entries and the counter in one round trip, with
+    a blocking binary client.
+    """
+    pipe = client.pipeline(transaction=False)
+    pipe.xrevrange(key, "+", "-", count=limit)
+    pipe.get(seq_key)
+    entries, counter = pipe.execute()
+    return _delta(entries, counter, seq)
+
+
+async def aevents_since(
+    client, key: str, seq_key: str, seq: int, limit: int
+) -> RoomDelta:
+    """Async variant of `events_since`."""
+    pipe = client.pipeline(transaction=False)
+    pipe.xrevrange(key, "+", "-", count=limit)
+    pipe.get(seq_key)
+    entries, counter = await pipe.execute()
+    return _delta(entries, counter, seq)
@@ -0,0 +1,139 @@
+import uuid
+from typing import Iterable, Optional
+
+from backend.access.dtos import PermissionSnapshot
+from backend.access.enums import PermissionFlag
+from backend.access.services import RoleService
+from backend.account.models import User
+from backend.core.groups import room_group_name
+from backend.core.ratelimit import TokenBucket
+from backend.messaging.chat.groups import room_seq_key, room_stream_key
+from backend.messaging.ratelimit import connection_bucket
+from backend.room.models import Room
+
+# A worker holds this state for every open chat connection, so it is slotted
+# and keeps plain values instead of model instances. Services still take
+# models: `as_user`, `as_room` and `snapshot` build short-lived ones.
+
+
+class ConnectionUser:
+    """The authenticated user of a chat connection, set as its scope['user']."""
+
+    __slots__ = ("id", "username", "avatar", "is_active", "is_superuser")
+
+    is_authenticated = True
+
+    def __init__(self, user: User):
+        self.id: uuid.UUID = user.id
+        self.username: str = user.username
+        self.avatar: Optional[str] = user.avatar.name or None
+        self.is_active: bool = user.is_active
+        self.is_superuser: bool = user.is_superuser
+
+    def as_user(self) -> User:
+        """An unsaved User with this state, e.g. to author messages."""
+        return User(
+            id=self.id,
+            username=self.username,
+            avatar=self.avatar,
+            is_active=self.is_active,
+            is_superuser=self.is_superuser,
+        )
+
+
+class RoomSubscription:
+    """State a chat connection keeps for each room it is subscribed to."""
+
+    __slots__ = (
+        "room_id",
+        "slow_mode_seconds",
+        "room_messages_per_sec",
+        "bucket",
+        "participant_id",
+        "role_id",
+        "permissions",
+        "is_superuser",
+        "is_blocked",
+    )
+
+    def __init__(self, room: Room, permissions: PermissionSnapshot):
+        self.room_id: uuid.UUID = room.id
+        self.bucket: Optional[TokenBucket] = None
+        self.limit(room)
+        self.grant(permissions)
+
+    def limit(self, room: Room) -> None:
+        """
+        Hold the room's message rate limits, refreshed on room-wide
+        `access.invalidate` events.
+        """
+        self.slow_mode_seconds: int = room.slow_mode_seconds
+        self.room_messages_per_sec: int = room.room_messages_per_sec
+        # Per-connection quota of the room, never leaves this process; kept
+        # (with its tokens) while its limit doesn't change
+        limit = room.connection_messages_per_sec
+        if self.bucket is None or self.bucket.rate != limit:
+            self.bucket = connection_bucket(room)
+
+    def grant(self, snapshot: PermissionSnapshot) -> None:
+        """
+        Hold the participant's role and permissions, refreshed on
+        `access.invalidate` events.
+        """
+        self.participant_id: uuid.UUID = snapshot.participant_id
+        self.role_id: Optional[uuid.UUID] = snapshot.role_id
+        self.permissions = PermissionFlag.from_codes(snapshot.permission_codes)
+        self.is_superuser: bool = snapshot.is_superuser
+        self.is_blocked: bool = snapshot.is_blocked
+
+    def snapshot(self, user_id: uuid.UUID) -> PermissionSnapshot:
+        """The permission snapshot to authorize the user's operations against."""
+        return PermissionSnapshot.model_construct(
+            user_id=user_id,
+            room_id=self.room_id,
+            participant_id=self.participant_id,
+            role_id=self.role_id,
+            permission_codes=self.permissions.codes(),
+            is_superuser=self.is_superuser,
+            is_blocked=self.is_blocked,
+        )
+
+    def as_room(self) -> Room:
+        """An unsaved Room with the fields messages and quotas need."""
+        return Room(
+            id=self.room_id,
+            slow_mode_seconds=self.slow_mode_seconds,
+            room_messages_per_sec=self.room_messages_per_sec,
+        )
+
+    @property
+    def group_name(self) -> str:
+        return room_group_name(self.room_id)
+
+    @property
+    def stream_key(self) -> str:
+        return room_stream_key(self.room_id)
+
+    @property
+    def seq_key(self) -> str:
+        return room_seq_key(self.room_id)
+
+
+# Room fields a subscription holds
+ROOM_LIMIT_FIELDS = (
+    "slow_mode_seconds",
+    "room_messages_per_sec",
+    "connection_messages_per_sec",
+)
+
+
+def load_subscriptions(
+    user: User, room_ids: Iterable[uuid.UUID]
+) -> list[RoomSubscription]:
+    """Subscriptions to the given rooms that the user participates in."""
+    snapshots = RoleService.get_permission_snapshots(user, room_ids)
+    if not snapshots:
+        return []
+
+    rooms = Room.objects.filter(id__in=snapshots.keys()).only("id", *ROOM_LIMIT_FIELDS)
+    return [RoomSubscription(room, snapshots[room.id]) for room in rooms]
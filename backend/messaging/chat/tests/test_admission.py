@@ -0,0 +1,82 @@
+import asyncio
+
+import pytest
+
+from backend.messaging.chat.middleware import AdmissionMiddleware
+
+
+pytestmark = pytest.mark.unit
+
+
+class SlowApp:
+    """Accepts connections once `release` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+
+    async def __call__(self, scope, receive, send):
+        await receive()
+        await self.release.wait()
+        await send({"type": "websocket.accept"})
+
+
+async def _handshake(app) -> list[dict]:
+    sent: list[dict] = []
+    messages = asyncio.Queue()
+    await messages.put({"type": "websocket.connect"})
+
+    async def send(message):
+        sent.append(message)
+
+    await app({"type": "websocket", "headers": []}, messages.get, send)
+    return sent
+
+
+@pytest.fixture
+def admission(settings):
+    settings.CHAT_ADMISSION = {
+        "MAX_HANDSHAKES_PER_PROCESS": 1,
+        "QUEUE_TIMEOUT_MS": 50,
+        "MAX_USER_HANDSHAKES_PER_PROCESS": 2,
+        "MAX_SOCKETS_PER_USER": 0,
+        "RETRY_AFTER_SECONDS": 5,
+    }
+    return settings.CHAT_ADMISSION
+
+
+def test_handshakes_over_the_limit_are_closed_with_retry_hint(admission):
+    async def run():
+        inner = SlowApp()
+        app = AdmissionMiddleware(inner)
+        first = asyncio.ensure_future(_handshake(app))
+        await asyncio.sleep(0)
+
+        rejected = await _handshake(app)
+        assert rejected[0] == {"type": "websocket.accept"}
+        assert rejected[1]["code"] == 4029
+        retry_after = int(rejected[1]["reason"].removeprefix("retry-after="))
+        assert 5 <= retry_after <= 10
+
+        inner.release.set()
+        assert await first == [{"type": "websocket.accept"}]
+
+    asyncio.run(run())
+
+
+def test_queued_handshake_is_admitted_once_a_slot_frees(admission):
+    admission["QUEUE_TIMEOUT_MS"] = 1000
+
+    async def run():
+        inner = SlowApp()
+        app = AdmissionMiddleware(inner)
+        first = asyncio.ensure_future(_handshake(app))
+        await asyncio.sleep(0)
+        queued = asyncio.ensure_future(_handshake(app))
+        await asyncio.sleep(0.01)
+        assert not queued.done()
+
+        inner.release.set()
+        assert await first == [{"type": "websocket.accept"}]
+        assert await queued == [{"type": "websocket.accept"}]
+
+    asyncio.run(run())
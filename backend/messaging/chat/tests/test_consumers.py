@@ -1,15 +1,25 @@
+import asyncio
+import io
+import json
+import time
+import uuid
+
 import pytest
 from asgiref.sync import async_to_sync
 from channels.routing import URLRouter
 from channels.testing import WebsocketCommunicator
 from django.contrib.auth.models import AnonymousUser
+from django.core.management import call_command
 
 from backend.messaging.chat.routing import websocket_urlpatterns
 from backend.core.apps import CoreConfig
 
 
 class FakeRedis:
-    """Minimal async Redis fake for incr/expire/xadd/xrange/aclose used by ChatConsumer.
+    """Minimal async Redis fake for the stream, sorted set and hash commands used by ChatConsumer.
+
+    `register_script` emulates the token-bucket Lua script of backend.core.ratelimit
+    and the room stream append script of backend.messaging.chat.streams.
 
     Includes a lightweight pipeline implementation to mirror redis.asyncio.Redis.pipeline().
     """
@@ -21,6 +31,11 @@ class FakeRedis:
         self._kv: dict[str, int] = {}
         self._streams: dict[str, list[tuple[str, dict[str, str]]]] = {}
         self._stream_seq: dict[str, int] = {}
+        self._buckets: dict[str, tuple[float, float]] = {}
+        self._zsets: dict[str, dict[str, float]] = {}
+        self._hashes: dict[str, dict[str, str]] = {}
+        self._pubsubs: list["FakeRedis._PubSub"] = []
+        self.published: list[tuple[str, str]] = []
 
     async def incr(self, key: str) -> int:
         self._kv[key] = self._kv.get(key, 0) + 1
@@ -29,24 +44,50 @@ class FakeRedis:
     async def expire(self, key: str, seconds: int) -> bool:
         return True
 
+    async def zadd(self, key: str, mapping: dict[str, float]) -> int:
+        zset = self._zsets.setdefault(key, {})
+        added = len(set(mapping) - set(zset))
+        zset.update(mapping)
+        return added
+
+    async def zrem(self, key: str, *members: str) -> int:
+        zset = self._zsets.get(key, {})
+        return sum(zset.pop(member, None) is not None for member in members)
+
+    async def zremrangebyscore(self, key: str, low, high) -> int:
+        zset = self._zsets.get(key, {})
+        low, high = float(low), float(high)
+        stale = [member for member, score in zset.items() if low <= score <= high]
+        for member in stale:
+            del zset[member]
+        return len(stale)
+
+    async def zcount(self, key: str, low, high) -> int:
+        zset = self._zsets.get(key, {})
+        low, high = float(low), float(high)
+        return sum(low <= score <= high for score in zset.values())
+
+    async def hset(self, key: str, field: str, value) -> int:
+        self._hashes.setdefault(key, {})[field] = str(value)
+        return 1
+
     class _Pipeline:
         def __init__(self, client: "FakeRedis"):
             self._client = client
-            self._ops: list[tuple[str, tuple]] = []
+            self._ops: list[tuple[str, tuple, dict]] = []
 
-        def incr(self, key: str):
-            self._ops.append(("incr", (key,)))
-            return self
+        def __getattr__(self, name: str):
+            def queue(*args, **kwargs):
+                self._ops.append((name, args, kwargs))
+                return self
 
-        def expire(self, key: str, seconds: int):
-            self._ops.append(("expire", (key, seconds)))
-            return self
+            return queue
 
         async def execute(self):
             results = []
-            for name, args in self._ops:
+            for name, args, kwargs in self._ops:
                 fn = getattr(self._client, name)
-                res = await fn(*args)
+                res = await fn(*args, **kwargs)
                 results.append(res)
             self._ops.clear()
             return results
@@ -54,15 +95,137 @@ class FakeRedis:
     def pipeline(self, transaction: bool = True):
         return FakeRedis._Pipeline(self)
 
-    async def xadd(self, stream: str, fields: dict[str, str]) -> str:
+    class _PubSub:
+        def __init__(self, client: "FakeRedis"):
+            self._client = client
+            self.channels: set[str] = set()
+            self._queue: asyncio.Queue = asyncio.Queue()
+
+        async def subscribe(self, *channels: str) -> None:
+            self.channels.update(channels)
+
+        async def unsubscribe(self, *channels: str) -> None:
+            self.channels.difference_update(channels)
+
+        async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+            try:
+                return await asyncio.wait_for(self._queue.get(), timeout)
+            except asyncio.TimeoutError:
+                return None
+
+        async def aclose(self) -> None:
+            self._client._pubsubs.remove(self)
+
+    def pubsub(self):
+        pubsub = FakeRedis._PubSub(self)
+        self._pubsubs.append(pubsub)
+        return pubsub
+
+    async def publish(self, channel: str, data: str) -> int:
+        self.published.append((channel, data))
+        receivers = [p for p in self._pubsubs if channel in p.channels]
+        for pubsub in receivers:
+            pubsub._queue.put_nowait(
+                {"type": "message", "channel": channel, "data": data}
+            )
+        return len(receivers)
+
+    def register_script(self, source: str):
+        if "XADD" in source:
+            return self._append_event_script
+
+        async def token_bucket(keys, args, client=None):
+            current = time.monotonic()
+            cost, levels = float(args[0]), []
+            for i, key in enumerate(keys):
+                rate, burst, debt = (float(a) for a in args[1 + i * 3 : 4 + i * 3])
+                level, ts = self._buckets.get(key, (burst, current))
+                level = max(-burst, min(burst, level + (current - ts) * rate) - debt)
+                levels.append(level)
+            allowed = all(level >= cost for level in levels)
+            if allowed:
+                levels = [level - cost for level in levels]
+            for key, level in zip(keys, levels):
+                self._buckets[key] = (level, current)
+            return [int(allowed), *(str(level) for level in levels)]
+
+        return token_bucket
+
+    async def _append_event_script(self, keys, args, client=None):
+        """Emulates APPEND_EVENT_SCRIPT of backend.messaging.chat.streams."""
+        stream, seq_key = keys
+        maxlen, min_id, _ttl, *pairs = args
+        result = []
+        for field, value in zip(pairs[::2], pairs[1::2]):
+            seq = await self.incr(seq_key)
+            fields = {"seq": str(seq), field: value}
+            result += [await self.xadd(stream, fields, maxlen=int(maxlen)), seq]
+        await self.xtrim(stream, minid=min_id)
+        return result
+
+    async def get(self, key: str):
+        value = self._kv.get(key)
+        return None if value is None else str(value)
+
+    async def set(self, key: str, value, ex=None) -> bool:
+        self._kv[key] = value
+        return True
+
+    async def exists(self, *keys: str) -> int:
+        return sum(key in self._kv for key in keys)
+
+    async def delete(self, *keys: str) -> int:
+        return sum(self._kv.pop(key, None) is not None for key in keys)
+
+    async def xadd(
+        self, stream: str, fields: dict, maxlen=None, approximate=True
+    ) -> str:
         seq = self._stream_seq.get(stream, 0) + 1
         self._stream_seq[stream] = seq
-        msg_id = f"{seq}-0"
-        self._streams.setdefault(stream, []).append((msg_id, dict(fields)))
+        msg_id = f"{int(time.time() * 1000)}-{seq}"
+        entries = self._streams.setdefault(stream, [])
+        entries.append((msg_id, dict(fields)))
+        if maxlen is not None:
+            del entries[:-maxlen]
         return msg_id
 
+    async def xtrim(self, stream: str, minid=None, approximate=True) -> int:
+        entries = self._streams.get(stream, [])
+        kept = [e for e in entries if self._id_key(e[0]) >= self._id_key(str(minid))]
+        self._streams[stream] = kept
+        return len(entries) - len(kept)
+
+    @staticmethod
+    def _id_key(msg_id: str) -> tuple[int, int]:
+        ms, _, seq = msg_id.partition("-")
+        return int(ms), int(seq or 0)
+
+    def _in_range(self, msg_id: str, start: str, end: str) -> bool:
+        key = self._id_key(msg_id)
+        if start != "-":
+            exclusive = start.startswith("(")
+            bound = self._id_key(start.lstrip("("))
+            if key < bound or (exclusive and key == bound):
+                return False
+        if end != "+" and key > self._id_key(end):
+            return False
+        return True
+
     async def xrange(self, stream: str, start: str, end: str, count: int = 50):
-        return list(self._streams.get(stream, []))[:count]
+        entries = [
+            entry
+            for entry in self._streams.get(stream, [])
+            if self._in_range(entry[0], start, end)
+        ]
+        return entries[:count]
+
+    async def xrevrange(self, stream: str, end: str, start: str, count: int = 50):
+        entries = [
+            entry
+            for entry in self._streams.get(stream, [])
+            if self._in_range(entry[0], start, end)
+        ]
+        return list(reversed(entries))[:count]
 
     async def aclose(self, *args, **kwargs) -> None:
         return None
@@ -70,10 +233,16 @@ class FakeRedis:
 
 @pytest.fixture(autouse=True)
 def _patch_redis(monkeypatch):
-    """Patch CoreConfig.get_redis_client to return a fresh FakeRedis instance."""
+    """Patch the CoreConfig async Redis clients to return a fresh FakeRedis instance."""
+    from backend.messaging.chat import fanout
+
     FakeRedis.last_instance = None
     fake = FakeRedis()
+    monkeypatch.setattr(fanout, "_fanout", None)
     monkeypatch.setattr(CoreConfig, "get_redis_client", classmethod(lambda cls: fake))
+    monkeypatch.setattr(
+        CoreConfig, "get_binary_redis_client", classmethod(lambda cls: fake)
+    )
 
 
 @pytest.fixture(autouse=True)
@@ -246,3 +415,924 @@ def test_rate_limit_blocks_excess_messages(settings, asgi_app, room_and_particip
         await communicator.disconnect()
 
     async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_slow_mode_applies_to_open_connections(asgi_app, room_and_participant):
+    from channels.db import database_sync_to_async
+    from backend.room.actions import update_room_rate_limits
+
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await database_sync_to_async(update_room_rate_limits)(
+            room=room, slow_mode_seconds=60
+        )
+        assert await communicator.receive_nothing() is True
+
+        await communicator.send_json_to({"type": "text", "message": "one"})
+        assert (await communicator.receive_json_from())["action"] == "new"
+        await communicator.send_json_to({"type": "text", "message": "two"})
+        payload = await communicator.receive_json_from()
+        assert payload == {"error": "Too many messages. Please slow down."}
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_frames_and_open_sockets_are_counted(settings, asgi_app, room_and_participant):
+    from prometheus_client import REGISTRY
+
+    settings.MAX_MESSAGES_PER_SEC = 1
+    room, member = room_and_participant
+
+    def frames(outcome: str) -> float:
+        labels = {"type": "text", "outcome": outcome}
+        return REGISTRY.get_sample_value("chat_frames_total", labels) or 0.0
+
+    def open_sockets() -> float:
+        return REGISTRY.get_sample_value("chat_open_sockets")
+
+    ok_before, limited_before = frames("ok"), frames("rate_limited")
+    sockets_before = open_sockets()
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+        assert open_sockets() == sockets_before + 1
+
+        await communicator.send_json_to({"type": "text", "message": "one"})
+        await communicator.receive_json_from()
+        await communicator.send_json_to({"type": "text", "message": "two"})
+        await communicator.receive_json_from()
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+    assert frames("ok") == ok_before + 1
+    assert frames("rate_limited") == limited_before + 1
+    assert open_sockets() == sockets_before
+
+
+@pytest.mark.django_db(transaction=True)
+def test_slow_mode_blocks_second_message(asgi_app, room_and_participant):
+    room, member = room_and_participant
+    room.slow_mode_seconds = 60
+    room.save(update_fields=["slow_mode_seconds"])
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "one"})
+        payload1 = await communicator.receive_json_from()
+        assert payload1["action"] == "new"
+
+        await communicator.send_json_to({"type": "text", "message": "two"})
+        payload2 = await communicator.receive_json_from()
+        assert payload2 == {"error": "Too many messages. Please slow down."}
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_presence_tracks_connection_lifecycle(asgi_app, room_and_participant):
+    room, member = room_and_participant
+    presence_key = f"chat_presence:{room.id}"
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        fake = FakeRedis.last_instance
+        members = list(fake._zsets[presence_key])
+        assert len(members) == 1
+        assert members[0].startswith(f"{member.id}:")
+        assert str(member.id) in fake._hashes["presence:last_activity"]
+
+        first_beat = fake._zsets[presence_key][members[0]]
+        await communicator.send_json_to({"type": "heartbeat"})
+        assert await communicator.receive_nothing() is True
+        assert fake._zsets[presence_key][members[0]] >= first_beat
+
+        await communicator.disconnect()
+        assert fake._zsets[presence_key] == {}
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_removed_participant_connection_is_revoked(asgi_app, room_and_participant):
+    from channels.db import database_sync_to_async
+    from backend.access import actions
+    from backend.access.models import Participant
+
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        participant = await database_sync_to_async(Participant.objects.get)(
+            user=member, room=room
+        )
+        await database_sync_to_async(actions.remove_participant)(participant)
+
+        output = await communicator.receive_output()
+        assert output == {"type": "websocket.close", "code": 4003}
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_banned_user_can_no_longer_post(asgi_app, room_and_participant):
+    from channels.db import database_sync_to_async
+    from backend.account import actions
+
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await database_sync_to_async(actions.ban_user)(user=member)
+        # Let the access invalidation reach the consumer
+        assert await communicator.receive_nothing() is True
+
+        await communicator.send_json_to({"type": "text", "message": "still here"})
+        payload = await communicator.receive_json_from()
+        assert "error" in payload
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_deleted_room_connection_is_revoked(asgi_app, room_and_participant):
+    from channels.db import database_sync_to_async
+    from backend.room import actions
+
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await database_sync_to_async(actions.delete_room)(room)
+
+        output = await communicator.receive_output()
+        assert output == {"type": "websocket.close", "code": 4003}
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_write_behind_broadcasts_before_persisting(
+    settings, monkeypatch, asgi_app, room_and_participant
+):
+    from channels.db import database_sync_to_async
+    from backend.messaging.models import Message
+    from backend.messaging.chat import writebehind
+
+    settings.CHAT_INGESTION_MODE = "write_behind"
+    message_buffer = writebehind.MessageWriteBuffer(max_size=100, interval=60)
+    monkeypatch.setattr(writebehind, "_buffer", message_buffer)
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "buffered"})
+        payload = await communicator.receive_json_from()
+        assert payload["action"] == "new"
+        assert payload["body"] == "buffered"
+
+        exists = await database_sync_to_async(
+            Message.objects.filter(id=payload["id"]).exists
+        )()
+        assert exists is False
+
+        await message_buffer.flush()
+
+        stored = await database_sync_to_async(Message.objects.get)(
+            id=payload["id"], room=room
+        )
+        # Stored with the timestamp clients were sent
+        assert stored.created_at.isoformat() == payload["created_at"]
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_large_room_broadcasts_once_over_pubsub(
+    settings, asgi_app, room_and_participant
+):
+    settings.CHAT_FANOUT = {"PUBSUB_MIN_CONNECTIONS": 2, "SIZE_CACHE_SECONDS": 0}
+    room, member = room_and_participant
+
+    async def run():
+        sender = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        sender.scope["user"] = member
+        listener = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        listener.scope["user"] = member
+        assert (await sender.connect())[0] is True
+        assert (await listener.connect())[0] is True
+
+        await sender.send_json_to({"type": "text", "message": "to everyone"})
+        sent = await sender.receive_json_from()
+        received = await listener.receive_json_from()
+        assert sent == received
+        assert received["body"] == "to everyone"
+
+        published = FakeRedis.last_instance.published
+        assert [channel for channel, _text in published] == [f"chat_fanout:{room.id}"]
+        assert await sender.receive_nothing() is True
+
+        await sender.disconnect()
+        await listener.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_failed_fanout_subscribe_closes_connection(
+    settings, monkeypatch, asgi_app, room_and_participant
+):
+    from redis.exceptions import ConnectionError as RedisConnectionError
+
+    settings.CHAT_FANOUT = {"PUBSUB_MIN_CONNECTIONS": 2, "SIZE_CACHE_SECONDS": 0}
+    room, member = room_and_participant
+
+    async def failing_subscribe(self, *channels):
+        raise RedisConnectionError("down")
+
+    monkeypatch.setattr(FakeRedis._PubSub, "subscribe", failing_subscribe)
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, code = await communicator.connect()
+        assert connected is False
+        assert code == 4503
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batching_client_receives_array_frames(asgi_app, room_and_participant):
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}?batch=1")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "batched"})
+        frame = await communicator.receive_json_from()
+        assert isinstance(frame, list)
+        assert [event["body"] for event in frame] == ["batched"]
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_ingestion_logs_message_before_broadcast(
+    settings, asgi_app, room_and_participant
+):
+    from channels.db import database_sync_to_async
+    from backend.messaging.models import Message
+
+    settings.CHAT_INGESTION_MODE = "stream"
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "logged"})
+        payload = await communicator.receive_json_from()
+        assert payload["action"] == "new"
+
+        stream_key = settings.CHAT_STREAM_PERSISTER["STREAM_KEY"]
+        entries = FakeRedis.last_instance._streams[stream_key]
+        assert len(entries) == 1
+        fields = entries[0][1]
+        assert fields["id"] == payload["id"]
+        assert fields["room_id"] == str(room.id)
+        assert fields["author_id"] == str(member.id)
+        assert fields["body"] == "logged"
+
+        # Persisted later by the `persist_chat_stream` worker
+        exists = await database_sync_to_async(
+            Message.objects.filter(id=payload["id"]).exists
+        )()
+        assert exists is False
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_stream_ingestion_edit_waits_for_persister(
+    settings, asgi_app, room_and_participant
+):
+    from channels.db import database_sync_to_async
+    from backend.messaging import actions
+    from backend.messaging.chat.groups import ingest_pending_key
+    from backend.messaging.chat.ingest import decode_entry
+
+    settings.CHAT_INGESTION_MODE = "stream"
+    room, member = room_and_participant
+
+    async def persist_later(fields: dict) -> None:
+        # Stands in for the `persist_chat_stream` worker
+        await asyncio.sleep(0.2)
+        message = decode_entry(fields)
+        await database_sync_to_async(actions.insert_ingested_messages)([message])
+        await FakeRedis.last_instance.delete(ingest_pending_key(message.id))
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "draft"})
+        draft = await communicator.receive_json_from()
+
+        stream_key = settings.CHAT_STREAM_PERSISTER["STREAM_KEY"]
+        fields = FakeRedis.last_instance._streams[stream_key][0][1]
+        persister = asyncio.ensure_future(persist_later(fields))
+
+        await communicator.send_json_to(
+            {"type": "update", "messageId": draft["id"], "message": "final"}
+        )
+        edited = await communicator.receive_json_from()
+        assert edited["action"] == "update"
+        assert edited["body"] == "final"
+
+        await persister
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_multiplexed_connection_subscribes_to_rooms(
+    asgi_app, users, room_and_participant
+):
+    from backend.room.models import Room
+
+    host, _member, _other = users
+    room, member = room_and_participant
+    foreign_room = Room.objects.create(host=host, name="Foreign Room")
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, "/ws/chat")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to(
+            {"type": "subscribe", "roomIds": [str(room.id), str(foreign_room.id)]}
+        )
+        assert await communicator.receive_json_from() == {
+            "type": "subscribed",
+            "room_ids": [str(room.id)],
+            "denied": [str(foreign_room.id)],
+        }
+
+        await communicator.send_json_to(
+            {"type": "text", "roomId": str(room.id), "message": "hi"}
+        )
+        payload = await communicator.receive_json_from()
+        assert payload["action"] == "new"
+        assert payload["room_id"] == str(room.id)
+
+        await communicator.send_json_to(
+            {"type": "text", "roomId": str(foreign_room.id), "message": "hi"}
+        )
+        assert await communicator.receive_json_from() == {
+            "error": "Not subscribed to this room."
+        }
+
+        await communicator.send_json_to(
+            {"type": "unsubscribe", "roomIds": [str(room.id)]}
+        )
+        assert await communicator.receive_json_from() == {
+            "type": "unsubscribed",
+            "room_ids": [str(room.id)],
+        }
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_read_acks_are_coalesced_into_watermark(
+    monkeypatch, asgi_app, room_and_participant
+):
+    from channels.db import database_sync_to_async
+    from backend.messaging.models import ReadWatermark
+    from backend.messaging.chat import receipts
+
+    receipt_buffer = receipts.ReadReceiptBuffer(max_size=100, interval=60)
+    monkeypatch.setattr(receipts, "_buffer", receipt_buffer)
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        message_ids = []
+        for body in ("one", "two"):
+            await communicator.send_json_to({"type": "text", "message": body})
+            payload = await communicator.receive_json_from()
+            message_ids.append(payload["id"])
+
+        for message_id in message_ids:
+            await communicator.send_json_to({"type": "read", "messageId": message_id})
+        assert await communicator.receive_nothing() is True
+        assert len(receipt_buffer._batcher) == 2
+
+        await receipt_buffer.flush()
+
+        watermark = await database_sync_to_async(ReadWatermark.objects.get)(
+            participant__user=member, room=room
+        )
+        assert str(watermark.last_read_message_id) == message_ids[-1]
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_read_ack_of_buffered_message_is_retried(
+    settings, monkeypatch, asgi_app, room_and_participant
+):
+    from channels.db import database_sync_to_async
+    from backend.messaging.models import ReadWatermark
+    from backend.messaging.chat import receipts, writebehind
+
+    settings.CHAT_INGESTION_MODE = "write_behind"
+    message_buffer = writebehind.MessageWriteBuffer(max_size=100, interval=60)
+    monkeypatch.setattr(writebehind, "_buffer", message_buffer)
+    receipt_buffer = receipts.ReadReceiptBuffer(
+        max_size=100, interval=60, max_retries=1
+    )
+    monkeypatch.setattr(receipts, "_buffer", receipt_buffer)
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "unread"})
+        message_id = (await communicator.receive_json_from())["id"]
+        await communicator.send_json_to({"type": "read", "messageId": message_id})
+        assert await communicator.receive_nothing() is True
+
+        # Acking didn't force the message out of the write-behind buffer
+        assert message_buffer.contains(uuid.UUID(message_id))
+        await receipt_buffer.flush()
+        assert len(receipt_buffer._batcher) == 1
+
+        await message_buffer.flush()
+        await receipt_buffer.flush()
+        watermark = await database_sync_to_async(ReadWatermark.objects.get)(
+            participant__user=member, room=room
+        )
+        assert str(watermark.last_read_message_id) == message_id
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_resume_returns_events_after_sequence_number(asgi_app, room_and_participant):
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        sent = []
+        for body in ("one", "two", "three"):
+            await communicator.send_json_to({"type": "text", "message": body})
+            sent.append(await communicator.receive_json_from())
+        assert [event["seq"] for event in sent] == [1, 2, 3]
+
+        await communicator.send_json_to({"type": "resume", "seq": 1})
+        resumed = await communicator.receive_json_from()
+        assert resumed["type"] == "resumed"
+        assert resumed["complete"] is True
+        assert resumed["latest_seq"] == 3
+        assert [event["body"] for event in resumed["events"]] == ["two", "three"]
+        assert [event["seq"] for event in resumed["events"]] == [2, 3]
+
+        # Trimmed past the requested position: the client must reload
+        stream = FakeRedis.last_instance._streams[f"chat_stream:{room.id}"]
+        del stream[:2]
+        await communicator.send_json_to({"type": "resume", "seq": 0})
+        resumed = await communicator.receive_json_from()
+        assert resumed["complete"] is False
+        assert resumed["events"] == []
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_frame_applies_operations_with_one_broadcast(
+    asgi_app, room_and_participant
+):
+    import uuid
+
+    from channels.db import database_sync_to_async
+    from backend.messaging.models import Message
+
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "draft"})
+        draft = await communicator.receive_json_from()
+
+        await communicator.send_json_to(
+            {
+                "type": "batch",
+                "operations": [
+                    {"type": "text", "message": "one"},
+                    {"type": "text", "message": "two"},
+                    {"type": "update", "messageId": draft["id"], "message": "final"},
+                    {"type": "delete", "messageId": str(uuid.uuid4())},
+                ],
+            }
+        )
+        frames = [await communicator.receive_json_from() for _ in range(2)]
+        frames = {frame.get("action", frame["type"]): frame for frame in frames}
+
+        results = frames["batch_result"]["results"]
+        assert [result["ok"] for result in results] == [True, True, True, False]
+        assert results[3]["error"] == "Message not found."
+
+        batch = frames["batch"]
+        assert [event["action"] for event in batch["events"]] == [
+            "new",
+            "new",
+            "update",
+        ]
+        assert [event["seq"] for event in batch["events"]] == [2, 3, 4]
+
+        bodies = await database_sync_to_async(
+            lambda: set(
+                Message.objects.filter(room=room).values_list("body", flat=True)
+            )
+        )()
+        assert bodies == {"one", "two", "final"}
+
+        # Malformed operations reject the whole frame
+        await communicator.send_json_to(
+            {"type": "batch", "operations": [{"type": "update", "message": "x"}]}
+        )
+        error = await communicator.receive_json_from()
+        assert error["error"] == "Invalid operation at index 0."
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_batch_larger_than_rate_limit_burst_is_rejected_up_front(
+    asgi_app, room_and_participant
+):
+    room, member = room_and_participant
+    room.slow_mode_seconds = 60
+    room.save(update_fields=["slow_mode_seconds"])
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        operations = [{"type": "text", "message": body} for body in ("a", "b")]
+        await communicator.send_json_to({"type": "batch", "operations": operations})
+        error = await communicator.receive_json_from()
+        assert error["error"] == "A batch may hold at most 1 operations."
+
+        # The rejected batch wasn't charged: a single message still goes through
+        await communicator.send_json_to({"type": "batch", "operations": operations[:1]})
+        frames = [await communicator.receive_json_from() for _ in range(2)]
+        assert {frame.get("action", frame["type"]) for frame in frames} == {
+            "batch",
+            "batch_result",
+        }
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_expired_token_closes_connection(asgi_app, room_and_participant):
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        communicator.scope["auth_expires_at"] = time.time() + 0.1
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        assert await communicator.receive_json_from() == {"type": "auth_expired"}
+        closed = await communicator.receive_output()
+        assert closed == {"type": "websocket.close", "code": 4001}
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_auth_frame_extends_connection(asgi_app, room_and_participant):
+    from channels.db import database_sync_to_async
+    from graphql_jwt.shortcuts import get_token
+
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        communicator.scope["auth_expires_at"] = time.time() + 0.5
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "auth", "token": "garbage"})
+        error = await communicator.receive_json_from()
+        assert error["error"] == "Invalid or expired token."
+
+        token = await database_sync_to_async(get_token)(member)
+        await communicator.send_json_to({"type": "auth", "token": token})
+        refreshed = await communicator.receive_json_from()
+        assert refreshed["type"] == "auth_refreshed"
+        assert refreshed["expires_at"] > time.time() + 60
+
+        # Still open past the original expiry, and still in the room
+        assert await communicator.receive_nothing(timeout=0.7)
+        await communicator.send_json_to({"type": "text", "message": "still here"})
+        event = await communicator.receive_json_from()
+        assert event["body"] == "still here"
+
+        await communicator.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reconnect_replays_missed_events_from_stream(asgi_app, room_and_participant):
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "seen"})
+        seen = await communicator.receive_json_from()
+        await communicator.send_json_to({"type": "text", "message": "missed"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        resumed = WebsocketCommunicator(
+            asgi_app, f"/ws/chat/{room.id}?last_event_id={seen['stream_id']}"
+        )
+        resumed.scope["user"] = member
+        connected, _ = await resumed.connect()
+        assert connected is True
+
+        replayed = await resumed.receive_json_from()
+        assert replayed["body"] == "missed"
+        assert replayed["replayed"] is True
+
+        complete = await resumed.receive_json_from()
+        assert complete["type"] == "replay_complete"
+        assert complete["source"] == "stream"
+        assert complete["stream_id"] == replayed["stream_id"]
+
+        await resumed.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reconnect_past_trimmed_stream_replays_changes_from_database(
+    asgi_app, room_and_participant
+):
+    from datetime import timedelta
+
+    from backend.messaging.chat.streams import stream_id_to_datetime
+    from backend.messaging.models import Message
+
+    room, member = room_and_participant
+    cursor_ms = int(time.time() * 1000) - 300_000
+    cursor = stream_id_to_datetime((cursor_ms, 0))
+
+    def add(body, created_at, updated_at):
+        message = Message.objects.create(room=room, author=member, body=body)
+        Message.objects.filter(id=message.id).update(
+            created_at=created_at, updated_at=updated_at
+        )
+
+    add("edited", cursor - timedelta(hours=1), cursor + timedelta(minutes=1))
+    add("on the boundary", cursor, cursor)
+    add("untouched", cursor - timedelta(hours=1), cursor - timedelta(hours=1))
+    Message.objects.create(room=room, author=member, body="new")
+
+    async def run():
+        resumed = WebsocketCommunicator(
+            asgi_app, f"/ws/chat/{room.id}?last_event_id={cursor_ms}-0"
+        )
+        resumed.scope["user"] = member
+        connected, _ = await resumed.connect()
+        assert connected is True
+
+        replayed = [await resumed.receive_json_from() for _ in range(3)]
+        assert [(event["action"], event["body"]) for event in replayed] == [
+            ("new", "on the boundary"),
+            ("update", "edited"),
+            ("new", "new"),
+        ]
+
+        complete = await resumed.receive_json_from()
+        assert complete["type"] == "replay_complete"
+        assert complete["source"] == "database"
+        assert complete["resync_required"] is True
+        assert complete["truncated"] is False
+
+        await resumed.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_compressed_stream_entries_replay(settings, asgi_app, room_and_participant):
+    settings.REDIS_STREAMS = {**settings.REDIS_STREAMS, "ENCODING": "zlib"}
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "first"})
+        first = await communicator.receive_json_from()
+        await communicator.send_json_to({"type": "text", "message": "compressed"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        entries = FakeRedis.last_instance._streams[f"chat_stream:{room.id}"]
+        assert all(set(fields) == {"z2"} for _id, fields in entries)
+
+        resumed = WebsocketCommunicator(
+            asgi_app, f"/ws/chat/{room.id}?last_event_id={first['stream_id']}"
+        )
+        resumed.scope["user"] = member
+        connected, _ = await resumed.connect()
+        assert connected is True
+
+        replayed = await resumed.receive_json_from()
+        assert replayed["body"] == "compressed"
+        assert replayed["timestamp"]
+
+        complete = await resumed.receive_json_from()
+        assert complete["source"] == "stream"
+
+        await resumed.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_reconnect_falls_back_to_database_when_stream_trimmed(
+    asgi_app, room_and_participant
+):
+    room, member = room_and_participant
+
+    async def run():
+        communicator = WebsocketCommunicator(asgi_app, f"/ws/chat/{room.id}")
+        communicator.scope["user"] = member
+        connected, _ = await communicator.connect()
+        assert connected is True
+
+        await communicator.send_json_to({"type": "text", "message": "kept"})
+        await communicator.receive_json_from()
+        await communicator.disconnect()
+
+        # Simulate trimming: the client resumes from an ID older than the stream.
+        FakeRedis.last_instance._streams[f"chat_stream:{room.id}"] = [
+            ("9999999999999-0", {"data": "{}"})
+        ]
+
+        resumed = WebsocketCommunicator(
+            asgi_app, f"/ws/chat/{room.id}?last_event_id=0-1"
+        )
+        resumed.scope["user"] = member
+        connected, _ = await resumed.connect()
+        assert connected is True
+
+        replayed = await resumed.receive_json_from()
+        assert replayed["body"] == "kept"
+
+        complete = await resumed.receive_json_from()
+        assert complete["source"] == "database"
+        assert complete["stream_id"] == "9999999999999-0"
+
+        await resumed.disconnect()
+
+    async_to_sync(run)()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_chat_loadtest_command_reports_deliveries(tmp_path):
+    report_path = tmp_path / "report.json"
+
+    call_command(
+        "chat_loadtest",
+        "--clients=4",
+        "--rooms=2",
+        "--rate=20",
+        "--duration=0.2",
+        f"--json={report_path}",
+        stdout=io.StringIO(),
+    )
+
+    report = json.loads(report_path.read_text())
+    assert report["sent"] == 4
+    # Every message reaches both clients of its room, the sender included
+    assert report["delivered"] == report["expected_deliveries"] == 8
+    assert report["errors"] == {}
@@ -0,0 +1,60 @@
+import asyncio
+import uuid
+
+import pytest
+
+from backend.messaging.chat.fanout import RoomFanout
+from backend.messaging.chat.groups import room_fanout_channel
+
+
+pytestmark = pytest.mark.unit
+
+
+class SlowPubSub:
+    """Completes subscriptions once `release` is set."""
+
+    def __init__(self):
+        self.release = asyncio.Event()
+        self.subscribed: list[str] = []
+        self.unsubscribed: list[str] = []
+
+    async def subscribe(self, *channels: str) -> None:
+        await self.release.wait()
+        self.subscribed.extend(channels)
+
+    async def unsubscribe(self, *channels: str) -> None:
+        self.unsubscribed.extend(channels)
+
+    async def get_message(self, ignore_subscribe_messages=False, timeout=0.0):
+        await asyncio.sleep(timeout)
+        return None
+
+    async def aclose(self) -> None:
+        pass
+
+
+def test_concurrent_joins_share_one_subscription():
+    async def run():
+        fanout = RoomFanout(min_connections=1, size_ttl=0)
+        pubsub = fanout._pubsub = SlowPubSub()
+        room_id = uuid.uuid4()
+        channel = room_fanout_channel(room_id)
+
+        joins = [
+            asyncio.ensure_future(fanout.register(room_id, consumer))
+            for consumer in ("first", "second")
+        ]
+        await asyncio.sleep(0)
+        pubsub.release.set()
+        await asyncio.gather(*joins)
+
+        assert pubsub.subscribed == [channel]
+        assert fanout._local[room_id] == {"first", "second"}
+
+        await fanout.unregister(room_id, "first")
+        assert pubsub.unsubscribed == []
+        await fanout.unregister(room_id, "second")
+        assert pubsub.unsubscribed == [channel]
+        assert room_id not in fanout._local
+
+    asyncio.run(run())
@@ -0,0 +1,42 @@
+import asyncio
+
+import pytest
+
+from backend.messaging.chat import lifespan as lifespan_module
+
+
+pytestmark = pytest.mark.unit
+
+
+class Buffer:
+    def __init__(self):
+        self.flushed = False
+
+    async def flush(self) -> None:
+        self.flushed = True
+
+
+def test_shutdown_flushes_write_buffers(monkeypatch):
+    messages, receipts = Buffer(), Buffer()
+    monkeypatch.setattr(lifespan_module, "get_message_buffer", lambda: messages)
+    monkeypatch.setattr(lifespan_module, "get_receipt_buffer", lambda: receipts)
+
+    async def run():
+        events = asyncio.Queue()
+        for event in ("lifespan.startup", "lifespan.shutdown"):
+            await events.put({"type": event})
+        sent: list[dict] = []
+
+        async def send(message):
+            sent.append(message)
+
+        await lifespan_module.lifespan({"type": "lifespan"}, events.get, send)
+        return sent
+
+    sent = asyncio.run(run())
+
+    assert [message["type"] for message in sent] == [
+        "lifespan.startup.complete",
+        "lifespan.shutdown.complete",
+    ]
+    assert messages.flushed and receipts.flushed
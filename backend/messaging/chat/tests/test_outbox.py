@@ -0,0 +1,115 @@
+import asyncio
+import json
+
+import pytest
+
+from backend.messaging.chat.outbox import OutboundFrame, OutboundQueue, OverflowPolicy
+
+
+pytestmark = pytest.mark.unit
+
+
+class Client:
+    def __init__(self):
+        self.sent: list[str] = []
+        self.overflowed = False
+
+    async def send(self, text: str) -> None:
+        self.sent.append(text)
+
+    async def on_overflow(self) -> None:
+        self.overflowed = True
+
+
+def _queue(client: Client, policy=OverflowPolicy.DROP_OLDEST, **kwargs):
+    return OutboundQueue(
+        client.send,
+        max_frames=kwargs.pop("max_frames", 2),
+        policy=policy,
+        on_overflow=client.on_overflow,
+        **kwargs,
+    )
+
+
+async def _drain(queue: OutboundQueue) -> None:
+    queue.start()
+    queue.resume()
+    for _ in range(10):
+        await asyncio.sleep(0)
+    await queue.stop()
+
+
+def test_frames_are_sent_in_order_after_resume():
+    async def run():
+        client = Client()
+        queue = _queue(client, max_frames=10)
+        queue.pause()
+        queue.start()
+        queue.put(OutboundFrame("1", room_id="r", stream_id="1-0"))
+        queue.put(OutboundFrame("2", room_id="r", stream_id="2-0"))
+        await asyncio.sleep(0)
+        assert client.sent == []
+
+        await _drain(queue)
+        assert client.sent == ["1", "2"]
+        assert queue.last_stream_ids == {"r": "2-0"}
+
+    asyncio.run(run())
+
+
+def test_drop_oldest_keeps_newest_frames():
+    async def run():
+        client = Client()
+        queue = _queue(client)
+        for text in ("1", "2", "3"):
+            assert queue.put(OutboundFrame(text)) is True
+
+        await _drain(queue)
+        assert client.sent == ["2", "3"]
+
+    asyncio.run(run())
+
+
+def test_coalesce_replaces_superseded_frames():
+    async def run():
+        client = Client()
+        queue = _queue(client, policy=OverflowPolicy.COALESCE, max_frames=10)
+        queue.put(OutboundFrame("edit 1", key="message:a"))
+        queue.put(OutboundFrame("other"))
+        queue.put(OutboundFrame("edit 2", key="message:a"))
+
+        await _drain(queue)
+        assert client.sent == ["other", "edit 2"]
+
+    asyncio.run(run())
+
+
+def test_disconnect_policy_gives_up_on_full_queue():
+    async def run():
+        client = Client()
+        queue = _queue(client, policy=OverflowPolicy.DISCONNECT)
+        queue.put(OutboundFrame("1"))
+        queue.put(OutboundFrame("2"))
+
+        assert queue.put(OutboundFrame("3")) is False
+        assert queue.put(OutboundFrame("4")) is False
+        await asyncio.sleep(0)
+        assert client.overflowed is True
+        assert len(queue) == 0
+
+    asyncio.run(run())
+
+
+def test_batch_window_sends_one_array_frame():
+    async def run():
+        client = Client()
+        queue = _queue(client, max_frames=10, batch_window=0.001)
+        queue.start()
+        queue.put(OutboundFrame(json.dumps({"n": 1})))
+        queue.put(OutboundFrame(json.dumps({"n": 2})))
+
+        await asyncio.sleep(0.05)
+        await queue.stop()
+        assert [json.loads(text) for text in client.sent] == [[{"n": 1}, {"n": 2}]]
+
+    asyncio.run(run())
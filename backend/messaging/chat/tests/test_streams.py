@@ -0,0 +1,80 @@
+import pytest
+
+from backend.messaging.chat.streams import (
+    STREAM_CODECS,
+    RoomDelta,
+    _delta,
+    decode_event,
+    encode_event,
+    get_stream_codec,
+)
+
+
+pytestmark = pytest.mark.unit
+
+EVENT = {
+    "type": "chat_message",
+    "action": "new",
+    "id": "2f0c9f4e-7d0a-4c1e-9a43-0b6f5a7c1d2e",
+    "author": "member",
+    "body": "Zażółć gęślą jaźń",
+    "is_edited": False,
+    "author_avatar": None,
+}
+
+
+@pytest.mark.parametrize("name", list(STREAM_CODECS))
+def test_codecs_round_trip(name):
+    fields = encode_event(EVENT, get_stream_codec(name))
+
+    assert decode_event(fields) == EVENT
+
+
+def test_decode_reads_entries_of_any_codec(settings):
+    settings.REDIS_STREAMS = {**settings.REDIS_STREAMS, "ENCODING": "zlib"}
+    legacy = {"data": '{"body": "old"}', "timestamp": "2025-01-01T00:00:00+00:00"}
+
+    assert decode_event(legacy) == {"body": "old"}
+    assert decode_event({b"z2": encode_event(EVENT)["z2"]}) == EVENT
+
+
+def test_zlib_shrinks_short_events():
+    json_size = len(encode_event(EVENT, get_stream_codec("json"))["data"])
+    zlib_size = len(encode_event(EVENT, get_stream_codec("zlib"))["z2"])
+
+    assert zlib_size < json_size
+
+
+@pytest.mark.parametrize("fields", [{}, {"z2": b"not zlib"}, {"data": "[1, 2]"}])
+def test_decode_rejects_invalid_entries(fields):
+    with pytest.raises(ValueError):
+        decode_event(fields)
+
+
+def _entries(*seqs: int) -> list:
+    """Stream entries with the given sequence numbers, newest first."""
+    return [
+        (f"{seq}-0", {"seq": str(seq), **encode_event({"body": str(seq)})})
+        for seq in reversed(seqs)
+    ]
+
+
+def test_delta_returns_events_after_seq_oldest_first():
+    delta = _delta(_entries(1, 2, 3, 4), b"4", seq=2)
+
+    assert delta.complete is True
+    assert delta.latest_seq == 4
+    assert [event["seq"] for event in delta.events] == [3, 4]
+    assert delta.events[0]["stream_id"] == "3-0"
+
+
+def test_delta_is_complete_and_empty_when_up_to_date():
+    assert _delta(_entries(1, 2), "2", seq=2) == RoomDelta([], 2, True)
+
+
+def test_delta_is_incomplete_when_stream_was_trimmed():
+    assert _delta(_entries(5, 6), "6", seq=2) == RoomDelta([], 6, False)
+
+
+def test_delta_is_incomplete_when_client_is_ahead_of_counter():
+    assert _delta([], None, seq=3) == RoomDelta([], 0, False)
@@ -0,0 +1,54 @@
+import uuid
+
+import pytest
+
+from backend.access.dtos import PermissionSnapshot
+from backend.access.enums import PermissionCode, PermissionFlag
+from backend.messaging.chat.subscriptions import RoomSubscription
+from backend.room.models import Room
+
+
+pytestmark = pytest.mark.unit
+
+
+def test_permission_flags_round_trip_codes():
+    codes = {PermissionCode.ROOM_DELETE_MESSAGE, PermissionCode.ROOM_UPDATE}
+
+    flags = PermissionFlag.from_codes(codes | {"retired.code"})
+
+    assert flags == PermissionFlag.ROOM_DELETE_MESSAGE | PermissionFlag.ROOM_UPDATE
+    assert flags.codes() == codes
+
+
+def test_subscription_keeps_compact_state_and_rebuilds_snapshot():
+    room = Room(id=uuid.uuid4(), slow_mode_seconds=3, connection_messages_per_sec=5)
+    snapshot = PermissionSnapshot(
+        user_id=uuid.uuid4(),
+        room_id=room.id,
+        participant_id=uuid.uuid4(),
+        role_id=uuid.uuid4(),
+        permission_codes=frozenset({PermissionCode.ROOM_DELETE_MESSAGE.value}),
+    )
+
+    sub = RoomSubscription(room, snapshot)
+
+    assert not hasattr(sub, "__dict__")
+    assert sub.bucket is not None
+    assert sub.snapshot(snapshot.user_id) == snapshot
+    assert sub.as_room().slow_mode_seconds == 3
+
+
+def test_subscription_refreshes_rate_limits():
+    room = Room(id=uuid.uuid4(), connection_messages_per_sec=5)
+    snapshot = PermissionSnapshot(
+        user_id=uuid.uuid4(), room_id=room.id, participant_id=uuid.uuid4()
+    )
+    sub = RoomSubscription(room, snapshot)
+    bucket = sub.bucket
+
+    sub.limit(Room(id=room.id, slow_mode_seconds=10, connection_messages_per_sec=5))
+    assert sub.slow_mode_seconds == 10
+    assert sub.bucket is bucket
+
+    sub.limit(Room(id=room.id, connection_messages_per_sec=0))
+    assert sub.bucket is None
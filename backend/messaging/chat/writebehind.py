@@ -0,0 +1,92 @@
+import logging
+import time
+import uuid
+from typing import Optional
+
+from channels.db import database_sync_to_async
+from django.conf import settings
+from django.db import DatabaseError
+
+from backend.core.batching import AsyncBatcher
+from backend.messaging import actions
+from backend.messaging.chat.metrics import (
+    CHAT_WRITE_BEHIND_BATCH_SIZE,
+    CHAT_WRITE_BEHIND_FAILURES_TOTAL,
+    CHAT_WRITE_BEHIND_FLUSH_LATENCY_SECONDS,
+)
+from backend.messaging.models import Message
+
+
+logger = logging.getLogger(__name__)
+
+
+@database_sync_to_async
+def _persist(messages: list[Message]) -> int:
+    """Bulk insert a batch, retrying row by row so one bad row doesn't sink the rest."""
+    try:
+        # Messages of rooms or authors deleted meanwhile are skipped
+        return len(messages) - actions.bulk_create_messages(messages)
+    except DatabaseError:
+        logger.warning(
+            f"Bulk insert of {len(messages)} messages failed, retrying one by one",
+            exc_info=True,
+        )
+
+    failed = 0
+    for message in messages:
+        try:
+            inserted = actions.bulk_create_messages([message])
+        except DatabaseError:
+            logger.error(f"Dropping buffered message {message.id}", exc_info=True)
+            inserted = 0
+        failed += 1 - inserted
+    return failed
+
+
+class MessageWriteBuffer:
+    """Per-process buffer persisting broadcast chat messages in batches."""
+
+    def __init__(self, max_size: int, interval: float):
+        self._batcher: AsyncBatcher[Message] = AsyncBatcher(
+            self._flush, max_size=max_size, interval=interval
+        )
+
+    async def _flush(self, messages: list[Message]) -> None:
+        CHAT_WRITE_BEHIND_BATCH_SIZE.observe(len(messages))
+        started = time.perf_counter()
+        try:
+            failed = await _persist(messages)
+        except Exception:
+            CHAT_WRITE_BEHIND_FAILURES_TOTAL.inc(len(messages))
+            raise
+        finally:
+            CHAT_WRITE_BEHIND_FLUSH_LATENCY_SECONDS.observe(
+                time.perf_counter() - started
+            )
+
+        if failed:
+            CHAT_WRITE_BEHIND_FAILURES_TOTAL.inc(failed)
+
+    def add(self, message: Message) -> None:
+        self._batcher.add(message)
+
+    def contains(self, message_id: uuid.UUID) -> bool:
+        return any(message.id == message_id for message in self._batcher.buffered)
+
+    async def flush(self) -> None:
+        await self._batcher.flush()
+
+
+_buffer: Optional[MessageWriteBuffer] = None
+
+
+def get_message_buffer() -> MessageWriteBuffer:
+    """Lazily create the write buffer shared by all consumers of this process."""
+    global _buffer
+    if _buffer is None:
+        config = settings.CHAT_WRITE_BEHIND
+        _buffer = MessageWriteBuffer(
+            max_size=config["MAX_BATCH_SIZE"],
+            interval=config["FLUSH_INTERVAL_MS"] / 1000,
+        )
+    return _buffer
@@ -0,0 +1,80 @@
+import base64
+import uuid
+from datetime import datetime
+from enum import StrEnum
+from typing import Optional, Self
+
+from pydantic import BaseModel, ConfigDict
+
+from backend.messaging.models import Message
+
+
+class BatchAction(StrEnum):
+    NEW = "new"
+    UPDATE = "update"
+    DELETE = "delete"
+
+
+class BatchOperation(BaseModel):
+    """One operation of a batch, see `MessageService.apply_batch`."""
+
+    model_config = ConfigDict(frozen=True)
+
+    action: BatchAction
+    # Target of updates and deletions
+    message_id: Optional[uuid.UUID] = None
+    # Body of new and updated messages
+    body: Optional[str] = None
+
+
+class BatchResult(BaseModel):
+    """Outcome of one batch operation; `error` is set if it was rejected."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    index: int
+    action: BatchAction
+    message_id: Optional[uuid.UUID] = None
+    # The created or updated message
+    message: Optional[Message] = None
+    error: Optional[str] = None
+    errors: Optional[dict[str, list[str]]] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+class MessageCursor(BaseModel):
+    """Keyset position of a message in its room's history: `(created_at, id)`."""
+
+    model_config = ConfigDict(frozen=True)
+
+    created_at: datetime
+    id: uuid.UUID
+
+    @classmethod
+    def of(cls, message: Message) -> Self:
+        return cls(created_at=message.created_at, id=message.id)
+
+    def encode(self) -> str:
+        """Opaque cursor string, as handed to GraphQL clients."""
+        raw = f"{self.created_at.isoformat()}|{self.id}"
+        return base64.urlsafe_b64encode(raw.encode()).decode()
+
+    @classmethod
+    def decode(cls, cursor: str) -> Self:
+        """Parse an `encode`d cursor; raises ValueError if it is malformed."""
+        raw = base64.urlsafe_b64decode(cursor.encode()).decode()
+        created_at, _, message_id = raw.partition("|")
+        return cls(created_at=created_at, id=message_id)
+
+
+class MessagePage(BaseModel):
+    """A window of a room's history, oldest message first."""
+
+    model_config = ConfigDict(arbitrary_types_allowed=True)
+
+    messages: list[Message]
+    has_previous_page: bool
+    has_next_page: bool
@@ -0,0 +1,306 @@
+import asyncio
+import json
+import statistics
+import threading
+import time
+import uuid
+from collections import Counter
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.test import override_settings
+
+from backend.access.models import Participant
+from backend.account.models import User
+from backend.core import codec
+from backend.room.models import Room
+
+
+IN_MEMORY_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+
+
+class QueryCounter:
+    """Counts queries on every database connection, whichever thread runs it."""
+
+    def __init__(self):
+        self.count = 0
+        self._lock = threading.Lock()
+
+    def __call__(self, execute, sql, params, many, context):
+        with self._lock:
+            self.count += 1
+        return execute(sql, params, many, context)
+
+    def install(self) -> None:
+        for connection in connections.all():
+            self._attach(connection)
+        connection_created.connect(self._on_connection_created, weak=False)
+
+    def uninstall(self) -> None:
+        connection_created.disconnect(self._on_connection_created)
+
+    def _on_connection_created(self, sender, connection, **kwargs):
+        self._attach(connection)
+
+    def _attach(self, connection) -> None:
+        if self not in connection.execute_wrappers:
+            connection.execute_wrappers.append(self)
+
+
+def _percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+    index = min(len(sorted_values) - 1, int(len(sorted_values) * fraction))
+    return sorted_values[index]
+
+
+class Command(BaseCommand):
+    help = (
+        "Load-test the chat WebSocket path: open many in-process clients across "
+        "rooms, send messages at a fixed rate and report throughput, delivery "
+        "latency and DB queries per message. Creates throwaway users and rooms "
+        "in the configured database and deletes them afterwards. Room streams, "
+        "presence and rate limits use the configured Redis."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--clients", type=int, default=1_000)
+        parser.add_argument("--rooms", type=int, default=10)
+        parser.add_argument(
+            "--rate",
+            type=float,
+            default=100,
+            help="Messages per second sent across all clients.",
+        )
+        parser.add_argument(
+            "--duration", type=float, default=10, help="Seconds of sending."
+        )
+        parser.add_argument(
+            "--drain",
+            type=float,
+            default=5,
+            help="Max seconds to wait for deliveries once sending stopped.",
+        )
+        parser.add_argument(
+            "--layer",
+            choices=["memory", "redis"],
+            default="memory",
+            help="InMemoryChannelLayer, or the configured CHANNEL_LAYERS.",
+        )
+        parser.add_argument(
+            "--connect-concurrency",
+            type=int,
+            default=100,
+            help="Handshakes in flight while opening clients.",
+        )
+        parser.add_argument(
+            "--json", dest="json_path", help="Also write the report to this file."
+        )
+        parser.add_argument(
+            "--max-p99-ms",
+            type=float,
+            help="Fail if the p99 delivery latency exceeds this, e.g. in CI.",
+        )
+
+    def handle(self, *args, **options):
+        if options["clients"] < options["rooms"] or options["rooms"] < 1:
+            raise CommandError("Need at least one room and one client per room.")
+
+        users, rooms = self._create_fixture(options["clients"], options["rooms"])
+        try:
+            layers = {"CHANNEL_LAYERS": IN_MEMORY_LAYERS}
+            if options["layer"] == "redis":
+                layers = {}
+            with override_settings(**layers):
+                report = asyncio.run(LoadTest(users, rooms, options).run())
+        finally:
+            Room.objects.filter(id__in=[room.id for room in rooms]).delete()
+            User.objects.filter(id__in=[user.id for user in users]).delete()
+
+        self._write_report(report)
+        if options["json_path"]:
+            with open(options["json_path"], "w") as f:
+                json.dump(report, f, indent=2)
+
+        max_p99 = options["max_p99_ms"]
+        if max_p99 is not None and report["latency_ms"]["p99"] > max_p99:
+            raise CommandError(
+                f"p99 delivery latency {report['latency_ms']['p99']:.1f} ms "
+                f"exceeds {max_p99:.1f} ms"
+            )
+
+    def _create_fixture(self, clients: int, rooms: int):
+        suffix = uuid.uuid4().hex[:6]
+        password = make_password(None)
+        users = User.objects.bulk_create(
+            User(
+                username=f"lt-{suffix}-{i}",
+                email=f"lt-{suffix}-{i}@example.com",
+                name="Load test",
+                password=password,
+            )
+            for i in range(clients)
+        )
+        room_list = [
+            Room.objects.create(host=users[0], name=f"Load test {suffix} {i}")
+            for i in range(rooms)
+        ]
+        Participant.objects.bulk_create(
+            Participant(user=user, room=room_list[i % rooms])
+            for i, user in enumerate(users)
+        )
+        self.stdout.write(f"Created {clients} users in {rooms} rooms")
+        return users, room_list
+
+    def _write_report(self, report: dict) -> None:
+        latency = report["latency_ms"]
+        lines = [
+            f"clients {report['clients']} in {report['rooms']} rooms, "
+            f"{report['layer']} channel layer",
+            f"sent {report['sent']} messages in {report['elapsed_s']:.1f}s: "
+            f"{report['messages_per_sec']:.0f} msgs/s, "
+            f"{report['deliveries_per_sec']:.0f} deliveries/s",
+            f"delivered {report['delivered']} of {report['expected_deliveries']}",
+            f"latency p50 {latency['p50']:.1f} ms, p95 {latency['p95']:.1f} ms, "
+            f"p99 {latency['p99']:.1f} ms, max {latency['max']:.1f} ms",
+            f"DB queries per message {report['queries_per_message']:.2f}",
+        ]
+        for error, count in report["errors"].items():
+            lines.append(f"error x{count}: {error}")
+        self.stdout.write("\n".join(lines))
+
+
+class LoadTest:
+    """One run of `chat_loadtest`, on its own event loop."""
+
+    def __init__(self, users: list[User], rooms: list[Room], options: dict):
+        self.users = users
+        self.rooms = rooms
+        self.options = options
+        self.clients: list = []
+        self.client_rooms: list[uuid.UUID] = []
+        self.room_sizes: Counter = Counter()
+        # Message number -> perf_counter time it was sent
+        self.sent_at: dict[int, float] = {}
+        self.latencies: list[float] = []
+        self.errors: Counter = Counter()
+        self.queries = QueryCounter()
+
+    async def run(self) -> dict:
+        # Before connecting, as handlers query on connections opened then
+        self.queries.install()
+        readers = []
+        try:
+            await self._connect()
+            readers = [asyncio.ensure_future(self._read(c)) for c in self.clients]
+
+            queries_before = self.queries.count
+            started = time.perf_counter()
+            sent = await self._send()
+            expected = sum(
+                self.room_sizes[self.client_rooms[self._sender(n)]] for n in range(sent)
+            )
+            await self._drain(expected)
+            elapsed = time.perf_counter() - started
+            queries = self.queries.count - queries_before
+        finally:
+            self.queries.uninstall()
+            for reader in readers:
+                reader.cancel()
+            for client in self.clients:
+                await client.disconnect()
+
+        latencies = sorted(self.latencies)
+        return {
+            "clients": len(self.clients),
+            "rooms": len(self.rooms),
+            "layer": self.options["layer"],
+            "sent": sent,
+            "delivered": len(latencies),
+            "expected_deliveries": expected,
+            "elapsed_s": elapsed,
+            "messages_per_sec": sent / elapsed,
+            "deliveries_per_sec": len(latencies) / elapsed,
+            "latency_ms": {
+                "p50": _percentile(latencies, 0.50) * 1000,
+                "p95": _percentile(latencies, 0.95) * 1000,
+                "p99": _percentile(latencies, 0.99) * 1000,
+                "max": (latencies[-1] if latencies else 0.0) * 1000,
+                "mean": (statistics.fmean(latencies) if latencies else 0.0) * 1000,
+            },
+            "queries_per_message": queries / sent if sent else 0.0,
+            "errors": dict(self.errors),
+        }
+
+    async def _connect(self) -> None:
+        from channels.routing import URLRouter
+        from channels.testing import WebsocketCommunicator
+
+        from backend.messaging.chat.routing import websocket_urlpatterns
+        from backend.messaging.chat.subscriptions import ConnectionUser
+
+        app = URLRouter(websocket_urlpatterns)
+        slots = asyncio.Semaphore(self.options["connect_concurrency"])
+
+        async def connect(index: int, user: User):
+            room = self.rooms[index % len(self.rooms)]
+            client = WebsocketCommunicator(app, f"/ws/chat/{room.id}")
+            # As set by JwtAuthMiddleware
+            client.scope["user"] = ConnectionUser(user)
+            async with slots:
+                connected, _ = await client.connect()
+            if not connected:
+                raise CommandError(f"Client {index} was refused")
+            return client, room.id
+
+        opened = await asyncio.gather(
+            *(connect(index, user) for index, user in enumerate(self.users))
+        )
+        for client, room_id in opened:
+            self.clients.append(client)
+            self.client_rooms.append(room_id)
+            self.room_sizes[room_id] += 1
+
+    def _sender(self, number: int) -> int:
+        return number % len(self.clients)
+
+    async def _send(self) -> int:
+        """Send at the configured rate, on schedule even if the server lags."""
+        rate = self.options["rate"]
+        total = int(rate * self.options["duration"])
+        started = time.perf_counter()
+        for number in range(total):
+            delay = started + number / rate - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            client = self.clients[self._sender(number)]
+            self.sent_at[number] = time.perf_counter()
+            await client.send_to(
+                text_data=codec.dumps({"type": "text", "message": f"lt {number}"})
+            )
+        return total
+
+    async def _drain(self, expected: int) -> None:
+        deadline = time.perf_counter() + self.options["drain"]
+        while len(self.latencies) < expected and time.perf_counter() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def _read(self, client) -> None:
+        # receive_from stops the app on timeout, so wait for as long as the
+        # run may take; readers are cancelled at the end.
+        timeout = self.options["duration"] + self.options["drain"] + 3600
+        while True:
+            frame = codec.loads(await client.receive_from(timeout=timeout))
+            received_at = time.perf_counter()
+            if "error" in frame:
+                self.errors[str(frame["error"])] += 1
+                continue
+            body = frame.get("body")
+            if frame.get("action") != "new" or not isinstance(body, str):
+                continue
+            _prefix, _, number = body.partition(" ")
+            sent_at = self.sent_at.get(int(number)) if number.isdigit() else None
+            if sent_at is not None:
+                self.latencies.append(received_at - sent_at)
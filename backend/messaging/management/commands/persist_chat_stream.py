@@ -0,0 +1,59 @@
+import signal
+import socket
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from prometheus_client import start_http_server
+
+from backend.messaging.chat.ingest import StreamPersister
+
+
+class Command(BaseCommand):
+    help = (
+        "Persist chat messages from the ingestion stream "
+        '(CHAT_INGESTION_MODE="stream") to the database.'
+    )
+
+    def add_arguments(self, parser):
+        config = settings.CHAT_STREAM_PERSISTER
+        parser.add_argument(
+            "--consumer",
+            default=f"{socket.gethostname()}-{config['CONSUMER_INDEX']}",
+            help="Consumer name within the group, by default the host name and "
+            "CHAT_STREAM_PERSISTER_CONSUMER_INDEX. Keep it stable across "
+            "restarts so a worker retries its own unacknowledged entries first.",
+        )
+        parser.add_argument("--batch-size", type=int, default=config["BATCH_SIZE"])
+        parser.add_argument("--block-ms", type=int, default=config["BLOCK_MS"])
+        parser.add_argument(
+            "--metrics-port",
+            type=int,
+            default=0,
+            help="Serve Prometheus metrics on this port (0 disables).",
+        )
+
+    def handle(self, *args, **options):
+        stopping = False
+
+        def stop(signum, frame):
+            nonlocal stopping
+            stopping = True
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        if options["metrics_port"]:
+            start_http_server(options["metrics_port"])
+
+        persister = StreamPersister(
+            options["consumer"],
+            batch_size=options["batch_size"],
+            block_ms=options["block_ms"],
+            min_idle_ms=settings.REDIS_STREAMS["CONSUMER_TIMEOUT"] * 1000,
+        )
+
+        self.stdout.write(
+            f"Persisting {persister.stream} as {persister.group}/{persister.consumer}"
+        )
+        persister.run(lambda: stopping)
+        self.stdout.write("Stopped.")
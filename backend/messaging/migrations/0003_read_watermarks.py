@@ -0,0 +1,32 @@
+# Generated by Django 6.0.4 on 2026-10-17 11:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('access', '0003_initial_permissions'),
+        ('messaging', '0002_initial'),
+        ('room', '0002_room_rate_limits'),
+    ]
+
+    operations = [
+        migrations.DeleteModel(
+            name='MessageStatus',
+        ),
+        migrations.CreateModel(
+            name='ReadWatermark',
+            fields=[
+                ('participant', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='read_watermark', serialize=False, to='access.participant')),
+                ('last_read_at', models.DateTimeField()),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('last_read_message', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='messaging.message')),
+                ('room', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='room.room')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['room', 'last_read_at'], name='messaging_r_room_id_acadb0_idx')],
+            },
+        ),
+    ]
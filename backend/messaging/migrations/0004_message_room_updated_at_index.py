@@ -0,0 +1,17 @@
+# Generated by Django 6.0.4 on 2026-10-17 14:05
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('messaging', '0003_read_watermarks'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='message',
+            index=models.Index(fields=['room', 'updated_at'], name='messaging_m_room_id_b495ea_idx'),
+        ),
+    ]
@@ -3,7 +3,7 @@ from django.conf import settings
 from django.db import models
 from django.core.exceptions import ValidationError
 
-from backend.messaging.choices import MessageStatusChoices
+from backend.messaging.querysets import MessageQuerySet, ReadWatermarkQuerySet
 
 
 class Message(models.Model):
@@ -24,11 +24,15 @@ class Message(models.Model):
             models.Index(fields=["room", "author", "created_at"]),
             models.Index(fields=["room", "created_at"]),
             models.Index(fields=["room", "-created_at"]),
+            # Replays of changes since a point in time
+            models.Index(fields=["room", "updated_at"]),
             models.Index(fields=["author", "created_at"]),
             models.Index(fields=["author"]),
         ]
         ordering = ["-created_at"]
 
+    objects = MessageQuerySet.as_manager()
+
     def __str__(self):
         return self.body[0:50] + ("..." if len(self.body) > 50 else "")
 
@@ -44,35 +48,35 @@ class Message(models.Model):
         return super().save(*args, **kwargs)
 
 
-class MessageStatus(models.Model):
-    Status = MessageStatusChoices
+class ReadWatermark(models.Model):
+    """
+    How far a participant has read a room: everything up to and including
+    `last_read_message` is read. One row per participant, advanced
+    monotonically, so read state grows with participants, not messages.
+    """
 
-    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
-    message = models.ForeignKey(
-        Message, on_delete=models.CASCADE, related_name="statuses"
-    )
-    user = models.ForeignKey(
-        settings.AUTH_USER_MODEL,
+    participant = models.OneToOneField(
+        "access.Participant",
         on_delete=models.CASCADE,
-        related_name="message_statuses",
+        primary_key=True,
+        related_name="read_watermark",
     )
-    status = models.CharField(max_length=16, choices=Status.choices)
-    timestamp = models.DateTimeField(auto_now=True)
+    room = models.ForeignKey("room.Room", on_delete=models.CASCADE)
+    last_read_message = models.ForeignKey(
+        Message, on_delete=models.SET_NULL, null=True, blank=True, related_name="+"
+    )
+    # `created_at` of `last_read_message`, kept so the position survives
+    # deletion of that message.
+    last_read_at = models.DateTimeField()
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         app_label = "messaging"
         indexes = [
-            models.Index(fields=["message", "user"]),
-        ]
-        constraints = [
-            models.UniqueConstraint(
-                fields=["message", "user"], name="unique_message_status_per_user"
-            )
+            models.Index(fields=["room", "last_read_at"]),
         ]
 
-    def __str__(self):
-        return f"Status of message {self.message.id} for user {self.user.username}"
+    objects = ReadWatermarkQuerySet.as_manager()
 
-    def save(self, *args, **kwargs):
-        self.full_clean()
-        super().save(*args, **kwargs)
+    def __str__(self):
+        return f"Read watermark of participant {self.participant_id}"
@@ -0,0 +1,419 @@
+"""
+The path every chat write takes, whatever the transport:
+
+    validate -> persist -> sequence -> stream -> broadcast
+
+`ChatConsumer` uses the async entry points and the GraphQL mutations the
+sync ones, so messages sent over HTTP reach connected clients in real time
+and both transports broadcast identical events. Room events get their room
+sequence number and stream entry in one round trip, see `append_events`.
+"""
+
+import asyncio
+import logging
+import uuid
+from typing import Optional
+
+from asgiref.sync import async_to_sync
+from channels.db import database_sync_to_async
+from channels.layers import get_channel_layer
+from django.conf import settings
+from django.db import transaction
+from redis.exceptions import RedisError
+
+from backend.access.dtos import PermissionSnapshot
+from backend.account.models import User
+from backend.core import codec
+from backend.core.apps import CoreConfig
+from backend.core.exceptions import InternalErrorException
+from backend.core.groups import room_group_name
+from backend.messaging.chat import ingest
+from backend.messaging.chat.fanout import get_fanout
+from backend.messaging.chat.groups import room_seq_key, room_stream_key
+from backend.messaging.chat.metrics import (
+    CHAT_BROADCASTS_TOTAL,
+    CHAT_DB_SECONDS,
+    CHAT_MESSAGE_REDIS_SECONDS,
+    CHAT_REDIS_ERRORS_TOTAL,
+)
+from backend.messaging.chat.streams import aappend_events, append_events
+from backend.messaging.chat.writebehind import get_message_buffer
+from backend.messaging.dtos import BatchAction, BatchOperation, BatchResult
+from backend.messaging.models import Message
+from backend.messaging.services import MessageService
+from backend.room.models import Room
+
+
+logger = logging.getLogger(__name__)
+
+
+# ----------------------------------------------------------------------
+# Publishing
+# ----------------------------------------------------------------------
+
+
+def message_event(action: str, serialized: dict) -> dict:
+    return {"type": "chat_message", "action": action, **serialized}
+
+
+def _stamp(
+    room_id: uuid.UUID,
+    events: list[dict],
+    published: Optional[list[tuple[str, int]]],
+) -> None:
+    for event in events:
+        event["room_id"] = str(room_id)
+    if published is not None:
+        for event, (stream_id, seq) in zip(events, published):
+            event["stream_id"], event["seq"] = stream_id, seq
+
+
+def _channel_event(room_id: uuid.UUID, events: list[dict], batch: bool) -> dict:
+    """
+    The channel layer event relaying `events` to the room's connections.
+
+    The client frame is encoded once here rather than once per recipient.
+    A batch is a single `batch` frame holding all events.
+    """
+    if batch:
+        frame = {
+            "type": "chat_message",
+            "action": "batch",
+            "room_id": str(room_id),
+            "events": events,
+        }
+        key = None
+    else:
+        (frame,) = events
+        # Later edits or a deletion of a message supersede queued edits
+        key = (
+            f"message:{frame['id']}"
+            if frame.get("action") in ("update", "delete")
+            else None
+        )
+
+    return {
+        "type": "chat_message",
+        "text": codec.dumps(frame),
+        "room_id": str(room_id),
+        "stream_id": events[-1].get("stream_id"),
+        "key": key,
+    }
+
+
+async def _aappend(
+    room_id: uuid.UUID, events: list[dict]
+) -> Optional[list[tuple[str, int]]]:
+    try:
+        return await aappend_events(
+            CoreConfig.get_binary_redis_client(),
+            room_stream_key(room_id),
+            room_seq_key(room_id),
+            events,
+        )
+    except TypeError:
+        logger.error("Message data not serializable", exc_info=True)
+    except (RedisError, OSError):
+        logger.error("Error publishing to stream (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="stream_append").inc()
+    return None
+
+
+async def apublish(
+    room_id: uuid.UUID, events: list[dict], *, batch: bool = False
+) -> None:
+    """
+    Sequence, stream and broadcast events of a room.
+
+    Events are stamped with their room, stream ID and room sequence number
+    (`seq`), so clients can resume after a reconnect and detect gaps. The
+    stream append runs concurrently with the fan-out strategy lookup. Large
+    rooms are reached with one pub/sub message per worker instead of one per
+    connection, see `RoomFanout`. If the stream is unavailable the events
+    are broadcast without `seq`.
+    """
+    fanout = get_fanout()
+    with CHAT_MESSAGE_REDIS_SECONDS.labels(stage="append").time():
+        published, large = await asyncio.gather(
+            _aappend(room_id, events), fanout.is_large(room_id)
+        )
+    _stamp(room_id, events, published)
+    channel_event = _channel_event(room_id, events, batch)
+
+    with CHAT_MESSAGE_REDIS_SECONDS.labels(stage="fanout").time():
+        if large:
+            try:
+                await fanout.publish(room_id, channel_event)
+                CHAT_BROADCASTS_TOTAL.labels(strategy="pubsub").inc()
+                return
+            except (RedisError, OSError):
+                logger.warning(
+                    "Pub/sub fan-out failed, using the channel layer", exc_info=True
+                )
+                CHAT_REDIS_ERRORS_TOTAL.labels(operation="pubsub").inc()
+
+        await get_channel_layer().group_send(room_group_name(room_id), channel_event)
+        CHAT_BROADCASTS_TOTAL.labels(strategy="group").inc()
+
+
+def _publish_now(room_id: uuid.UUID, events: list[dict], batch: bool) -> None:
+    published = None
+    try:
+        with CHAT_MESSAGE_REDIS_SECONDS.labels(stage="append").time():
+            published = append_events(
+                CoreConfig.get_sync_binary_redis_client(),
+                room_stream_key(room_id),
+                room_seq_key(room_id),
+                events,
+            )
+    except TypeError:
+        logger.error("Message data not serializable", exc_info=True)
+    except (RedisError, OSError):
+        logger.error("Error publishing to stream (redis unavailable)", exc_info=True)
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="stream_append").inc()
+    _stamp(room_id, events, published)
+
+    channel_layer = get_channel_layer()
+    if channel_layer is None:
+        return
+
+    try:
+        with CHAT_MESSAGE_REDIS_SECONDS.labels(stage="fanout").time():
+            async_to_sync(channel_layer.group_send)(
+                room_group_name(room_id), _channel_event(room_id, events, batch)
+            )
+        CHAT_BROADCASTS_TOTAL.labels(strategy="group").inc()
+    except (RedisError, OSError):
+        logger.warning(
+            "Could not broadcast room events (channel layer unavailable)",
+            exc_info=True,
+        )
+        CHAT_REDIS_ERRORS_TOTAL.labels(operation="group_send").inc()
+
+
+def publish(room_id: uuid.UUID, events: list[dict], *, batch: bool = False) -> None:
+    """
+    `apublish` for sync code, once the surrounding transaction has committed.
+
+    Clients never see writes that roll back. Only chat workers follow the
+    pub/sub fan-out, so large rooms are reached through the channel layer
+    too, which every connection is subscribed to.
+    """
+    transaction.on_commit(lambda: _publish_now(room_id, events, batch))
+
+
+# ----------------------------------------------------------------------
+# Async entry points, for chat connections
+# ----------------------------------------------------------------------
+
+
+async def flush_if_buffered(message_id: uuid.UUID) -> None:
+    """
+    Make sure a message broadcast but not persisted yet is stored, before it
+    is edited or deleted: flush it from the write-behind buffer, or wait for
+    the stream persister.
+    """
+    mode = settings.CHAT_INGESTION_MODE
+    if mode == "write_behind":
+        message_buffer = get_message_buffer()
+        if message_buffer.contains(message_id):
+            await message_buffer.flush()
+    elif mode == "stream":
+        await ingest.await_until_stored([message_id])
+
+
+async def acreate_message(
+    user: User,
+    room: Room,
+    body: str,
+    snapshot: Optional[PermissionSnapshot] = None,
+) -> Message:
+    """
+    Create a message and broadcast it, persisting per CHAT_INGESTION_MODE.
+
+    In the write-behind and stream modes the message is authorized against
+    the snapshot and validated in memory, so no DB round trip is needed
+    before the broadcast.
+
+    Raises:
+        PermissionException: If user doesn't have permission to send messages
+        FormValidationException: If form validation fails
+        ConflictException: If message creation conflicts
+        InternalErrorException: If the message could not be logged for the
+            stream persister; it is not broadcast then
+    """
+    mode = settings.CHAT_INGESTION_MODE
+    if mode in ("write_behind", "stream"):
+        message = MessageService.prepare_message(
+            user=user, room=room, body=body, snapshot=snapshot
+        )
+    else:
+        with CHAT_DB_SECONDS.labels(operation="create").time():
+            message = await MessageService.acreate_message(
+                user=user, room=room, body=body, snapshot=snapshot
+            )
+
+    if mode == "write_behind":
+        get_message_buffer().add(message)
+    elif mode == "stream":
+        try:
+            await ingest.append_message(message)
+        except (RedisError, OSError) as e:
+            logger.error("Error logging message (redis unavailable)", exc_info=True)
+            CHAT_REDIS_ERRORS_TOTAL.labels(operation="ingest").inc()
+            raise InternalErrorException(
+                "Could not send message. Please try again."
+            ) from e
+
+    # The author is the connected user, so this never queries.
+    serialized = await MessageService.aserialize(message)
+    await apublish(room.id, [message_event("new", serialized)])
+    return message
+
+
+async def aupdate_message(
+    user: User,
+    room_id: uuid.UUID,
+    message_id: uuid.UUID,
+    body: str,
+    snapshot: Optional[PermissionSnapshot] = None,
+) -> Message:
+    """
+    Edit a message of a room and broadcast the edit.
+
+    Raises:
+        NotFoundException: If the message doesn't exist in the room
+        PermissionException: If user is not the message author
+        FormValidationException: If form validation fails
+    """
+    await flush_if_buffered(message_id)
+    with CHAT_DB_SECONDS.labels(operation="update").time():
+        message = await MessageService.aupdate_message_by_id(
+            user, message_id, body, room_id=room_id, snapshot=snapshot
+        )
+
+    serialized = await MessageService.aserialize(message)
+    await apublish(room_id, [message_event("update", serialized)])
+    return message
+
+
+async def adelete_message(
+    user: User,
+    room_id: uuid.UUID,
+    message_id: uuid.UUID,
+    snapshot: Optional[PermissionSnapshot] = None,
+) -> None:
+    """
+    Delete a message of a room and broadcast the deletion.
+
+    Raises:
+        NotFoundException: If the message doesn't exist in the room
+        PermissionException: If user doesn't have permission to delete the message
+    """
+    await flush_if_buffered(message_id)
+    with CHAT_DB_SECONDS.labels(operation="delete").time():
+        await MessageService.adelete_message_by_id(
+            user, message_id, room_id=room_id, snapshot=snapshot
+        )
+
+    await apublish(room_id, [message_event("delete", {"id": str(message_id)})])
+
+
+async def aapply_batch(
+    user: User,
+    room: Room,
+    operations: list[BatchOperation],
+    snapshot: Optional[PermissionSnapshot] = None,
+) -> list[BatchResult]:
+    """
+    Apply a batch of operations, see `MessageService.apply_batch`.
+
+    The applied operations are broadcast as a single `batch` event; each
+    still gets its own stream entry and sequence number, so `resume` and
+    replays see them one by one. New messages of a batch are always written
+    directly, whatever the ingestion mode, as the batch is one bulk insert.
+
+    Raises:
+        ConflictException: If writing the batch conflicts
+    """
+    targets = [op.message_id for op in operations if op.message_id is not None]
+    if settings.CHAT_INGESTION_MODE == "stream":
+        await ingest.await_until_stored(targets)
+    else:
+        for message_id in targets:
+            await flush_if_buffered(message_id)
+
+    with CHAT_DB_SECONDS.labels(operation="batch").time():
+        results = await database_sync_to_async(MessageService.apply_batch)(
+            user, room, operations, snapshot=snapshot
+        )
+
+    events = []
+    for result in results:
+        if not result.ok:
+            continue
+        if result.action is BatchAction.DELETE:
+            events.append(message_event("delete", {"id": str(result.message_id)}))
+        else:
+            # Authors are loaded with the targets, so this never queries.
+            serialized = await MessageService.aserialize(result.message)
+            events.append(message_event(result.action.value, serialized))
+
+    if events:
+        await apublish(room.id, events, batch=True)
+    return results
+
+
+# ----------------------------------------------------------------------
+# Sync entry points, for GraphQL mutations
+# ----------------------------------------------------------------------
+
+
+def create_message(user: User, room: Room, body: str) -> Message:
+    """
+    Create a message and broadcast it once committed.
+
+    The message is always inserted right away, whatever CHAT_INGESTION_MODE,
+    as the caller returns the stored message.
+
+    Raises:
+        PermissionException: If user doesn't have permission to send messages
+        FormValidationException: If form validation fails
+        ConflictException: If message creation conflicts
+    """
+    message = MessageService.create_message(user=user, room=room, body=body)
+    publish(room.id, [message_event("new", MessageService.serialize(message))])
+    return message
+
+
+def update_message(user: User, message_id: uuid.UUID, body: str) -> Message:
+    """
+    Edit a message and broadcast the edit once committed.
+
+    Raises:
+        NotFoundException: If the message doesn't exist
+        PermissionException: If user is not the message author
+        FormValidationException: If form validation fails
+    """
+    if settings.CHAT_INGESTION_MODE == "stream":
+        ingest.wait_until_stored([message_id])
+    message = MessageService.update_message_by_id(user, message_id, body)
+    publish(
+        message.room_id, [message_event("update", MessageService.serialize(message))]
+    )
+    return message
+
+
+def delete_message(user: User, message_id: uuid.UUID) -> bool:
+    """
+    Delete a message and broadcast the deletion once committed.
+
+    Raises:
+        NotFoundException: If the message doesn't exist
+        PermissionException: If user doesn't have permission to delete the message
+    """
+    if settings.CHAT_INGESTION_MODE == "stream":
+        ingest.wait_until_stored([message_id])
+    room_id = MessageService.delete_message_by_id(user, message_id)
+    publish(room_id, [message_event("delete", {"id": str(message_id)})])
+    return True
@@ -0,0 +1,55 @@
+import uuid
+from datetime import datetime
+from typing import Optional, Self
+
+from django.db import models
+from django.db.models import Q
+
+
+class MessageQuerySet(models.QuerySet):
+    """Custom QuerySet for Message model."""
+
+    def in_room(self, room_id: uuid.UUID) -> Self:
+        """Filter messages by room ID."""
+        return self.filter(room_id=room_id)
+
+    def with_author(self) -> Self:
+        """Optimize query by selecting related author."""
+        return self.select_related("author")
+
+    def changed_since(self, updated_at: datetime) -> Self:
+        """
+        Messages created or edited at or after a point in time, in
+        `(updated_at, id)` keyset order.
+        """
+        return self.filter(updated_at__gte=updated_at).order_by("updated_at", "id")
+
+    def before_key(self, created_at: datetime, message_id: uuid.UUID) -> Self:
+        """Messages before a `(created_at, id)` keyset position."""
+        return self.filter(
+            Q(created_at__lt=created_at) | Q(id__lt=message_id),
+            created_at__lte=created_at,
+        )
+
+    def after_key(self, created_at: datetime, message_id: uuid.UUID) -> Self:
+        """Messages after a `(created_at, id)` keyset position."""
+        return self.filter(
+            Q(created_at__gt=created_at) | Q(id__gt=message_id),
+            created_at__gte=created_at,
+        )
+
+    def unread_since(self, last_read_at: Optional[datetime]) -> Self:
+        """Messages after a read watermark; all messages if there is none."""
+        if last_read_at is None:
+            return self
+        return self.filter(created_at__gt=last_read_at)
+
+
+class ReadWatermarkQuerySet(models.QuerySet):
+    """Custom QuerySet for ReadWatermark model."""
+
+    def having_read(self, message) -> Self:
+        """Watermarks of the message's room at or past the message."""
+        return self.filter(
+            room_id=message.room_id, last_read_at__gte=message.created_at
+        )
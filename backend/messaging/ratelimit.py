@@ -0,0 +1,51 @@
+from typing import Optional
+
+from django.conf import settings
+
+from backend.core.ratelimit import Quota, TokenBucket, get_rate_limiter
+from backend.room.models import Room
+
+
+def message_quotas(user_id, room: Room) -> list[Quota]:
+    """
+    Shared quotas charged for every message a user posts to a room.
+
+    - per user: `MAX_MESSAGES_PER_SEC` across all rooms and connections
+    - slow mode: one message every `room.slow_mode_seconds` per user
+    - per room: `room.room_messages_per_sec` across all participants
+
+    A limit of 0 disables the corresponding quota.
+    """
+    quotas = []
+
+    if settings.MAX_MESSAGES_PER_SEC > 0:
+        limit = settings.MAX_MESSAGES_PER_SEC
+        quotas.append(Quota(f"rl:user:{user_id}", limit, limit))
+
+    if room.slow_mode_seconds > 0:
+        quotas.append(
+            Quota(f"rl:slow:{room.id}:{user_id}", 1 / room.slow_mode_seconds, 1)
+        )
+
+    if room.room_messages_per_sec > 0:
+        limit = room.room_messages_per_sec
+        quotas.append(Quota(f"rl:room:{room.id}", limit, limit))
+
+    return quotas
+
+
+def connection_bucket(room: Room) -> Optional[TokenBucket]:
+    """In-process bucket for `room.connection_messages_per_sec`, if set."""
+    limit = room.connection_messages_per_sec
+    if limit <= 0:
+        return None
+    return TokenBucket(limit, limit)
+
+
+def allow_message(user_id, room: Room, cost: int = 1) -> bool:
+    """Charge `cost` messages (e.g. a batch) against the message quotas."""
+    return get_rate_limiter().hit(message_quotas(user_id, room), cost)
+
+
+async def aallow_message(user_id, room: Room, cost: int = 1) -> bool:
+    return await get_rate_limiter().ahit(message_quotas(user_id, room), cost)
@@ -0,0 +1,40 @@
+from backend.access.dtos import PermissionSnapshot
+from backend.access.enums import PermissionCode
+from backend.messaging.models import Message
+from backend.messaging.rules.labels import MessagingPermission
+from backend.room.models import Room
+
+
+def snapshot_has_perm(
+    snapshot: PermissionSnapshot,
+    perm: MessagingPermission,
+    obj: Room | Message,
+) -> bool:
+    """
+    In-memory counterpart of the messaging rules for a PermissionSnapshot.
+
+    Mirrors `backend.messaging.rules.permissions` without touching the
+    database. Objects from other rooms are never authorized.
+    """
+    if snapshot.is_blocked:
+        return False
+
+    room_id = obj.id if isinstance(obj, Room) else obj.room_id
+    if room_id != snapshot.room_id:
+        return False
+
+    if snapshot.is_superuser:
+        return True
+
+    match perm:
+        case MessagingPermission.CREATE | MessagingPermission.VIEW:
+            return True
+        case MessagingPermission.UPDATE:
+            return isinstance(obj, Message) and obj.author_id == snapshot.user_id
+        case MessagingPermission.DELETE:
+            return isinstance(obj, Message) and (
+                obj.author_id == snapshot.user_id
+                or snapshot.has_permission(PermissionCode.ROOM_DELETE_MESSAGE)
+            )
+
+    return False
@@ -1,21 +1,70 @@
-from backend.messaging.models import Message
+import uuid
+from datetime import datetime
+from typing import Optional
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db.models import Count, Q, QuerySet
+
+from backend.messaging.models import Message, ReadWatermark
 from backend.account.models import User
 from backend.room.models import Room
+from backend.access.dtos import PermissionSnapshot
 from backend.core.exceptions import (
+    DomainException,
+    FormValidationException,
+    NotFoundException,
     PermissionException,
+    ValidationException,
 )
+from backend.messaging.dtos import (
+    BatchAction,
+    BatchOperation,
+    BatchResult,
+    MessageCursor,
+    MessagePage,
+)
+from backend.messaging.forms import MessageForm
 from backend.messaging.rules.labels import MessagingPermission
+from backend.messaging.rules.snapshot import snapshot_has_perm
 from backend.messaging import actions
 
 
 class MessageService:
     """Service for message mutation operations."""
 
+    @staticmethod
+    def _has_perm(
+        user: User,
+        perm: MessagingPermission,
+        obj: Room | Message,
+        snapshot: Optional[PermissionSnapshot],
+    ) -> bool:
+        """Authorize against the snapshot when given, otherwise the rules backend."""
+        if snapshot is None:
+            return user.has_perm(perm, obj)
+
+        return snapshot_has_perm(snapshot, perm, obj)
+
+    @staticmethod
+    async def _ahas_perm(
+        user: User,
+        perm: MessagingPermission,
+        obj: Room | Message,
+        snapshot: Optional[PermissionSnapshot],
+    ) -> bool:
+        """Async `_has_perm`; only the rules backend fallback leaves the event loop."""
+        if snapshot is None:
+            return await sync_to_async(user.has_perm)(perm, obj)
+
+        return snapshot_has_perm(snapshot, perm, obj)
+
     @staticmethod
     def create_message(
         user: User,
         room: Room,
         body: str,
+        snapshot: Optional[PermissionSnapshot] = None,
     ) -> Message:
         """
         Create a new message in a room.
@@ -24,6 +73,7 @@ class MessageService:
             user: User creating the message (must be a participant of the room)
             room: The room to create the message in
             body: Message content
+            snapshot: Preloaded permission snapshot to authorize against (optional)
 
         Returns:
             The created Message instance
@@ -33,18 +83,83 @@ class MessageService:
             FormValidationException: If form validation fails
             ConflictException: If message creation conflicts
         """
-        if not user.has_perm(MessagingPermission.CREATE, room):
+        if not MessageService._has_perm(
+            user, MessagingPermission.CREATE, room, snapshot
+        ):
             raise PermissionException(
                 "You don't have permission to send messages in this room."
             )
 
         return actions.create_message(user=user, room=room, body=body)
 
+    @staticmethod
+    async def acreate_message(
+        user: User,
+        room: Room,
+        body: str,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> Message:
+        """
+        Async variant of `create_message`.
+
+        Authorization against a snapshot and form validation run on the
+        event loop; only the INSERT goes through the async ORM.
+
+        Raises:
+            PermissionException: If user doesn't have permission to send messages
+            FormValidationException: If form validation fails
+            ConflictException: If message creation conflicts
+        """
+        if not await MessageService._ahas_perm(
+            user, MessagingPermission.CREATE, room, snapshot
+        ):
+            raise PermissionException(
+                "You don't have permission to send messages in this room."
+            )
+
+        return await actions.acreate_message(user=user, room=room, body=body)
+
+    @staticmethod
+    def prepare_message(
+        user: User,
+        room: Room,
+        body: str,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> Message:
+        """
+        Authorize and validate a new message without saving it.
+
+        Used by the write-behind and stream ingestion modes, which persist
+        prepared messages in batches after they have been broadcast.
+
+        Args:
+            user: User creating the message (must be a participant of the room)
+            room: The room to create the message in
+            body: Message content
+            snapshot: Preloaded permission snapshot to authorize against (optional)
+
+        Returns:
+            The unsaved Message instance with its ID and timestamps assigned
+
+        Raises:
+            PermissionException: If user doesn't have permission to send messages
+            FormValidationException: If form validation fails
+        """
+        if not MessageService._has_perm(
+            user, MessagingPermission.CREATE, room, snapshot
+        ):
+            raise PermissionException(
+                "You don't have permission to send messages in this room."
+            )
+
+        return actions.build_message(user=user, room=room, body=body)
+
     @staticmethod
     def update_message(
         user: User,
         message: Message,
         body: str,
+        snapshot: Optional[PermissionSnapshot] = None,
     ) -> Message:
         """
         Update a message.
@@ -53,6 +168,7 @@ class MessageService:
             user: User performing the update (must be the message author)
             message: The message to update
             body: New message content
+            snapshot: Preloaded permission snapshot to authorize against (optional)
 
         Returns:
             The updated Message instance
@@ -62,15 +178,43 @@ class MessageService:
             FormValidationException: If form validation fails
             ConflictException: If update conflicts
         """
-        if not user.has_perm(MessagingPermission.UPDATE, message):
+        if not MessageService._has_perm(
+            user, MessagingPermission.UPDATE, message, snapshot
+        ):
             raise PermissionException("You can only edit your own messages.")
 
         return actions.update_message(message=message, body=body)
 
+    @staticmethod
+    async def aupdate_message(
+        user: User,
+        message: Message,
+        body: str,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> Message:
+        """
+        Async variant of `update_message`.
+
+        `message.parent` is validated on the event loop, so it must be loaded
+        (or unset) beforehand.
+
+        Raises:
+            PermissionException: If user is not the message author
+            FormValidationException: If form validation fails
+            ConflictException: If update conflicts
+        """
+        if not await MessageService._ahas_perm(
+            user, MessagingPermission.UPDATE, message, snapshot
+        ):
+            raise PermissionException("You can only edit your own messages.")
+
+        return await actions.aupdate_message(message=message, body=body)
+
     @staticmethod
     def delete_message(
         user: User,
         message: Message,
+        snapshot: Optional[PermissionSnapshot] = None,
     ) -> bool:
         """
         Delete a message.
@@ -78,6 +222,7 @@ class MessageService:
         Args:
             user: User performing the deletion (must be the author or have delete permission)
             message: The message to delete
+            snapshot: Preloaded permission snapshot to authorize against (optional)
 
         Returns:
             True if deletion was successful
@@ -85,13 +230,533 @@ class MessageService:
         Raises:
             PermissionException: If user doesn't have permission to delete the message
         """
-        if not user.has_perm(MessagingPermission.DELETE, message):
+        if not MessageService._has_perm(
+            user, MessagingPermission.DELETE, message, snapshot
+        ):
             raise PermissionException(
                 "You don't have permission to delete this message."
             )
 
         return actions.delete_message(message=message)
 
+    @staticmethod
+    async def adelete_message(
+        user: User,
+        message: Message,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> bool:
+        """
+        Async variant of `delete_message`.
+
+        Raises:
+            PermissionException: If user doesn't have permission to delete the message
+        """
+        if not await MessageService._ahas_perm(
+            user, MessagingPermission.DELETE, message, snapshot
+        ):
+            raise PermissionException(
+                "You don't have permission to delete this message."
+            )
+
+        return await actions.adelete_message(message=message)
+
+    @staticmethod
+    def _find_message(
+        message_id: uuid.UUID, room_id: Optional[uuid.UUID]
+    ) -> QuerySet[Message]:
+        queryset = Message.objects.with_author().select_related("parent")
+        if room_id is not None:
+            queryset = queryset.in_room(room_id)
+        return queryset.filter(id=message_id)
+
+    @staticmethod
+    def update_message_by_id(
+        user: User,
+        message_id: uuid.UUID,
+        body: str,
+        room_id: Optional[uuid.UUID] = None,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> Message:
+        """
+        Update a message by ID, in one round trip when the user is its author.
+
+        Falls back to loading the message and `update_message` when the
+        single-statement edit doesn't match, to raise the precise error.
+
+        Args:
+            user: User performing the update (must be the message author)
+            message_id: ID of the message to update
+            body: New message content
+            room_id: Room the message must belong to (optional)
+            snapshot: Preloaded permission snapshot to authorize against (optional)
+
+        Returns:
+            The updated Message instance
+
+        Raises:
+            NotFoundException: If the message doesn't exist (in the room)
+            PermissionException: If user is not the message author
+            FormValidationException: If form validation fails
+        """
+        message = actions.update_message_as_author(
+            message_id=message_id, user=user, body=body, room_id=room_id
+        )
+        if message is not None:
+            return message
+
+        message = MessageService._find_message(message_id, room_id).first()
+        if message is None:
+            raise NotFoundException("Message not found.")
+
+        return MessageService.update_message(user, message, body, snapshot=snapshot)
+
+    @staticmethod
+    async def aupdate_message_by_id(
+        user: User,
+        message_id: uuid.UUID,
+        body: str,
+        room_id: Optional[uuid.UUID] = None,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> Message:
+        """
+        Async variant of `update_message_by_id`.
+
+        Raises:
+            NotFoundException: If the message doesn't exist (in the room)
+            PermissionException: If user is not the message author
+            FormValidationException: If form validation fails
+        """
+        message = await sync_to_async(actions.update_message_as_author)(
+            message_id=message_id, user=user, body=body, room_id=room_id
+        )
+        if message is not None:
+            return message
+
+        message = await MessageService._find_message(message_id, room_id).afirst()
+        if message is None:
+            raise NotFoundException("Message not found.")
+
+        return await MessageService.aupdate_message(
+            user, message, body, snapshot=snapshot
+        )
+
+    @staticmethod
+    def delete_message_by_id(
+        user: User,
+        message_id: uuid.UUID,
+        room_id: Optional[uuid.UUID] = None,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> uuid.UUID:
+        """
+        Delete a message by ID, in one round trip when the user may delete it.
+
+        Falls back to loading the message and `delete_message` when the
+        single-statement delete doesn't match, to raise the precise error
+        (or to cascade to replies).
+
+        Args:
+            user: User performing the deletion (must be the author or have delete permission)
+            message_id: ID of the message to delete
+            room_id: Room the message must belong to (optional)
+            snapshot: Preloaded permission snapshot to authorize against (optional)
+
+        Returns:
+            The room ID of the deleted message
+
+        Raises:
+            NotFoundException: If the message doesn't exist (in the room)
+            PermissionException: If user doesn't have permission to delete the message
+        """
+        deleted_from = actions.delete_message_if_permitted(
+            message_id=message_id, user=user, room_id=room_id
+        )
+        if deleted_from is not None:
+            return deleted_from
+
+        message = MessageService._find_message(message_id, room_id).first()
+        if message is None:
+            raise NotFoundException("Message not found.")
+
+        MessageService.delete_message(user, message, snapshot=snapshot)
+        return message.room_id
+
+    @staticmethod
+    async def adelete_message_by_id(
+        user: User,
+        message_id: uuid.UUID,
+        room_id: Optional[uuid.UUID] = None,
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> uuid.UUID:
+        """
+        Async variant of `delete_message_by_id`.
+
+        Raises:
+            NotFoundException: If the message doesn't exist (in the room)
+            PermissionException: If user doesn't have permission to delete the message
+        """
+        deleted_from = await sync_to_async(actions.delete_message_if_permitted)(
+            message_id=message_id, user=user, room_id=room_id
+        )
+        if deleted_from is not None:
+            return deleted_from
+
+        message = await MessageService._find_message(message_id, room_id).afirst()
+        if message is None:
+            raise NotFoundException("Message not found.")
+
+        await MessageService.adelete_message(user, message, snapshot=snapshot)
+        return message.room_id
+
+    @staticmethod
+    def apply_batch(
+        user: User,
+        room: Room,
+        operations: list[BatchOperation],
+        snapshot: Optional[PermissionSnapshot] = None,
+    ) -> list[BatchResult]:
+        """
+        Apply many message operations in a room with a handful of queries.
+
+        Targets of updates and deletions are loaded with one query, then each
+        operation is authorized and validated in memory. Rejected operations
+        are reported in their result and don't affect the others; the
+        accepted ones are written in one transaction, see
+        `actions.write_message_batch`. Operations apply in order, so an
+        operation on a message deleted earlier in the batch is not found.
+
+        Args:
+            user: User performing the operations
+            room: The room every operation applies to
+            operations: The operations, in order
+            snapshot: Preloaded permission snapshot to authorize against (optional)
+
+        Returns:
+            One result per operation, in order
+
+        Raises:
+            ConflictException: If writing the batch conflicts
+        """
+        target_ids = {op.message_id for op in operations if op.message_id}
+        targets = {
+            message.id: message
+            for message in MessageService._find_messages(target_ids, room.id)
+        }
+        can_create = any(
+            op.action is BatchAction.NEW for op in operations
+        ) and MessageService._has_perm(user, MessagingPermission.CREATE, room, snapshot)
+
+        created: list[Message] = []
+        updated: dict[uuid.UUID, Message] = {}
+        deleted: list[uuid.UUID] = []
+        results = []
+
+        for index, op in enumerate(operations):
+            result = BatchResult(index=index, action=op.action)
+            try:
+                message = MessageService._stage_batch_operation(
+                    user, room, op, targets, can_create, snapshot
+                )
+            except FormValidationException as e:
+                result.error, result.errors = str(e), e.errors
+            except DomainException as e:
+                result.error = str(e)
+            else:
+                result.message_id = message.id
+                if op.action is BatchAction.NEW:
+                    created.append(message)
+                    result.message = message
+                elif op.action is BatchAction.UPDATE:
+                    updated[message.id] = message
+                    result.message = message
+                else:
+                    del targets[message.id]
+                    updated.pop(message.id, None)
+                    deleted.append(message.id)
+            results.append(result)
+
+        actions.write_message_batch(created, list(updated.values()), deleted)
+        return results
+
+    @staticmethod
+    def _find_messages(
+        message_ids: set[uuid.UUID], room_id: uuid.UUID
+    ) -> QuerySet[Message]:
+        if not message_ids:
+            return Message.objects.none()
+        return (
+            Message.objects.in_room(room_id)
+            .with_author()
+            .select_related("parent")
+            .filter(id__in=message_ids)
+        )
+
+    @staticmethod
+    def _stage_batch_operation(
+        user: User,
+        room: Room,
+        op: BatchOperation,
+        targets: dict[uuid.UUID, Message],
+        can_create: bool,
+        snapshot: Optional[PermissionSnapshot],
+    ) -> Message:
+        """Authorize and validate one batch operation, returns its message."""
+        if op.action is BatchAction.NEW:
+            if not can_create:
+                raise PermissionException(
+                    "You don't have permission to send messages in this room."
+                )
+            return actions.build_message(user=user, room=room, body=op.body)
+
+        message = targets.get(op.message_id)
+        if message is None:
+            raise NotFoundException("Message not found.")
+
+        if op.action is BatchAction.DELETE:
+            if not MessageService._has_perm(
+                user, MessagingPermission.DELETE, message, snapshot
+            ):
+                raise PermissionException(
+                    "You don't have permission to delete this message."
+                )
+            return message
+
+        if not MessageService._has_perm(
+            user, MessagingPermission.UPDATE, message, snapshot
+        ):
+            raise PermissionException("You can only edit your own messages.")
+
+        form = MessageForm(data={"body": op.body}, instance=message)
+        if not form.is_valid():
+            raise FormValidationException("Invalid message data", errors=form.errors)
+        return form.save(commit=False)
+
+    @staticmethod
+    def get_unread_count(user: User, room: Room) -> int:
+        """
+        Count messages in a room the user hasn't read yet.
+
+        Args:
+            user: The reader
+            room: The room
+
+        Returns:
+            Number of messages by others past the user's read watermark
+        """
+        watermark = ReadWatermark.objects.filter(
+            participant__user=user, room=room
+        ).first()
+
+        return (
+            Message.objects.in_room(room.id)
+            .unread_since(watermark.last_read_at if watermark else None)
+            .exclude(author=user)
+            .count()
+        )
+
+    @staticmethod
+    def get_unread_counts(user: User, rooms: list[Room]) -> dict[uuid.UUID, int]:
+        """
+        Count unread messages in several rooms with one query per kind.
+
+        Args:
+            user: The reader
+            rooms: The rooms
+
+        Returns:
+            Room ID -> number of messages by others past the user's read
+            watermark, as `get_unread_count`
+        """
+        room_ids = [room.id for room in rooms]
+        if not room_ids:
+            return {}
+
+        watermarks = dict(
+            ReadWatermark.objects.filter(
+                participant__user=user, room_id__in=room_ids
+            ).values_list("room_id", "last_read_at")
+        )
+        unread = Q()
+        for room_id in room_ids:
+            last_read_at = watermarks.get(room_id)
+            if last_read_at is None:
+                unread |= Q(room_id=room_id)
+            else:
+                unread |= Q(room_id=room_id, created_at__gt=last_read_at)
+
+        counts = dict(
+            Message.objects.filter(unread)
+            .exclude(author=user)
+            .order_by()
+            .values("room_id")
+            .annotate(count=Count("id"))
+            .values_list("room_id", "count")
+        )
+        return {room_id: counts.get(room_id, 0) for room_id in room_ids}
+
+    @staticmethod
+    def get_seen_by_many(messages: list[Message]) -> dict[uuid.UUID, list[User]]:
+        """
+        Get the readers of several messages with one query per kind.
+
+        Args:
+            messages: The messages
+
+        Returns:
+            Message ID -> users other than the author whose read watermark
+            reached the message, as `get_seen_by`
+        """
+        if not messages:
+            return {}
+
+        watermarks = ReadWatermark.objects.filter(
+            room_id__in={message.room_id for message in messages},
+            last_read_at__gte=min(message.created_at for message in messages),
+        ).values_list("room_id", "participant__user_id", "last_read_at")
+
+        readers: dict[uuid.UUID, list[tuple[uuid.UUID, datetime]]] = {}
+        for room_id, user_id, last_read_at in watermarks:
+            readers.setdefault(room_id, []).append((user_id, last_read_at))
+        users = User.objects.in_bulk(
+            {user_id for room in readers.values() for user_id, _ in room}
+        )
+
+        return {
+            message.id: [
+                users[user_id]
+                for user_id, last_read_at in readers.get(message.room_id, [])
+                if last_read_at >= message.created_at
+                and user_id != message.author_id
+                and user_id in users
+            ]
+            for message in messages
+        }
+
+    @staticmethod
+    def get_seen_by(message: Message) -> QuerySet[User]:
+        """
+        Get the participants who have read a message.
+
+        Args:
+            message: The message
+
+        Returns:
+            Users other than the author whose read watermark reached the message
+        """
+        readers = ReadWatermark.objects.having_read(message).values(
+            "participant__user_id"
+        )
+
+        return User.objects.filter(id__in=readers).exclude(id=message.author_id)
+
+    @staticmethod
+    def get_history(
+        room: Room,
+        first: Optional[int] = None,
+        after: Optional[str] = None,
+        last: Optional[int] = None,
+        before: Optional[str] = None,
+        around: Optional[uuid.UUID] = None,
+    ) -> MessagePage:
+        """
+        Get a page of a room's messages, Relay connection style.
+
+        Pages are read by keyset on `(created_at, id)`, so each one costs a
+        bounded index range scan however long the history is. `first`/`after`
+        pages forward from the oldest message, `last`/`before` backward from
+        the newest; with neither, the newest messages are returned.
+
+        Args:
+            room: The room
+            first: Number of messages after `after`
+            after: Cursor to page forward from
+            last: Number of messages before `before`
+            before: Cursor to page backward from
+            around: Message to center a page of `first` messages on, e.g. to
+                jump to a message
+
+        Returns:
+            The messages, oldest first, and whether there are more either side
+
+        Raises:
+            ValidationException: If the arguments or cursors are invalid
+            NotFoundException: If the `around` message is not in the room
+        """
+        if first is not None and last is not None:
+            raise ValidationException("Pass either first or last, not both.")
+        size = MessageService._page_size(first if last is None else last)
+        messages = Message.objects.in_room(room.id).with_author()
+
+        if around is not None:
+            if after is not None or before is not None or last is not None:
+                raise ValidationException("around can only be combined with first.")
+            return MessageService._history_around(messages, around, size)
+
+        after_key = MessageService._decode_cursor(after)
+        before_key = MessageService._decode_cursor(before)
+        if after_key is not None:
+            messages = messages.after_key(after_key.created_at, after_key.id)
+        if before_key is not None:
+            messages = messages.before_key(before_key.created_at, before_key.id)
+
+        if first is not None:
+            page = list(messages.order_by("created_at", "id")[: size + 1])
+            return MessagePage(
+                messages=page[:size],
+                has_previous_page=after_key is not None,
+                has_next_page=len(page) > size,
+            )
+
+        page = list(messages.order_by("-created_at", "-id")[: size + 1])
+        return MessagePage(
+            messages=page[:size][::-1],
+            has_previous_page=len(page) > size,
+            has_next_page=before_key is not None,
+        )
+
+    @staticmethod
+    def _history_around(
+        messages: QuerySet[Message], anchor_id: uuid.UUID, size: int
+    ) -> MessagePage:
+        """A page of `size` messages with the anchor in the middle."""
+        anchor = messages.filter(id=anchor_id).first()
+        if anchor is None:
+            raise NotFoundException("Message not found.")
+
+        older_count = (size - 1) // 2
+        newer_count = size - 1 - older_count
+        older = list(
+            messages.before_key(anchor.created_at, anchor.id).order_by(
+                "-created_at", "-id"
+            )[: older_count + 1]
+        )
+        newer = list(
+            messages.after_key(anchor.created_at, anchor.id).order_by(
+                "created_at", "id"
+            )[: newer_count + 1]
+        )
+        return MessagePage(
+            messages=older[:older_count][::-1] + [anchor] + newer[:newer_count],
+            has_previous_page=len(older) > older_count,
+            has_next_page=len(newer) > newer_count,
+        )
+
+    @staticmethod
+    def _page_size(requested: Optional[int]) -> int:
+        if requested is None:
+            return settings.MESSAGE_HISTORY_PAGE_SIZE
+        if requested < 1:
+            raise ValidationException("Page size must be at least 1.")
+        return min(requested, settings.MESSAGE_HISTORY_MAX_PAGE_SIZE)
+
+    @staticmethod
+    def _decode_cursor(cursor: Optional[str]) -> Optional[MessageCursor]:
+        if cursor is None:
+            return None
+        try:
+            return MessageCursor.decode(cursor)
+        except ValueError:
+            raise ValidationException("Invalid cursor.")
+
     @staticmethod
     def serialize(message: Message) -> dict:
         """
@@ -101,17 +766,34 @@ class MessageService:
             message: The message to serialize
 
         Returns:
-            Dictionary representation of the message
+            Dictionary representation of the message. IDs and times are left
+            as UUIDs and datetimes for `backend.core.codec` to encode.
         """
         return {
-            "id": str(message.id),
+            "id": message.id,
             "author": message.author.username,
-            "author_id": str(message.author.id),
+            "author_id": message.author_id,
             "body": message.body,
             "is_edited": message.is_edited,
-            "created_at": message.created_at.isoformat(),
-            "updated_at": message.updated_at.isoformat(),
+            "created_at": message.created_at,
+            "updated_at": message.updated_at,
             "author_avatar": (
                 message.author.avatar.name if message.author.avatar else None
             ),
         }
+
+    @staticmethod
+    async def aserialize(message: Message) -> dict:
+        """
+        Async variant of `serialize`, loading the author if it isn't cached.
+
+        Args:
+            message: The message to serialize
+
+        Returns:
+            Dictionary representation of the message
+        """
+        if not Message.author.is_cached(message):
+            message.author = await User.objects.aget(id=message.author_id)
+
+        return MessageService.serialize(message)
@@ -0,0 +1,180 @@
+import uuid
+from datetime import timedelta
+
+import pytest
+from django.utils.timezone import now
+
+from backend.core.tests.service_base import ServiceTestBase
+from backend.messaging.chat.groups import ingest_pending_key
+from backend.messaging.chat.ingest import StreamPersister, encode_entry
+from backend.messaging.models import Message
+
+
+pytestmark = pytest.mark.unit
+
+
+class FakeStreamRedis:
+    """Single-group stream fake for the consumer group commands of StreamPersister."""
+
+    def __init__(self):
+        self.entries: list[tuple[str, dict]] = []
+        self.pending: dict[str, str] = {}
+        self.delivered = 0
+        self.trimmed_to = None
+        self.deleted: list[str] = []
+
+    def add(self, fields: dict) -> str:
+        entry_id = f"{len(self.entries) + 1}-0"
+        self.entries.append((entry_id, fields))
+        return entry_id
+
+    def xgroup_create(self, stream, group, id="$", mkstream=False):
+        return True
+
+    def xreadgroup(self, group, consumer, streams, count=None, block=None):
+        ((stream, last_id),) = streams.items()
+        if last_id == ">":
+            entries = self.entries[self.delivered : self.delivered + count]
+            self.delivered += len(entries)
+            for entry_id, _fields in entries:
+                self.pending[entry_id] = consumer
+        else:
+            entries = [
+                entry
+                for entry in self.entries
+                if self.pending.get(entry[0]) == consumer
+            ][:count]
+        return [[stream, entries]] if entries else []
+
+    def xautoclaim(self, stream, group, consumer, min_idle_time, start_id, count):
+        entries = [
+            entry
+            for entry in self.entries
+            if self.pending.get(entry[0]) not in (None, consumer)
+        ][:count]
+        for entry_id, _fields in entries:
+            self.pending[entry_id] = consumer
+        return ["0-0", entries, []]
+
+    def xack(self, stream, group, *entry_ids):
+        acked = [self.pending.pop(entry_id, None) for entry_id in entry_ids]
+        return sum(consumer is not None for consumer in acked)
+
+    def xpending(self, stream, group):
+        pending = sorted(self.pending, key=lambda entry_id: int(entry_id.split("-")[0]))
+        return {
+            "pending": len(pending),
+            "min": pending[0] if pending else None,
+            "max": pending[-1] if pending else None,
+            "consumers": [],
+        }
+
+    def xtrim(self, stream, minid=None, approximate=True):
+        self.trimmed_to = minid
+
+    def delete(self, *keys):
+        self.deleted.extend(keys)
+        return len(keys)
+
+
+class StreamPersisterTest(ServiceTestBase):
+    def setUp(self):
+        super().setUp()
+        self.redis = FakeStreamRedis()
+        self.persister = self._persister("worker-1")
+
+    def _persister(self, consumer: str) -> StreamPersister:
+        return StreamPersister(
+            consumer, batch_size=10, block_ms=0, min_idle_ms=0, client=self.redis
+        )
+
+    def _log(self, body: str, created_at=None) -> Message:
+        created_at = created_at or now()
+        message = Message(
+            id=uuid.uuid4(),
+            author=self.owner,
+            room=self.room,
+            body=body,
+            created_at=created_at,
+            updated_at=created_at,
+        )
+        self.redis.add(encode_entry(message))
+        return message
+
+    def test_process_inserts_batch_keeping_timestamps(self):
+        created_at = now() - timedelta(minutes=5)
+        first = self._log("first", created_at=created_at)
+        second = self._log("second")
+
+        processed = self.persister.process(self.persister.read_new())
+
+        self.assertEqual(processed, 2)
+        stored = Message.objects.get(id=first.id)
+        self.assertEqual(stored.body, "first")
+        self.assertEqual(stored.author_id, self.owner.id)
+        self.assertEqual(stored.created_at, created_at)
+        self.assertTrue(Message.objects.filter(id=second.id).exists())
+        self.assertEqual(self.redis.pending, {})
+        self.assertEqual(self.redis.trimmed_to, "2-0")
+        # Edits waiting for these messages may go ahead
+        self.assertEqual(
+            self.redis.deleted,
+            [ingest_pending_key(first.id), ingest_pending_key(second.id)],
+        )
+
+    def test_redelivered_entry_is_not_duplicated(self):
+        message = self._log("once")
+        entries = self.persister.read_new()
+
+        self.persister.process(entries)
+        self.persister.process(entries)
+
+        self.assertEqual(Message.objects.filter(id=message.id).count(), 1)
+
+    def test_malformed_entry_is_acknowledged_and_dropped(self):
+        self.redis.add({"body": "no ids"})
+        message = self._log("valid")
+
+        self.persister.process(self.persister.read_new())
+
+        self.assertEqual(Message.objects.count(), 1)
+        self.assertTrue(Message.objects.filter(id=message.id).exists())
+        self.assertEqual(self.redis.pending, {})
+
+    def test_entry_of_deleted_room_is_skipped(self):
+        message = self._log("orphan")
+        self.room.delete()
+
+        self.persister.process(self.persister.read_new())
+
+        self.assertFalse(Message.objects.filter(id=message.id).exists())
+        self.assertEqual(self.redis.pending, {})
+
+    def test_trim_keeps_entries_pending_elsewhere(self):
+        self._log("held")
+        self._persister("worker-2").read_new()
+        self._log("processed")
+
+        self.persister.process(self.persister.read_new())
+
+        self.assertEqual(self.redis.trimmed_to, "1-0")
+
+    def test_stale_entries_of_other_consumer_are_claimed(self):
+        message = self._log("abandoned")
+        self._persister("worker-2").read_new()
+
+        self.persister.process(self.persister.claim_stale())
+
+        self.assertTrue(Message.objects.filter(id=message.id).exists())
+        self.assertEqual(self.redis.pending, {})
+
+    def test_run_retries_own_pending_entries_first(self):
+        message = self._log("unacked")
+        self.persister.read_new()
+        restarted = self._persister("worker-1")
+        calls = iter([False, False])
+
+        restarted.run(lambda: next(calls, True))
+
+        self.assertTrue(Message.objects.filter(id=message.id).exists())
+        self.assertEqual(self.redis.pending, {})
@@ -1,12 +1,20 @@
+import uuid
+
 import pytest
+from asgiref.sync import sync_to_async
 
+from backend.access.models import Participant
 from backend.core.exceptions import (
     FormValidationException,
+    NotFoundException,
     PermissionException,
     ValidationException,
 )
-from backend.messaging.models import Message
+from backend.messaging import actions
+from backend.messaging.dtos import BatchAction, BatchOperation, MessageCursor
+from backend.messaging.models import Message, ReadWatermark
 from backend.messaging.services import MessageService
+from backend.access.services import RoleService
 from backend.core.tests.service_base import ServiceTestBase
 
 
@@ -124,3 +132,317 @@ class MessageServiceTest(ServiceTestBase):
         self.assertEqual(serialized["author"], self.member.username)
         self.assertIn("id", serialized)
         self.assertIn("created_at", serialized)
+
+    def test_delete_message_with_snapshot(self):
+        self._add_member(self.member, self.member_role)
+        self._add_member(self.other_user, self.member_role)
+
+        message = MessageService.create_message(
+            user=self.member, room=self.room, body="Test message"
+        )
+
+        other_snapshot = RoleService.get_permission_snapshot(
+            self.other_user, self.room.id
+        )
+        with self.assertRaises(PermissionException):
+            MessageService.delete_message(
+                self.other_user, message, snapshot=other_snapshot
+            )
+
+        owner_snapshot = RoleService.get_permission_snapshot(self.owner, self.room.id)
+        self.assertTrue(
+            MessageService.delete_message(self.owner, message, snapshot=owner_snapshot)
+        )
+
+    def test_update_message_snapshot_from_other_room(self):
+        self._add_member(self.member, self.member_role)
+
+        message = MessageService.create_message(
+            user=self.member, room=self.room, body="Test message"
+        )
+        foreign_snapshot = RoleService.get_permission_snapshot(
+            self.member, self.room.id
+        ).model_copy(update={"room_id": uuid.uuid4()})
+
+        with self.assertRaises(PermissionException):
+            MessageService.update_message(
+                user=self.member,
+                message=message,
+                body="Moved",
+                snapshot=foreign_snapshot,
+            )
+
+    def test_read_watermark_drives_unread_count_and_seen_by(self):
+        reader = self._add_member(self.member, self.member_role)
+        first = MessageService.create_message(
+            user=self.owner, room=self.room, body="First"
+        )
+        second = MessageService.create_message(
+            user=self.owner, room=self.room, body="Second"
+        )
+
+        self.assertEqual(MessageService.get_unread_count(self.member, self.room), 2)
+
+        actions.advance_read_watermarks({reader.id: first.id})
+
+        self.assertEqual(MessageService.get_unread_count(self.member, self.room), 1)
+        self.assertEqual(list(MessageService.get_seen_by(first)), [self.member])
+        self.assertEqual(list(MessageService.get_seen_by(second)), [])
+
+    def test_unread_counts_and_seen_by_are_batched(self):
+        reader = self._add_member(self.member, self.member_role)
+        messages = [
+            MessageService.create_message(user=self.owner, room=self.room, body=b)
+            for b in ("First", "Second", "Third")
+        ]
+        actions.advance_read_watermarks({reader.id: messages[1].id})
+
+        with self.assertNumQueries(2):
+            counts = MessageService.get_unread_counts(self.member, [self.room])
+        with self.assertNumQueries(2):
+            seen_by = MessageService.get_seen_by_many(messages)
+
+        self.assertEqual(counts, {self.room.id: 1})
+        self.assertEqual(
+            [seen_by[message.id] for message in messages],
+            [[self.member], [self.member], []],
+        )
+
+    def test_read_ack_of_unstored_message_is_returned_for_retry(self):
+        reader = self._add_member(self.member, self.member_role)
+
+        unresolved = actions.advance_read_watermarks({reader.id: uuid.uuid4()})
+
+        self.assertEqual(unresolved, [reader.id])
+        self.assertFalse(ReadWatermark.objects.filter(participant=reader).exists())
+
+    def test_read_watermark_never_moves_backwards(self):
+        reader = self._add_member(self.member, self.member_role)
+        first = MessageService.create_message(
+            user=self.owner, room=self.room, body="First"
+        )
+        second = MessageService.create_message(
+            user=self.owner, room=self.room, body="Second"
+        )
+
+        actions.advance_read_watermarks({reader.id: second.id})
+        actions.advance_read_watermarks({reader.id: first.id})
+
+        watermark = ReadWatermark.objects.get(participant=reader)
+        self.assertEqual(watermark.last_read_message_id, second.id)
+        self.assertEqual(MessageService.get_unread_count(self.member, self.room), 0)
+
+    async def test_async_create_update_delete_with_snapshot(self):
+        await Participant.objects.acreate(
+            user=self.member, room=self.room, role=self.member_role
+        )
+        snapshot = await sync_to_async(RoleService.get_permission_snapshot)(
+            self.member, self.room.id
+        )
+
+        message = await MessageService.acreate_message(
+            self.member, self.room, "Async message", snapshot=snapshot
+        )
+        updated = await MessageService.aupdate_message(
+            self.member, message, "Edited", snapshot=snapshot
+        )
+        serialized = await MessageService.aserialize(updated)
+
+        self.assertEqual(serialized["body"], "Edited")
+        self.assertTrue(serialized["is_edited"])
+        self.assertEqual(serialized["author"], self.member.username)
+
+        self.assertTrue(
+            await MessageService.adelete_message(
+                self.member, updated, snapshot=snapshot
+            )
+        )
+        self.assertFalse(await Message.objects.filter(id=message.id).aexists())
+
+    async def test_async_update_message_not_author(self):
+        message = await sync_to_async(MessageService.create_message)(
+            user=self.owner, room=self.room, body="Owner message"
+        )
+        await Participant.objects.acreate(
+            user=self.member, room=self.room, role=self.member_role
+        )
+
+        with self.assertRaises(PermissionException):
+            await MessageService.aupdate_message(self.member, message, "Hijacked")
+
+    def test_update_message_by_id_single_statement_for_author(self):
+        self._add_member(self.member, self.member_role)
+        message = MessageService.create_message(
+            user=self.member, room=self.room, body="Original"
+        )
+
+        with self.assertNumQueries(1):
+            updated = MessageService.update_message_by_id(
+                self.member, message.id, "Edited", room_id=self.room.id
+            )
+
+        self.assertEqual(updated.body, "Edited")
+        self.assertTrue(updated.is_edited)
+        message.refresh_from_db()
+        self.assertEqual(message.body, "Edited")
+
+    def test_update_message_by_id_falls_back_to_detailed_errors(self):
+        self._add_member(self.member, self.member_role)
+        message = MessageService.create_message(
+            user=self.owner, room=self.room, body="Owner message"
+        )
+
+        with self.assertRaises(PermissionException):
+            MessageService.update_message_by_id(self.member, message.id, "Hijacked")
+
+        with self.assertRaises(NotFoundException):
+            MessageService.update_message_by_id(self.member, uuid.uuid4(), "Missing")
+
+    def test_delete_message_by_id_with_room_permission(self):
+        self._add_member(self.member, self.member_role)
+        message = MessageService.create_message(
+            user=self.member, room=self.room, body="Member message"
+        )
+        reader = Participant.objects.get(user=self.owner, room=self.room)
+        actions.advance_read_watermarks({reader.id: message.id})
+
+        with self.assertNumQueries(1):
+            self.assertEqual(
+                MessageService.delete_message_by_id(self.owner, message.id),
+                self.room.id,
+            )
+
+        self.assertFalse(Message.objects.filter(id=message.id).exists())
+        watermark = ReadWatermark.objects.get(participant=reader)
+        self.assertIsNone(watermark.last_read_message_id)
+
+    def test_delete_message_by_id_not_permitted(self):
+        self._add_member(self.member, self.member_role)
+        message = MessageService.create_message(
+            user=self.owner, room=self.room, body="Owner message"
+        )
+
+        with self.assertRaises(PermissionException):
+            MessageService.delete_message_by_id(self.member, message.id)
+
+        self.assertTrue(Message.objects.filter(id=message.id).exists())
+
+    def test_apply_batch_reports_results_per_operation(self):
+        self._add_member(self.member, self.member_role)
+        own = MessageService.create_message(
+            user=self.member, room=self.room, body="Mine"
+        )
+        owners = MessageService.create_message(
+            user=self.owner, room=self.room, body="Owner message"
+        )
+        snapshot = RoleService.get_permission_snapshot(self.member, self.room.id)
+
+        results = MessageService.apply_batch(
+            self.member,
+            self.room,
+            [
+                BatchOperation(action=BatchAction.NEW, body="Imported"),
+                BatchOperation(action=BatchAction.NEW, body=""),
+                BatchOperation(
+                    action=BatchAction.UPDATE, message_id=own.id, body="Edited"
+                ),
+                BatchOperation(
+                    action=BatchAction.UPDATE, message_id=owners.id, body="Hijacked"
+                ),
+                BatchOperation(action=BatchAction.DELETE, message_id=own.id),
+                BatchOperation(
+                    action=BatchAction.UPDATE, message_id=own.id, body="Too late"
+                ),
+            ],
+            snapshot=snapshot,
+        )
+
+        self.assertEqual(
+            [result.ok for result in results], [True, False, True, False, True, False]
+        )
+        self.assertIsNotNone(results[1].errors)
+        self.assertEqual(results[3].error, "You can only edit your own messages.")
+        self.assertEqual(results[5].error, "Message not found.")
+        self.assertTrue(
+            Message.objects.filter(id=results[0].message_id, body="Imported").exists()
+        )
+        self.assertFalse(Message.objects.filter(id=own.id).exists())
+        owners.refresh_from_db()
+        self.assertEqual(owners.body, "Owner message")
+
+    def test_apply_batch_uses_bulk_queries(self):
+        self._add_member(self.member, self.member_role)
+        messages = [
+            MessageService.create_message(user=self.member, room=self.room, body=b)
+            for b in ("one", "two")
+        ]
+        snapshot = RoleService.get_permission_snapshot(self.member, self.room.id)
+        operations = [
+            BatchOperation(action=BatchAction.NEW, body=f"new {i}") for i in range(5)
+        ] + [
+            BatchOperation(
+                action=BatchAction.UPDATE, message_id=message.id, body="Edited"
+            )
+            for message in messages
+        ]
+
+        # Load targets, then a transaction with one INSERT and one UPDATE
+        with self.assertNumQueries(5):
+            results = MessageService.apply_batch(
+                self.member, self.room, operations, snapshot=snapshot
+            )
+
+        self.assertTrue(all(result.ok for result in results))
+        self.assertEqual(
+            Message.objects.filter(room=self.room, is_edited=True).count(), 2
+        )
+
+    def _history(self, count: int) -> list[Message]:
+        return [
+            Message.objects.create(author=self.owner, room=self.room, body=f"m{i}")
+            for i in range(count)
+        ]
+
+    def test_get_history_pages_backward_from_newest(self):
+        history = self._history(5)
+
+        newest = MessageService.get_history(self.room, last=2)
+        older = MessageService.get_history(
+            self.room, last=2, before=MessageCursor.of(newest.messages[0]).encode()
+        )
+
+        self.assertEqual(newest.messages, history[3:])
+        self.assertTrue(newest.has_previous_page)
+        self.assertFalse(newest.has_next_page)
+        self.assertEqual(older.messages, history[1:3])
+        self.assertTrue(older.has_next_page)
+
+    def test_get_history_pages_forward_by_cursor(self):
+        history = self._history(4)
+
+        page = MessageService.get_history(
+            self.room, first=2, after=MessageCursor.of(history[0]).encode()
+        )
+
+        self.assertEqual(page.messages, history[1:3])
+        self.assertTrue(page.has_previous_page)
+        self.assertTrue(page.has_next_page)
+
+    def test_get_history_around_message(self):
+        history = self._history(7)
+
+        page = MessageService.get_history(self.room, first=3, around=history[3].id)
+        edge = MessageService.get_history(self.room, first=3, around=history[0].id)
+
+        self.assertEqual(page.messages, history[2:5])
+        self.assertTrue(page.has_previous_page and page.has_next_page)
+        self.assertEqual(edge.messages, history[0:2])
+        self.assertFalse(edge.has_previous_page)
+
+    def test_get_history_rejects_invalid_arguments(self):
+        with self.assertRaises(ValidationException):
+            MessageService.get_history(self.room, after="not a cursor")
+        with self.assertRaises(ValidationException):
+            MessageService.get_history(self.room, first=1, last=1)
+        with self.assertRaises(NotFoundException):
+            MessageService.get_history(self.room, around=uuid.uuid4())
@@ -4,11 +4,12 @@ from django.db import IntegrityError, transaction
 
 from backend.account.models import User
 from backend.access.enums import RoleCode
+from backend.access.events import notify_access_changed
 from backend.access.models import Participant
 from backend.access.services import RoleService
 from backend.core.exceptions import ConflictException, FormValidationException
 from backend.room.choices import VisibilityChoices
-from backend.room.forms import RoomForm
+from backend.room.forms import RoomForm, RoomRateLimitForm
 from backend.room.models import Room, Topic
 
 
@@ -65,6 +66,7 @@ def update_room(
     description: Optional[str] = None,
     visibility: Optional[VisibilityChoices] = None,
     topic_names: Optional[list[str]] = None,
+    rate_limits: Optional[dict[str, int]] = None,
 ) -> Room:
     data = {
         "name": name if name is not None else room.name,
@@ -89,14 +91,49 @@ def update_room(
 
             if visibility is not None:
                 room.update_visibility(visibility)
+
+            if rate_limits and any(v is not None for v in rate_limits.values()):
+                update_room_rate_limits(room=room, **rate_limits)
     except IntegrityError as e:
         raise ConflictException("Could not update room due to a conflict.") from e
 
     return room
 
 
+def update_room_rate_limits(
+    *,
+    room: Room,
+    slow_mode_seconds: Optional[int] = None,
+    room_messages_per_sec: Optional[int] = None,
+    connection_messages_per_sec: Optional[int] = None,
+) -> Room:
+    changes = {
+        "slow_mode_seconds": slow_mode_seconds,
+        "room_messages_per_sec": room_messages_per_sec,
+        "connection_messages_per_sec": connection_messages_per_sec,
+    }
+    data = {
+        field: value if value is not None else getattr(room, field)
+        for field, value in changes.items()
+    }
+
+    form = RoomRateLimitForm(data=data, instance=room)
+
+    if not form.is_valid():
+        raise FormValidationException("Invalid rate limit data", errors=form.errors)
+
+    form.save()
+    # Open chat connections hold the limits they subscribed with
+    notify_access_changed(room.id)
+
+    return room
+
+
 def delete_room(room: Room) -> bool:
+    room_id = room.id
     room.delete()
+    # Participants went with the room, so open connections are revoked
+    notify_access_changed(room_id)
     return True
 
 
@@ -107,5 +144,7 @@ def join_room(user: User, room: Room) -> Room:
 
 
 def leave_room(participant: Participant) -> bool:
+    room_id, user_id = participant.room_id, participant.user_id
     participant.delete()
+    notify_access_changed(room_id, user_id=user_id)
     return True
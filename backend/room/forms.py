@@ -25,3 +25,13 @@ class RoomForm(ModelForm):
     def clean_name(self) -> str:
         name = self.cleaned_data["name"]
         return " ".join(name.strip().split())
+
+
+class RoomRateLimitForm(ModelForm):
+    class Meta:
+        model = Room
+        fields = (
+            "slow_mode_seconds",
+            "room_messages_per_sec",
+            "connection_messages_per_sec",
+        )
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.4 on 2026-10-17 09:12
+
+import django.core.validators
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('room', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='room',
+            name='slow_mode_seconds',
+            field=models.PositiveIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(21600)]),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='room_messages_per_sec',
+            field=models.PositiveIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(1000)]),
+        ),
+        migrations.AddField(
+            model_name='room',
+            name='connection_messages_per_sec',
+            field=models.PositiveIntegerField(default=0, validators=[django.core.validators.MaxValueValidator(100)]),
+        ),
+    ]
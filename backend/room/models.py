@@ -6,6 +6,7 @@ from django.db import models
 from django.db.models import Q
 from django.db.models.functions import Lower
 from django.core.exceptions import ValidationError
+from django.core.validators import MaxValueValidator
 
 from backend.room.choices import VisibilityChoices
 from backend.room.querysets import RoomQuerySet, TopicQuerySet
@@ -68,6 +69,19 @@ class Room(models.Model):
         through="access.Participant",
         blank=True,
     )
+    # Chat rate limits, 0 disables each of them.
+    # Slow mode: every user may post once per this many seconds.
+    slow_mode_seconds = models.PositiveIntegerField(
+        default=0, validators=[MaxValueValidator(6 * 60 * 60)]
+    )
+    # Messages per second accepted from the room as a whole.
+    room_messages_per_sec = models.PositiveIntegerField(
+        default=0, validators=[MaxValueValidator(1000)]
+    )
+    # Messages per second accepted from a single WebSocket connection.
+    connection_messages_per_sec = models.PositiveIntegerField(
+        default=0, validators=[MaxValueValidator(100)]
+    )
     updated_at = models.DateTimeField(auto_now=True)
     created_at = models.DateTimeField(auto_now_add=True)
 
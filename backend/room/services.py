@@ -55,6 +55,7 @@ class RoomService:
         description: Optional[str] = None,
         visibility: Optional[VisibilityChoices] = None,
         topic_names: Optional[list[str]] = None,
+        rate_limits: Optional[dict[str, int]] = None,
     ) -> Room:
         """
         Update a room.
@@ -66,6 +67,7 @@ class RoomService:
             description: New room description (optional)
             visibility: New visibility (optional)
             topic_names: New list of topic names (optional)
+            rate_limits: New chat rate limits keyed by Room field name (optional)
 
         Returns:
             The updated Room instance
@@ -86,6 +88,7 @@ class RoomService:
             description=description,
             visibility=visibility,
             topic_names=topic_names,
+            rate_limits=rate_limits,
         )
 
     @staticmethod
@@ -73,6 +73,25 @@ class RoomServiceTest(ServiceTestBase):
         self.assertEqual(updated.visibility, Room.Visibility.PRIVATE)
         self.assertEqual(updated.topics.count(), 1)
 
+    def test_update_room_rate_limits(self):
+        updated = RoomService.update_room(
+            user=self.owner,
+            room=self.room,
+            rate_limits={"slow_mode_seconds": 30, "room_messages_per_sec": None},
+        )
+
+        updated.refresh_from_db()
+        self.assertEqual(updated.slow_mode_seconds, 30)
+        self.assertEqual(updated.room_messages_per_sec, 0)
+
+    def test_update_room_rate_limits_invalid(self):
+        with self.assertRaises(FormValidationException):
+            RoomService.update_room(
+                user=self.owner,
+                room=self.room,
+                rate_limits={"connection_messages_per_sec": 10_000},
+            )
+
     def test_update_room_no_permission(self):
         with self.assertRaises(PermissionException):
             RoomService.update_room(
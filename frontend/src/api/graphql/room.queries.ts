@@ -123,19 +123,48 @@ export const ROOMS_NOT_PARTICIPATED_BY_USER_QUERY = gql`
     }
 `;
 
+// Messages per page when paging back through a room's history (the server
+// caps pages at MESSAGE_HISTORY_MAX_PAGE_SIZE)
+export const ROOM_MESSAGES_PAGE_SIZE = 100;
+
 export const ROOM_MESSAGES_QUERY = gql`
-    query RoomMessages($roomId: UUID!) {
-        messages(roomId: $roomId) {
-            id
-            author {
-                id
-                username
-                avatar
+    query RoomMessages(
+        $roomId: UUID!
+        $first: Int
+        $after: String
+        $last: Int
+        $before: String
+        $around: UUID
+    ) {
+        messages(
+            roomId: $roomId
+            first: $first
+            after: $after
+            last: $last
+            before: $before
+            around: $around
+        ) {
+            edges {
+                cursor
+                node {
+                    id
+                    author {
+                        id
+                        username
+                        avatar
+                    }
+                    body
+                    isEdited
+                    createdAt
+                    updatedAt
+                }
+            }
+            pageInfo {
+                hasPreviousPage
+                hasNextPage
+                startCursor
+                endCursor
             }
-            body
-            isEdited
-            createdAt
-            updatedAt
         }
     }
 `;
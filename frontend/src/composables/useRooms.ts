@@ -1,5 +1,5 @@
 import { computed, type Ref } from "vue"
-import type { Message, GqlMessage, UUID, DateTime } from "@/types"
+import type { Message, GqlMessageConnection, Room, User, UUID, DateTime } from "@/types"
 import { useMutation, useQuery } from "@vue/apollo-composable"
 import {
   CREATE_ROOM_MUTATION,
@@ -8,6 +8,7 @@ import {
   UPDATE_ROOM_MUTATION,
   ROOM_QUERY,
   ROOM_MESSAGES_QUERY,
+  ROOM_MESSAGES_PAGE_SIZE,
   TOPIC_QUERY,
 } from "@/api/graphql"
 
@@ -31,7 +32,7 @@ export function useRoomQuery(roomId: Ref<UUID | null>) {
 }
 
 export function useRoomMessagesQuery(roomId: Ref<UUID>, options?: { enabled?: Ref<boolean> }) {
-  const { result, loading, error, refetch } = useQuery(
+  const { result, loading, error, refetch, fetchMore, onResult } = useQuery(
     ROOM_MESSAGES_QUERY,
     { roomId: roomId.value },
     {
@@ -40,12 +41,12 @@ export function useRoomMessagesQuery(roomId: Ref<UUID>, options?: { enabled?: Re
     },
   )
 
-  const normalizeMessages = (items?: GqlMessage[]): Message[] => {
-    if (!items) return []
-    return items.map((m): Message => ({
+  const normalizeMessages = (connection?: GqlMessageConnection): Message[] => {
+    if (!connection?.edges) return []
+    return connection.edges.map(({ node: m }): Message => ({
       id: m.id as UUID,
-      author: m.author,
-      room: m.room,
+      author: m.author as User,
+      room: {} as Room,
       parent: null,
       body: m.body,
       isEdited: m.isEdited,
@@ -54,8 +55,41 @@ export function useRoomMessagesQuery(roomId: Ref<UUID>, options?: { enabled?: Re
     }))
   }
 
+  const pageInfo = computed(() => result.value?.messages?.pageInfo || { hasPreviousPage: false, startCursor: null })
+
+  // The server returns the newest page; prepend older pages until the start
+  // of the history.
+  async function loadOlder() {
+    if (!pageInfo.value.hasPreviousPage) return
+
+    await fetchMore({
+      variables: { roomId: roomId.value, last: ROOM_MESSAGES_PAGE_SIZE, before: pageInfo.value.startCursor },
+      updateQuery: (prev: { messages: GqlMessageConnection }, { fetchMoreResult }: { fetchMoreResult?: { messages: GqlMessageConnection } }) => {
+        if (!fetchMoreResult) return prev
+
+        return {
+          messages: {
+            ...prev.messages,
+            edges: [...fetchMoreResult.messages.edges, ...prev.messages.edges],
+            pageInfo: {
+              ...prev.messages.pageInfo,
+              hasPreviousPage: fetchMoreResult.messages.pageInfo.hasPreviousPage,
+              startCursor: fetchMoreResult.messages.pageInfo.startCursor,
+            },
+          },
+        }
+      },
+    })
+  }
+
+  onResult(({ data }) => {
+    if (data?.messages?.pageInfo?.hasPreviousPage) loadOlder()
+  })
+
   return {
     messages: computed(() => normalizeMessages(result.value?.messages)),
+    hasPreviousPage: computed(() => pageInfo.value.hasPreviousPage),
+    loadOlder,
     loading,
     error,
     refetch,
@@ -1,8 +1,8 @@
 import { ref, type Ref } from "vue"
 import { useAuthStore } from "@/stores/auth.store"
-import { ROOM_MESSAGES_QUERY } from "@/api/graphql";
+import { ROOM_MESSAGES_QUERY, ROOM_MESSAGES_PAGE_SIZE } from "@/api/graphql";
 import { apolloClient } from "@/api/apollo.client";
-import type { Room, Message, DateTime, UUID, GqlMessage } from "@/types"
+import type { Room, User, Message, DateTime, UUID, GqlMessage, GqlMessageConnection } from "@/types"
 import type {
   ConnectionStatus,
   ReceivedWebSocketMessage,
@@ -64,17 +64,29 @@ export function useWebSocket(
   }
 
   async function fetchRoomMessages(): Promise<Message[]> {
-    const response = await apolloClient.query({
-      query: ROOM_MESSAGES_QUERY,
-      variables: { roomId: roomId.value },
-      fetchPolicy: 'network-only'
-    });
+    // The server returns the newest page first; page back with last/before
+    // until the start of the history.
+    let items: GqlMessage[] = []
+    let before: string | null = null
+    do {
+      const response = await apolloClient.query({
+        query: ROOM_MESSAGES_QUERY,
+        variables: before
+          ? { roomId: roomId.value, last: ROOM_MESSAGES_PAGE_SIZE, before }
+          : { roomId: roomId.value },
+        fetchPolicy: 'network-only'
+      });
+
+      const connection: GqlMessageConnection | undefined = response.data?.messages
+      if (!connection) break
+      items = [...connection.edges.map((edge) => edge.node), ...items]
+      before = connection.pageInfo.hasPreviousPage ? connection.pageInfo.startCursor : null
+    } while (before)
 
-    const items: GqlMessage[] = response.data?.messages || []
     const normalized: Message[] = items.map((m): Message => ({
       id: m.id,
-      author: m.author,
-      room: m.room,
+      author: m.author as User,
+      room: {} as Room,
       parent: null,
       body: m.body,
       isEdited: m.isEdited,
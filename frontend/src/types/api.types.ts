@@ -48,14 +48,25 @@ export interface UpdateRoleInput {
 
 export type GqlMessage = {
   id: UUID
-  author: User
-  room: Room
+  author: Pick<User, "id" | "username" | "avatar">
   body: string
   isEdited: boolean
   createdAt: DateTime
   updatedAt: DateTime
 }
 
+export type GqlPageInfo = {
+  hasPreviousPage: boolean
+  hasNextPage: boolean
+  startCursor: string | null
+  endCursor: string | null
+}
+
+export type GqlMessageConnection = {
+  edges: { cursor: string; node: GqlMessage }[]
+  pageInfo: GqlPageInfo
+}
+
 export interface RegisterInput {
   username: string;
   name: string;